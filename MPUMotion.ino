@@ -13,13 +13,261 @@ Adafruit_SSD1306 display(SCREEN_WIDTH, SCREEN_HEIGHT, &Wire, OLED_RESET);
 // MPU6050 sensor (using Adafruit library)
 Adafruit_MPU6050 mpu;
 
+// Serial output format
+// 1 = compact binary frames (decoded by FrameDecoder in test_db_connection.py)
+// 0 = CSV lines: millis,accel_x,accel_y,accel_z,gyro_x,gyro_y,gyro_z,temperature
+#define SERIAL_BINARY 1
+
+// Edge mode: the board keeps the recognition window itself and sends a feature
+// frame (window mean/std/max, gyro mean, mean change) every FEATURE_DECIMATION
+// samples, plus a raw frame every RAW_DECIMATION samples (0 = none, nothing is
+// stored on the PC then). The PC classifies feature frames as they arrive.
+// E.g. 100 Hz sensing with the same 2 s window and 10 Hz output:
+// SAMPLE_INTERVAL_MS 10, FEATURE_WINDOW 200, FEATURE_DECIMATION 10, RAW_DECIMATION 10
+#define EDGE_FEATURES 0
+#define FEATURE_WINDOW 20       // Samples per window (WINDOW_SIZE on the PC at 10 Hz)
+#define FEATURE_DECIMATION 1    // Samples per feature frame
+#define RAW_DECIMATION 1        // Samples per raw frame, 0 = no raw frames
+#define BASELINE_ACCEL 9.82f    // Gravity baseline (baseline_accel on the PC)
+
+#if EDGE_FEATURES && !SERIAL_BINARY
+#error "EDGE_FEATURES needs SERIAL_BINARY 1"
+#endif
+
+// Time between samples. Only the sensor read and the serial write happen on
+// every sample now (the OLED is redrawn on state changes), so this can go below 100
+// if SAMPLING_RATE / WINDOW_SIZE on the host are changed to match
+#define SAMPLE_INTERVAL_MS 100
+
+// Binary frame layout - must match FRAME_DTYPE on the host
+#define FRAME_SYNC_0 0xA5
+#define FRAME_SYNC_1 0x5A
+#define FRAME_TYPE_SAMPLE 0x01
+#define FRAME_TYPE_STATE 0x02
+#define FRAME_TYPE_FEATURES 0x03  // SampleFrame layout, values = features, window count, window size
+
+struct __attribute__((packed)) SampleFrame {
+  uint8_t sync[2];
+  uint8_t type;
+  uint32_t millis;
+  float values[7];  // accel x/y/z, gyro x/y/z, temperature
+  uint16_t crc;     // CRC-16/CCITT-FALSE over type..values
+};
+
+// Host -> device state frame - must match STATE_FRAME_DTYPE on the host
+struct __attribute__((packed)) StateFrame {
+  uint8_t sync[2];
+  uint8_t type;
+  uint8_t motion;   // index in MOTION_NAMES (MOTION_CODES on the host)
+  uint8_t pattern;  // index in PATTERN_NAMES (DOWNLINK_PATTERNS on the host)
+  uint16_t crc;     // CRC-16/CCITT-FALSE over type..pattern
+};
+
+const char* const MOTION_NAMES[] = {"COLLECTING", "RESTING", "RUNNING", "WALKING", "IDLE"};
+const char* const PATTERN_NAMES[] = {"", "active", "stationary", "mixed", "unknown"};
+#define MOTION_COUNT 5
+#define PATTERN_COUNT 5
+
+// The host repeats its state every 5 s; after this long without one, show "no host"
+#define HOST_TIMEOUT_MS 15000
+#define NO_STATE 0xFF
+
+// Latest state from the host, and what is currently on the screen
+uint8_t hostMotion = NO_STATE;
+uint8_t hostPattern = 0;
+unsigned long lastStateMillis = 0;
+uint8_t shownMotion = NO_STATE - 1;  // Forces the first repaint
+uint8_t shownPattern = 0;
+bool shownLinked = false;
+
+// Partial state frame being received
+uint8_t rxFrame[sizeof(StateFrame)];
+uint8_t rxLength = 0;
+
+unsigned long nextSampleMillis = 0;
+
+// Edge mode window (accel / gyro magnitudes, oldest at windowHead - windowCount)
+float accelWindow[FEATURE_WINDOW];
+float gyroWindow[FEATURE_WINDOW];
+uint16_t windowHead = 0;
+uint16_t windowCount = 0;
+uint32_t samplesTaken = 0;
+
+uint16_t crc16Ccitt(const uint8_t* data, size_t length) {
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 0; i < length; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (uint8_t bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+void sendFrame(uint8_t type, const float values[7]) {
+  SampleFrame frame;
+  frame.sync[0] = FRAME_SYNC_0;
+  frame.sync[1] = FRAME_SYNC_1;
+  frame.type = type;
+  frame.millis = millis();
+  for (uint8_t i = 0; i < 7; i++) {
+    frame.values[i] = values[i];
+  }
+
+  // CRC covers everything between the sync word and the CRC itself
+  const uint8_t* bytes = (const uint8_t*)&frame;
+  frame.crc = crc16Ccitt(bytes + 2, sizeof(frame) - 4);
+  Serial.write(bytes, sizeof(frame));
+}
+
+void sendSampleFrame(sensors_event_t& a, sensors_event_t& g, sensors_event_t& temp) {
+  const float values[7] = {a.acceleration.x, a.acceleration.y, a.acceleration.z,
+                           g.gyro.x, g.gyro.y, g.gyro.z, temp.temperature};
+  sendFrame(FRAME_TYPE_SAMPLE, values);
+}
+
+// Add one sample's magnitudes to the edge window
+// (EdgeFeatureEmulator in motion_replay.py mirrors this and computeFeatures step for step)
+void pushWindow(sensors_event_t& a, sensors_event_t& g) {
+  float x = a.acceleration.x, y = a.acceleration.y, z = a.acceleration.z;
+  float gx = g.gyro.x, gy = g.gyro.y, gz = g.gyro.z;
+  accelWindow[windowHead] = sqrtf(x * x + y * y + z * z);
+  gyroWindow[windowHead] = sqrtf(gx * gx + gy * gy + gz * gz);
+  windowHead = (windowHead + 1) % FEATURE_WINDOW;
+  if (windowCount < FEATURE_WINDOW) {
+    windowCount++;
+  }
+}
+
+// Window statistics, recomputed from the window (no running sums to drift)
+void computeFeatures(float values[7]) {
+  uint16_t start = (windowHead + FEATURE_WINDOW - windowCount) % FEATURE_WINDOW;
+  float n = (float)windowCount;
+  float shiftedSum = 0.0f, gyroSum = 0.0f, changeSum = 0.0f, maxAccel = 0.0f, previous = 0.0f;
+  for (uint16_t i = 0; i < windowCount; i++) {
+    uint16_t index = (start + i) % FEATURE_WINDOW;
+    float accel = accelWindow[index];
+    shiftedSum = shiftedSum + (accel - BASELINE_ACCEL);
+    gyroSum = gyroSum + gyroWindow[index];
+    if (i == 0 || accel > maxAccel) {
+      maxAccel = accel;
+    }
+    if (i > 0) {
+      changeSum = changeSum + fabsf(accel - previous);
+    }
+    previous = accel;
+  }
+  
+  if (windowCount == 0) {
+    for (uint8_t i = 0; i < 6; i++) {
+      values[i] = 0.0f;
+    }
+    values[6] = (float)FEATURE_WINDOW;
+    return;
+  }
+  
+  // Two-pass variance around the window mean
+  float shiftedMean = shiftedSum / n;
+  float squares = 0.0f;
+  for (uint16_t i = 0; i < windowCount; i++) {
+    float deviation = (accelWindow[(start + i) % FEATURE_WINDOW] - BASELINE_ACCEL) - shiftedMean;
+    squares = squares + deviation * deviation;
+  }
+  
+  values[0] = BASELINE_ACCEL + shiftedMean;
+  values[1] = sqrtf(squares / n);
+  values[2] = maxAccel;
+  values[3] = gyroSum / n;
+  values[4] = windowCount > 1 ? changeSum / (n - 1.0f) : 0.0f;
+  values[5] = n;
+  values[6] = (float)FEATURE_WINDOW;
+}
+
+void sendSampleCsv(sensors_event_t& a, sensors_event_t& g, sensors_event_t& temp) {
+  Serial.print(millis());
+  Serial.print(",");
+  Serial.print(a.acceleration.x);
+  Serial.print(",");
+  Serial.print(a.acceleration.y);
+  Serial.print(",");
+  Serial.print(a.acceleration.z);
+  Serial.print(",");
+  Serial.print(g.gyro.x);
+  Serial.print(",");
+  Serial.print(g.gyro.y);
+  Serial.print(",");
+  Serial.print(g.gyro.z);
+  Serial.print(",");
+  Serial.println(temp.temperature);
+}
+
+// Parse state frames from whatever bytes the host has sent (never waits)
+void readHostFrames() {
+  while (Serial.available() > 0) {
+    uint8_t value = Serial.read();
+    if (rxLength == 0 && value != FRAME_SYNC_0) {
+      continue;
+    }
+    if (rxLength == 1 && value != FRAME_SYNC_1) {
+      // A repeated first sync byte may still start a frame
+      if (value != FRAME_SYNC_0) {
+        rxLength = 0;
+      }
+      continue;
+    }
+    rxFrame[rxLength++] = value;
+    
+    if (rxLength == sizeof(StateFrame)) {
+      const StateFrame* frame = (const StateFrame*)rxFrame;
+      if (frame->type == FRAME_TYPE_STATE && frame->motion < MOTION_COUNT && frame->pattern < PATTERN_COUNT &&
+          crc16Ccitt(rxFrame + 2, sizeof(StateFrame) - 4) == frame->crc) {
+        hostMotion = frame->motion;
+        hostPattern = frame->pattern;
+        lastStateMillis = millis();
+      }
+      rxLength = 0;
+    }
+  }
+}
+
+// Repaint the OLED only when what it shows has changed
+void updateDisplay() {
+  bool linked = hostMotion != NO_STATE && millis() - lastStateMillis < HOST_TIMEOUT_MS;
+  if (hostMotion == shownMotion && hostPattern == shownPattern && linked == shownLinked) {
+    return;
+  }
+  shownMotion = hostMotion;
+  shownPattern = hostPattern;
+  shownLinked = linked;
+  
+  display.clearDisplay();
+  display.setTextSize(1);
+  display.setCursor(0, 0);
+  display.println("Motion:");
+  
+  display.setTextSize(2);
+  display.setCursor(0, 16);
+  display.println(linked ? MOTION_NAMES[hostMotion] : "NO HOST");
+  
+  display.setTextSize(1);
+  display.setCursor(0, 48);
+  if (linked && hostPattern != 0) {
+    display.print("Pattern: ");
+    display.println(PATTERN_NAMES[hostPattern]);
+  } else if (!linked) {
+    display.println("Waiting for PC...");
+  }
+  display.display();
+}
+
 void setup() {
   // Initialize serial communication
   Serial.begin(115200);
   Serial.println("MPU6050 and OLED Test");
   
-  // Initialize I2C
+  // Initialize I2C (400 kHz fast mode; both the SSD1306 and the MPU6050 support it)
   Wire.begin();
+  Wire.setClock(400000);
   
   // Initialize OLED
   if(!display.begin(SSD1306_SWITCHCAPVCC, 0x3C)) { // Address 0x3C for 128x64
@@ -55,53 +303,42 @@ void setup() {
   mpu.setFilterBandwidth(MPU6050_BAND_21_HZ);
   
   Serial.println("MPU6050 initialized successfully!");
+  nextSampleMillis = millis();
 }
 
 void loop() {
-  // Read accelerometer and gyroscope values
-  sensors_event_t a, g, temp;
-  mpu.getEvent(&a, &g, &temp);
+  // State from the host can arrive at any time; pick it up between samples
+  readHostFrames();
   
-  // Print to serial monitor
-  Serial.print("Accel: ");
-  Serial.print(a.acceleration.x);
-  Serial.print(" ");
-  Serial.print(a.acceleration.y);
-  Serial.print(" ");
-  Serial.print(a.acceleration.z);
-  Serial.print(" | Gyro: ");
-  Serial.print(g.gyro.x);
-  Serial.print(" ");
-  Serial.print(g.gyro.y);
-  Serial.print(" ");
-  Serial.println(g.gyro.z);
-  
-  // Display on OLED
-  display.clearDisplay();
-  display.setCursor(0, 0);
-  display.println("MPU6050 Readings:");
-  
-  display.setCursor(0, 16);
-  display.print("Accel X: ");
-  display.println(a.acceleration.x);
-  
-  display.setCursor(0, 24);
-  display.print("Accel Y: ");
-  display.println(a.acceleration.y);
-  
-  display.setCursor(0, 32);
-  display.print("Accel Z: ");
-  display.println(a.acceleration.z);
-  
-  display.setCursor(0, 48);
-  display.print("Gyro X: ");
-  display.println(g.gyro.x);
-  
-  display.setCursor(0, 56);
-  display.print("Gyro Y: ");
-  display.println(g.gyro.y);
-  
-  display.display();
+  // Sample on a fixed schedule instead of delay(), so the serial input keeps being read
+  if ((long)(millis() - nextSampleMillis) >= 0) {
+    nextSampleMillis += SAMPLE_INTERVAL_MS;
+    
+    // Read accelerometer and gyroscope values
+    sensors_event_t a, g, temp;
+    mpu.getEvent(&a, &g, &temp);
+    
+    samplesTaken++;
+    
+    // Send the sample to the host
+#if EDGE_FEATURES
+    // Features first, so the PC labels this raw sample with its own window's decision
+    pushWindow(a, g);
+    if (samplesTaken % FEATURE_DECIMATION == 0) {
+      float features[7];
+      computeFeatures(features);
+      sendFrame(FRAME_TYPE_FEATURES, features);
+    }
+    if (RAW_DECIMATION > 0 && samplesTaken % RAW_DECIMATION == 0) {
+      sendSampleFrame(a, g, temp);
+    }
+#elif SERIAL_BINARY
+    sendSampleFrame(a, g, temp);
+#else
+    sendSampleCsv(a, g, temp);
+#endif
+  }
   
-  delay(100);  // Update every 100ms
+  // Show the host's classification (an I2C transfer only when it changed)
+  updateDisplay();
 }
\ No newline at end of file
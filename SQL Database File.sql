@@ -16,9 +16,14 @@ CREATE TABLE IF NOT EXISTS sensor_data (
     gyro_x FLOAT,
     gyro_y FLOAT,
     gyro_z FLOAT,
-    sequence_id VARCHAR(50)
+    sequence_id VARCHAR(50),
+    hold_count INT NOT NULL DEFAULT 1,  -- samples this row stands for (hold records: > 1)
+    hold_until DATETIME NULL            -- timestamp of the last held sample
 );
 
+-- Indexes, daily partitioning and the retention job for sensor_data live in
+-- "SQL Migration - Indexes Partitioning Retention.sql" - run it after this file.
+
 -- Create the motion patterns reference table
 CREATE TABLE IF NOT EXISTS motion_patterns (
     id INT AUTO_INCREMENT PRIMARY KEY,
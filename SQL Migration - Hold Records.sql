@@ -0,0 +1,117 @@
+-- Motion Recognition System - hold records (adaptive storage of stationary periods)
+-- Run once against a motion_data database created before sensor_data had the
+-- hold columns (new databases get them from "SQL Database File.sql").
+-- Needs "SQL Migration - Indexes Partitioning Retention.sql" to have run first.
+
+USE motion_data;
+
+-- 1. A hold record is one reading standing in for hold_count samples of the same
+--    label, the last of them at hold_until; plain rows keep 1 and NULL
+ALTER TABLE sensor_data
+    ADD COLUMN hold_count INT NOT NULL DEFAULT 1,
+    ADD COLUMN hold_until DATETIME NULL;
+
+-- 2. Re-backfill both rollups with the hold weighting (the first backfill, in
+--    "SQL Migration - Indexes Partitioning Retention.sql", predates the hold
+--    columns and counts rows); values replace, so this is safe to re-run
+INSERT INTO sensor_data_minute
+    (minute_start, sequence_id, motion_label, sample_count,
+     accel_mag_min, accel_mag_max, accel_mag_sum, last_timestamp)
+SELECT
+    DATE_FORMAT(timestamp, '%Y-%m-%d %H:%i:00'),
+    COALESCE(sequence_id, ''),
+    COALESCE(motion_label, ''),
+    SUM(hold_count),
+    MIN(SQRT(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)),
+    MAX(SQRT(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)),
+    SUM(hold_count * SQRT(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)),
+    MAX(COALESCE(hold_until, timestamp))
+FROM sensor_data
+GROUP BY 1, 2, 3
+ON DUPLICATE KEY UPDATE
+    sample_count = VALUES(sample_count),
+    accel_mag_min = VALUES(accel_mag_min),
+    accel_mag_max = VALUES(accel_mag_max),
+    accel_mag_sum = VALUES(accel_mag_sum),
+    last_timestamp = VALUES(last_timestamp);
+
+INSERT INTO sensor_data_sequence
+    (sequence_id, motion_label, sample_count,
+     accel_mag_min, accel_mag_max, accel_mag_sum, first_timestamp, last_timestamp)
+SELECT
+    COALESCE(sequence_id, ''),
+    COALESCE(motion_label, ''),
+    SUM(hold_count),
+    MIN(SQRT(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)),
+    MAX(SQRT(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)),
+    SUM(hold_count * SQRT(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)),
+    MIN(timestamp),
+    MAX(COALESCE(hold_until, timestamp))
+FROM sensor_data
+GROUP BY 1, 2
+ON DUPLICATE KEY UPDATE
+    sample_count = VALUES(sample_count),
+    accel_mag_min = VALUES(accel_mag_min),
+    accel_mag_max = VALUES(accel_mag_max),
+    accel_mag_sum = VALUES(accel_mag_sum),
+    first_timestamp = VALUES(first_timestamp),
+    last_timestamp = VALUES(last_timestamp);
+
+-- 3. The retention rollup counts hold records as the samples they stand for
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS rollup_and_purge_sensor_data$$
+CREATE PROCEDURE rollup_and_purge_sensor_data(IN retention_days INT)
+BEGIN
+    DECLARE cutoff DATE DEFAULT CURDATE() - INTERVAL retention_days DAY;
+    DECLARE done INT DEFAULT FALSE;
+    DECLARE old_partition VARCHAR(64);
+    DECLARE old_partitions CURSOR FOR
+        SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE()
+          AND TABLE_NAME = 'sensor_data'
+          AND PARTITION_NAME REGEXP '^p[0-9]{8}$'
+          AND STR_TO_DATE(SUBSTRING(PARTITION_NAME, 2), '%Y%m%d') < cutoff;
+    DECLARE CONTINUE HANDLER FOR NOT FOUND SET done = TRUE;
+
+    -- Values replace rather than add, so re-running after a failure can't double count
+    INSERT INTO sensor_data_minute
+        (minute_start, sequence_id, motion_label, sample_count,
+         accel_mag_min, accel_mag_max, accel_mag_sum, last_timestamp)
+    SELECT
+        DATE_FORMAT(timestamp, '%Y-%m-%d %H:%i:00'),
+        COALESCE(sequence_id, ''),
+        COALESCE(motion_label, ''),
+        SUM(hold_count),
+        MIN(SQRT(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)),
+        MAX(SQRT(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)),
+        SUM(hold_count * SQRT(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)),
+        MAX(COALESCE(hold_until, timestamp))
+    FROM sensor_data
+    WHERE timestamp < cutoff
+    GROUP BY 1, 2, 3
+    ON DUPLICATE KEY UPDATE
+        sample_count = VALUES(sample_count),
+        accel_mag_min = VALUES(accel_mag_min),
+        accel_mag_max = VALUES(accel_mag_max),
+        accel_mag_sum = VALUES(accel_mag_sum),
+        last_timestamp = VALUES(last_timestamp);
+
+    OPEN old_partitions;
+    drop_loop: LOOP
+        FETCH old_partitions INTO old_partition;
+        IF done THEN
+            LEAVE drop_loop;
+        END IF;
+        SET @partition_sql = CONCAT('ALTER TABLE sensor_data DROP PARTITION ', old_partition);
+        PREPARE stmt FROM @partition_sql;
+        EXECUTE stmt;
+        DEALLOCATE PREPARE stmt;
+    END LOOP;
+    CLOSE old_partitions;
+
+    -- Rows from before partitioning was enabled
+    DELETE FROM sensor_data PARTITION (p_history) WHERE timestamp < cutoff;
+END$$
+
+DELIMITER ;
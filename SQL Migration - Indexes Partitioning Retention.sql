@@ -0,0 +1,225 @@
+-- Motion Recognition System - sensor_data indexing, partitioning and retention
+-- Run once against an existing motion_data database (after "SQL Database File.sql").
+-- The partitioning steps rebuild the table, so expect them to take a while on large tables.
+
+USE motion_data;
+
+-- 1. Indexes for the hot queries
+--    fetch_recent_data / iter_range_chunks:  WHERE timestamp >= ? ORDER BY timestamp
+--    per-session diagnostics:                WHERE sequence_id = ? ... ORDER BY timestamp
+--    label distribution:                     GROUP BY motion_label (loose index scan)
+ALTER TABLE sensor_data
+    ADD INDEX idx_timestamp (timestamp),
+    ADD INDEX idx_sequence_timestamp (sequence_id, timestamp),
+    ADD INDEX idx_label_timestamp (motion_label, timestamp);
+
+-- 2. Daily range partitioning on timestamp
+--    MySQL needs the partition column in every unique key, so the primary key
+--    becomes (id, timestamp) and timestamp can no longer be NULL.
+ALTER TABLE sensor_data
+    MODIFY timestamp DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id, timestamp);
+
+-- Existing rows land in p_history; add_sensor_data_partitions() splits daily
+-- partitions off p_future from today onwards
+SET @partition_sql = CONCAT(
+    'ALTER TABLE sensor_data PARTITION BY RANGE COLUMNS(timestamp) (',
+    'PARTITION p_history VALUES LESS THAN (''', DATE_FORMAT(CURDATE(), '%Y-%m-%d'), '''), ',
+    'PARTITION p_future VALUES LESS THAN (MAXVALUE))');
+PREPARE stmt FROM @partition_sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 3. Per-minute aggregates that old raw rows are rolled into
+CREATE TABLE IF NOT EXISTS sensor_data_minute (
+    minute_start DATETIME NOT NULL,
+    sequence_id VARCHAR(50) NOT NULL,
+    motion_label VARCHAR(50) NOT NULL,
+    sample_count INT NOT NULL,
+    accel_mag_min FLOAT,
+    accel_mag_max FLOAT,
+    accel_mag_sum DOUBLE,          -- mean = accel_mag_sum / sample_count
+    last_timestamp DATETIME,
+    PRIMARY KEY (minute_start, sequence_id, motion_label),
+    INDEX idx_sequence_minute (sequence_id, minute_start),
+    INDEX idx_label_minute (motion_label, minute_start)
+);
+
+-- 4. Per-session rollups, maintained by the ingest writer together with
+--    sensor_data_minute; summary/diagnostic queries read these instead of raw rows
+CREATE TABLE IF NOT EXISTS sensor_data_sequence (
+    sequence_id VARCHAR(50) NOT NULL,
+    motion_label VARCHAR(50) NOT NULL,
+    sample_count INT NOT NULL,
+    accel_mag_min FLOAT,
+    accel_mag_max FLOAT,
+    accel_mag_sum DOUBLE,          -- mean = accel_mag_sum / sample_count
+    first_timestamp DATETIME,
+    last_timestamp DATETIME,
+    PRIMARY KEY (sequence_id, motion_label),
+    INDEX idx_label (motion_label)
+);
+
+-- Backfill both rollups from the rows already stored (new rows are added at ingest)
+INSERT INTO sensor_data_minute
+    (minute_start, sequence_id, motion_label, sample_count,
+     accel_mag_min, accel_mag_max, accel_mag_sum, last_timestamp)
+SELECT
+    DATE_FORMAT(timestamp, '%Y-%m-%d %H:%i:00'),
+    COALESCE(sequence_id, ''),
+    COALESCE(motion_label, ''),
+    COUNT(*),
+    MIN(SQRT(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)),
+    MAX(SQRT(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)),
+    SUM(SQRT(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)),
+    MAX(timestamp)
+FROM sensor_data
+GROUP BY 1, 2, 3
+ON DUPLICATE KEY UPDATE
+    sample_count = VALUES(sample_count),
+    accel_mag_min = VALUES(accel_mag_min),
+    accel_mag_max = VALUES(accel_mag_max),
+    accel_mag_sum = VALUES(accel_mag_sum),
+    last_timestamp = VALUES(last_timestamp);
+
+INSERT INTO sensor_data_sequence
+    (sequence_id, motion_label, sample_count,
+     accel_mag_min, accel_mag_max, accel_mag_sum, first_timestamp, last_timestamp)
+SELECT
+    COALESCE(sequence_id, ''),
+    COALESCE(motion_label, ''),
+    COUNT(*),
+    MIN(SQRT(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)),
+    MAX(SQRT(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)),
+    SUM(SQRT(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)),
+    MIN(timestamp),
+    MAX(timestamp)
+FROM sensor_data
+GROUP BY 1, 2
+ON DUPLICATE KEY UPDATE
+    sample_count = VALUES(sample_count),
+    accel_mag_min = VALUES(accel_mag_min),
+    accel_mag_max = VALUES(accel_mag_max),
+    accel_mag_sum = VALUES(accel_mag_sum),
+    first_timestamp = VALUES(first_timestamp),
+    last_timestamp = VALUES(last_timestamp);
+
+DELIMITER $$
+
+-- Make sure a daily partition exists for today and the next days_ahead days
+DROP PROCEDURE IF EXISTS add_sensor_data_partitions$$
+CREATE PROCEDURE add_sensor_data_partitions(IN days_ahead INT)
+BEGIN
+    DECLARE day_start DATE DEFAULT CURDATE();
+    DECLARE last_day DATE DEFAULT CURDATE() + INTERVAL days_ahead DAY;
+    DECLARE new_partition VARCHAR(16);
+
+    WHILE day_start <= last_day DO
+        SET new_partition = CONCAT('p', DATE_FORMAT(day_start, '%Y%m%d'));
+
+        IF NOT EXISTS (
+            SELECT 1 FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE()
+              AND TABLE_NAME = 'sensor_data'
+              AND PARTITION_NAME = new_partition
+        ) THEN
+            -- p_future is kept empty by running this ahead of time, so the split is cheap
+            SET @partition_sql = CONCAT(
+                'ALTER TABLE sensor_data REORGANIZE PARTITION p_future INTO (',
+                'PARTITION ', new_partition, ' VALUES LESS THAN (''',
+                DATE_FORMAT(day_start + INTERVAL 1 DAY, '%Y-%m-%d'), '''), ',
+                'PARTITION p_future VALUES LESS THAN (MAXVALUE))');
+            PREPARE stmt FROM @partition_sql;
+            EXECUTE stmt;
+            DEALLOCATE PREPARE stmt;
+        END IF;
+
+        SET day_start = day_start + INTERVAL 1 DAY;
+    END WHILE;
+END$$
+
+-- Roll raw rows older than retention_days into sensor_data_minute, then drop them.
+-- The ingest writer already keeps sensor_data_minute current, so the rollup step
+-- only re-derives the same values (and covers rows written by older clients).
+-- Whole daily partitions are dropped (instant); p_history is trimmed with DELETE.
+-- sensor_data_sequence keeps all-time totals and is never purged.
+DROP PROCEDURE IF EXISTS rollup_and_purge_sensor_data$$
+CREATE PROCEDURE rollup_and_purge_sensor_data(IN retention_days INT)
+BEGIN
+    DECLARE cutoff DATE DEFAULT CURDATE() - INTERVAL retention_days DAY;
+    DECLARE done INT DEFAULT FALSE;
+    DECLARE old_partition VARCHAR(64);
+    DECLARE old_partitions CURSOR FOR
+        SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE()
+          AND TABLE_NAME = 'sensor_data'
+          AND PARTITION_NAME REGEXP '^p[0-9]{8}$'
+          AND STR_TO_DATE(SUBSTRING(PARTITION_NAME, 2), '%Y%m%d') < cutoff;
+    DECLARE CONTINUE HANDLER FOR NOT FOUND SET done = TRUE;
+
+    -- Values replace rather than add, so re-running after a failure can't double count
+    INSERT INTO sensor_data_minute
+        (minute_start, sequence_id, motion_label, sample_count,
+         accel_mag_min, accel_mag_max, accel_mag_sum, last_timestamp)
+    SELECT
+        DATE_FORMAT(timestamp, '%Y-%m-%d %H:%i:00'),
+        COALESCE(sequence_id, ''),
+        COALESCE(motion_label, ''),
+        COUNT(*),
+        MIN(SQRT(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)),
+        MAX(SQRT(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)),
+        SUM(SQRT(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)),
+        MAX(timestamp)
+    FROM sensor_data
+    WHERE timestamp < cutoff
+    GROUP BY 1, 2, 3
+    ON DUPLICATE KEY UPDATE
+        sample_count = VALUES(sample_count),
+        accel_mag_min = VALUES(accel_mag_min),
+        accel_mag_max = VALUES(accel_mag_max),
+        accel_mag_sum = VALUES(accel_mag_sum),
+        last_timestamp = VALUES(last_timestamp);
+
+    OPEN old_partitions;
+    drop_loop: LOOP
+        FETCH old_partitions INTO old_partition;
+        IF done THEN
+            LEAVE drop_loop;
+        END IF;
+        SET @partition_sql = CONCAT('ALTER TABLE sensor_data DROP PARTITION ', old_partition);
+        PREPARE stmt FROM @partition_sql;
+        EXECUTE stmt;
+        DEALLOCATE PREPARE stmt;
+    END LOOP;
+    CLOSE old_partitions;
+
+    -- Rows from before partitioning was enabled
+    DELETE FROM sensor_data PARTITION (p_history) WHERE timestamp < cutoff;
+END$$
+
+-- Daily maintenance (requires SET GLOBAL event_scheduler = ON)
+-- Keeps a week of partitions ahead and 30 days of raw data
+DROP EVENT IF EXISTS sensor_data_maintenance$$
+CREATE EVENT sensor_data_maintenance
+    ON SCHEDULE EVERY 1 DAY STARTS CURDATE() + INTERVAL 1 DAY + INTERVAL 5 MINUTE
+    DO
+    BEGIN
+        CALL add_sensor_data_partitions(7);
+        CALL rollup_and_purge_sensor_data(30);
+    END$$
+
+DELIMITER ;
+
+CALL add_sensor_data_partitions(7);
+
+-- Verify
+SHOW INDEX FROM sensor_data;
+SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS
+FROM information_schema.PARTITIONS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'sensor_data';
+
+-- Query plans for the hot paths should now show index / partition use:
+-- EXPLAIN SELECT timestamp, motion_label FROM sensor_data
+--     WHERE timestamp >= NOW() - INTERVAL 1 HOUR ORDER BY timestamp;
+-- EXPLAIN SELECT motion_label, COUNT(*) FROM sensor_data GROUP BY motion_label;
@@ -1,409 +1,684 @@
-import mysql.connector
-import numpy as np
-import pandas as pd
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-import os
-
-# MySQL Database Configuration
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'motion_app',
-    'password': 'motion123',
-    'database': 'motion_data'
-}
-
-class FixedPatternRecognizer:
-    """Recognizes motion patterns with fixed motion breakdown visualization."""
-    
-    def __init__(self):
-        # Time window for pattern analysis
-        self.window_size = 15  # seconds
-        
-        # Hard-coded motion labels to match what's in your database
-        self.motion_labels = ['resting', 'idle', 'walking', 'running']
-        
-        # Pattern definitions
-        self.pattern_definitions = {
-            'active': [
-                {'motions': ['walking', 'running'], 'min_consecutive': 3, 'min_percentage': 0.4}
-            ],
-            'stationary': [
-                {'motions': ['resting', 'idle'], 'min_consecutive': 5, 'min_percentage': 0.7}
-            ],
-            'mixed': [
-                {'motions': ['walking', 'idle'], 'min_percentage': 0.4, 'min_transitions': 3}
-            ]
-        }
-    
-    def fetch_recent_data(self, minutes=60):
-        """Fetch motion data from the last hour (or specified minutes)."""
-        try:
-            conn = mysql.connector.connect(**DB_CONFIG)
-            cursor = conn.cursor()
-            
-            # Calculate time range
-            end_time = datetime.now()
-            start_time = end_time - timedelta(minutes=minutes)
-            
-            print(f"Fetching data from {start_time} to {end_time}...")
-            
-            # Query to get recent data
-            query = """
-            SELECT timestamp, motion_label, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z, sequence_id 
-            FROM sensor_data
-            WHERE timestamp >= %s
-            ORDER BY timestamp ASC
-            """
-            
-            cursor.execute(query, (start_time,))
-            
-            # Get column names
-            columns = [i[0] for i in cursor.description]
-            
-            # Fetch all data
-            data = cursor.fetchall()
-            
-            # Check for empty result
-            if not data:
-                print(f"No data found since {start_time}")
-                
-                # Check if there's any data at all
-                cursor.execute("SELECT COUNT(*) FROM sensor_data")
-                total_count = cursor.fetchone()[0]
-                
-                if total_count > 0:
-                    # Get the most recent record timestamp
-                    cursor.execute("SELECT MAX(timestamp) FROM sensor_data")
-                    latest = cursor.fetchone()[0]
-                    print(f"Total records in database: {total_count}")
-                    print(f"Most recent record timestamp: {latest}")
-                    print(f"Current time: {datetime.now()}")
-                    
-                    if latest:
-                        time_diff = datetime.now() - latest
-                        print(f"Data is {time_diff.total_seconds()/60:.1f} minutes old")
-                        
-                    # Check distribution of motion labels
-                    cursor.execute("SELECT motion_label, COUNT(*) FROM sensor_data GROUP BY motion_label")
-                    dist = cursor.fetchall()
-                    print("Motion label distribution:")
-                    for label, count in dist:
-                        print(f"  {label}: {count} records")
-                else:
-                    print("No data found in the database at all.")
-                
-                # Create empty DataFrame
-                df = pd.DataFrame(columns=columns)
-            else:
-                # Create DataFrame
-                df = pd.DataFrame(data, columns=columns)
-                
-                # Convert timestamp to datetime
-                df['timestamp'] = pd.to_datetime(df['timestamp'])
-                
-                print(f"Found {len(df)} data points from the last {minutes} minutes.")
-                
-                # Check distribution of motion labels in this data
-                label_counts = df['motion_label'].value_counts()
-                print("Motion label distribution in recent data:")
-                for label, count in label_counts.items():
-                    print(f"  {label}: {count} records")
-            
-            # Close connection
-            cursor.close()
-            conn.close()
-            
-            return df
-            
-        except mysql.connector.Error as e:
-            print(f"Database error: {e}")
-            return pd.DataFrame()  # Return empty DataFrame on error
-    
-    def analyze_motion_segments(self, df):
-        """Break the data into segments and analyze each segment."""
-        if len(df) == 0:
-            print("No data to analyze.")
-            return pd.DataFrame()
-            
-        # Group data into time windows (15 second segments)
-        df['time_window'] = pd.to_datetime(df['timestamp']).dt.floor(f"{self.window_size}S")
-        windows = df.groupby('time_window')
-        
-        segments = []
-        
-        for window_name, window_data in windows:
-            # Skip windows with too few data points
-            if len(window_data) < 5:
-                continue
-            
-            # Count each motion type
-            motion_counts = window_data['motion_label'].value_counts()
-            total_samples = len(window_data)
-            
-            # Calculate percentages
-            motion_percentages = {}
-            for motion in self.motion_labels:
-                if motion in motion_counts:
-                    motion_percentages[motion] = motion_counts[motion] / total_samples * 100
-                else:
-                    motion_percentages[motion] = 0
-            
-            # Find longest consecutive sequence for each motion
-            motions = window_data['motion_label'].tolist()
-            max_consecutive = {motion: 0 for motion in self.motion_labels}
-            current_motion = None
-            current_count = 0
-            
-            for motion in motions:
-                if motion == current_motion:
-                    current_count += 1
-                else:
-                    if current_motion is not None and current_motion in max_consecutive and current_count > max_consecutive[current_motion]:
-                        max_consecutive[current_motion] = current_count
-                    current_motion = motion
-                    current_count = 1
-            
-            # Check last motion
-            if current_motion is not None and current_motion in max_consecutive and current_count > max_consecutive[current_motion]:
-                max_consecutive[current_motion] = current_count
-            
-            # Count transitions between different motions
-            transitions = 0
-            prev_motion = None
-            
-            for motion in motions:
-                if prev_motion is not None and motion != prev_motion:
-                    transitions += 1
-                prev_motion = motion
-            
-            # Determine the pattern for this segment
-            pattern = self.determine_pattern(motion_percentages, max_consecutive, transitions)
-            
-            # Store segment data
-            segment = {
-                'start_time': window_name,
-                'end_time': window_name + timedelta(seconds=self.window_size),
-                'resting_pct': motion_percentages.get('resting', 0),
-                'idle_pct': motion_percentages.get('idle', 0),
-                'walking_pct': motion_percentages.get('walking', 0),
-                'running_pct': motion_percentages.get('running', 0),
-                'max_consecutive_resting': max_consecutive.get('resting', 0),
-                'max_consecutive_idle': max_consecutive.get('idle', 0),
-                'max_consecutive_walking': max_consecutive.get('walking', 0),
-                'max_consecutive_running': max_consecutive.get('running', 0),
-                'transitions': transitions,
-                'samples': total_samples,
-                'pattern': pattern
-            }
-            
-            segments.append(segment)
-        
-        # Create DataFrame of segments
-        segments_df = pd.DataFrame(segments)
-        
-        if len(segments_df) == 0:
-            print("No valid segments found in the data.")
-        else:
-            print(f"Created {len(segments_df)} segments.")
-            
-            # Check values in the first segment
-            if len(segments_df) > 0:
-                first_segment = segments_df.iloc[0]
-                print("\nFirst segment details:")
-                for col in ['resting_pct', 'idle_pct', 'walking_pct', 'running_pct']:
-                    print(f"  {col}: {first_segment[col]:.2f}%")
-        
-        return segments_df
-    
-    def determine_pattern(self, percentages, max_consecutive, transitions):
-        """Determine the pattern for a segment based on simple rules."""
-        # Check each pattern definition
-        for pattern_name, rules in self.pattern_definitions.items():
-            for rule in rules:
-                # Check if this rule matches
-                rule_matches = True
-                
-                # Check motion percentages
-                if 'min_percentage' in rule and rule['motions']:
-                    total_pct = sum(percentages.get(m, 0) for m in rule['motions'])
-                    if total_pct < rule['min_percentage'] * 100:
-                        rule_matches = False
-                
-                # Check consecutive counts
-                if 'min_consecutive' in rule and rule['motions']:
-                    max_cons = max([max_consecutive.get(m, 0) for m in rule['motions']])
-                    if max_cons < rule['min_consecutive']:
-                        rule_matches = False
-                
-                # Check transitions
-                if 'min_transitions' in rule and transitions < rule['min_transitions']:
-                    rule_matches = False
-                
-                # If this rule matches, return the pattern
-                if rule_matches:
-                    return pattern_name
-        
-        # If no patterns match, return unknown
-        return "unknown"
-    
-    def visualize_results(self, segments_df):
-        """Create visualizations of the motion patterns."""
-        if len(segments_df) == 0:
-            print("No data to visualize.")
-            return
-        
-        # Create a detailed summary of motion patterns
-        print("\n===== MOTION PATTERN SUMMARY =====")
-        pattern_counts = segments_df['pattern'].value_counts()
-        for pattern, count in pattern_counts.items():
-            print(f"{pattern}: {count} segments ({count/len(segments_df)*100:.1f}%)")
-        
-        # Print the 3 most recent segments in detail
-        print("\n===== MOST RECENT SEGMENTS =====")
-        recent_segments = segments_df.sort_values('end_time', ascending=False).head(3)
-        
-        for i, (_, segment) in enumerate(recent_segments.iterrows()):
-            print(f"\nSegment {i+1} ({segment['start_time'].strftime('%H:%M:%S')} - {segment['end_time'].strftime('%H:%M:%S')}):")
-            print(f"  Pattern: {segment['pattern']}")
-            print(f"  Motion breakdown: {segment['resting_pct']:.1f}% resting, {segment['idle_pct']:.1f}% idle, " +
-                  f"{segment['walking_pct']:.1f}% walking, {segment['running_pct']:.1f}% running")
-            print(f"  Longest sequences: {segment['max_consecutive_resting']} resting, {segment['max_consecutive_idle']} idle, " +
-                  f"{segment['max_consecutive_walking']} walking, {segment['max_consecutive_running']} running")
-            print(f"  Motion transitions: {segment['transitions']}")
-        
-        # Create bar chart of motion percentages by time - FIXED VERSION
-        plt.figure(figsize=(12, 6))
-        
-        # Sort by start time
-        plot_df = segments_df.sort_values('start_time')
-        
-        # Create time labels
-        time_labels = [t.strftime('%H:%M:%S') for t in plot_df['start_time']]
-        
-        # Debug information about the data being plotted
-        print("\nDebug info for motion breakdown chart:")
-        print(f"Number of time segments: {len(time_labels)}")
-        
-        # Check if there are any non-zero values
-        has_data = False
-        for motion in ['resting', 'idle', 'walking', 'running']:
-            col = f"{motion}_pct"
-            if col in plot_df.columns and plot_df[col].sum() > 0:
-                has_data = True
-                print(f"  {motion}: Sum={plot_df[col].sum():.1f}, Max={plot_df[col].max():.1f}%, Min={plot_df[col].min():.1f}%")
-        
-        if not has_data:
-            print("Warning: No motion data found to plot!")
-        
-        # Create the stacked bar chart with explicit columns rather than dynamic lookup
-        bar_width = 0.8
-        bottom = np.zeros(len(plot_df))
-        
-        # Define motion colors
-        motion_colors = {
-            'resting': 'lightgray',
-            'idle': 'darkgray',
-            'walking': 'skyblue',
-            'running': 'orange'
-        }
-        
-        # Plot each motion type
-        for motion, color in motion_colors.items():
-            column = f"{motion}_pct"
-            if column in plot_df.columns:
-                # Convert percentage to proportion (0-1)
-                values = plot_df[column].values / 100
-                plt.bar(time_labels, values, bar_width, bottom=bottom, label=motion, color=color)
-                bottom += values
-        
-        plt.xlabel('Time')
-        plt.ylabel('Percentage')
-        plt.title('Motion Breakdown by Time Segment')
-        plt.legend(loc='upper right')
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        # Save the figure
-        plt.savefig('motion_breakdown.png')
-        print("\nSaved motion breakdown chart to 'motion_breakdown.png'")
-        
-        # Create pattern timeline
-        plt.figure(figsize=(12, 3))
-        
-        # Create y-positions for each pattern
-        pattern_types = sorted(segments_df['pattern'].unique())
-        pattern_positions = {pattern: i for i, pattern in enumerate(pattern_types)}
-        
-        # Plot each segment as a horizontal line
-        for _, segment in plot_df.iterrows():
-            pattern = segment['pattern']
-            start = segment['start_time']
-            end = segment['end_time']
-            y_pos = pattern_positions[pattern]
-            
-            plt.hlines(y=y_pos, xmin=start, xmax=end, 
-                       linewidth=10, color=self.get_pattern_color(pattern))
-        
-        # Set y-ticks to pattern names
-        plt.yticks(list(pattern_positions.values()), list(pattern_positions.keys()))
-        
-        plt.xlabel('Time')
-        plt.title('Motion Patterns Timeline')
-        plt.tight_layout()
-        
-        # Save the figure
-        plt.savefig('pattern_timeline.png')
-        print("Saved pattern timeline chart to 'pattern_timeline.png'")
-        
-        # Try to display the plots
-        try:
-            plt.show()
-        except Exception as e:
-            print(f"Unable to display plots: {e}")
-            print("The images have been saved to files.")
-    
-    def get_pattern_color(self, pattern):
-        """Return color for a given pattern."""
-        colors = {
-            'active': 'red',
-            'stationary': 'blue',
-            'mixed': 'green',
-            'unknown': 'gray'
-        }
-        return colors.get(pattern, 'gray')
-
-def main():
-    """Main function to demonstrate pattern recognition with fixed visualization."""
-    print("\n===== FIXED MOTION PATTERN RECOGNITION =====")
-    print("This script analyzes recent motion data and identifies patterns")
-    print("with an improved motion breakdown visualization.")
-    
-    # Create the recognizer
-    recognizer = FixedPatternRecognizer()
-    
-    # Fetch recent data (last hour to increase chances of finding data)
-    df = recognizer.fetch_recent_data(minutes=60)
-    
-    if len(df) > 0:
-        # Analyze the data
-        print("\nAnalyzing motion data into 15-second segments...")
-        segments = recognizer.analyze_motion_segments(df)
-        
-        if len(segments) > 0:
-            # Visualize the results
-            recognizer.visualize_results(segments)
-        else:
-            print("\nNo valid segments found in the data.")
-            print("Try running your motion detection script for a few minutes")
-            print("while performing various activities to collect more data.")
-    else:
-        print("\nNo data found for analysis.")
-        print("Make sure your motion detection script is running and collecting data.")
-        print("Try the following troubleshooting steps:")
-        print("1. Check that your Arduino and MPU6050 are properly connected")
-        print("2. Verify that your motion detection script is running and correctly storing data")
-        print("3. Confirm that the MySQL database connection is working")
-
-if __name__ == "__main__":
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+from matplotlib.figure import Figure
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.patches import Patch
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from concurrent.futures import ProcessPoolExecutor
+import os
+from motion_storage import SENSOR_COLUMNS, STORAGE_ERRORS, create_storage, rows_to_frame, expand_holds
+from motion_pool import open_resilient_storage
+from motion_cadence import segment_cadence
+from motion_patterns import MIN_SEGMENT_SAMPLES, MotionPatternRules
+
+# MySQL Database Configuration
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'motion_app',
+    'password': 'motion123',
+    'database': 'motion_data'
+}
+
+# Where the ingest script stores samples: 'mysql', 'sqlite', 'parquet' or 'standin'
+STORAGE_BACKEND = 'mysql'
+
+# Streaming loader configuration
+FETCH_CHUNK_ROWS = 50000  # Rows pulled from the server per chunk
+
+# Chart output
+HEADLESS_CHARTS = False  # True: render off-screen (Agg) and only save the PNGs, e.g. on a server
+PARALLEL_CHARTS = False  # Headless only: render the two figures in separate processes
+CHART_DPI = 100
+BREAKDOWN_FIGSIZE = (12, 6)
+TIMELINE_FIGSIZE = (12, 3)
+
+# Incremental analysis cache
+SEGMENT_CACHE_FILE = 'motion_segments_cache.pkl'
+SEGMENT_CACHE_RETENTION_MINUTES = 7 * 24 * 60  # Segments older than this are pruned
+
+class SegmentCache:
+    """Persisted segments keyed by window start and window size, plus a high-water mark.
+    
+    The segments are only valid for the window size, pattern rules and store
+    (whose row ids the high-water mark counts) they were built with; a cache
+    file built with any other is discarded on load.
+    """
+    
+    def __init__(self, path=SEGMENT_CACHE_FILE, window_size=15, retention_minutes=SEGMENT_CACHE_RETENTION_MINUTES,
+                 rules_hash=None, source=None):
+        self.path = path
+        self.window_size = window_size
+        self.retention_minutes = retention_minutes
+        self.rules_hash = rules_hash
+        self.source = source
+        self.reset()
+    
+    def reset(self, covered_from=None):
+        """Forget every cached segment."""
+        self.segments = pd.DataFrame()
+        
+        # Highest sensor_data.id already folded into the segments
+        self.high_water_id = 0
+        
+        # Earliest timestamp the cached segments are complete from
+        self.covered_from = covered_from
+    
+    def load(self):
+        """Read the cache file; a missing file or different window size, rules or store starts fresh."""
+        self.reset()
+        if not os.path.exists(self.path):
+            return
+        state = pd.read_pickle(self.path)
+        if state.get('window_size') != self.window_size:
+            print("Segment cache was built with a different window size, rebuilding.")
+            return
+        if state.get('rules_hash') != self.rules_hash:
+            print("Segment cache was built with different pattern rules, rebuilding.")
+            return
+        if state.get('source') != self.source:
+            print(f"Segment cache was built from {state.get('source')}, not {self.source}, rebuilding.")
+            return
+        self.segments = state['segments']
+        self.high_water_id = state['high_water_id']
+        self.covered_from = state['covered_from']
+    
+    def save(self):
+        """Write the cache atomically (temp file + rename)."""
+        temp_path = self.path + '.tmp'
+        pd.to_pickle({
+            'window_size': self.window_size,
+            'rules_hash': self.rules_hash,
+            'source': self.source,
+            'high_water_id': self.high_water_id,
+            'covered_from': self.covered_from,
+            'segments': self.segments
+        }, temp_path)
+        os.replace(temp_path, self.path)
+    
+    def merge(self, segments_df, touched_windows):
+        """Replace every touched window with its freshly computed segment."""
+        parts = []
+        if len(self.segments) > 0:
+            parts.append(self.segments[~self.segments['start_time'].isin(touched_windows)])
+        if len(segments_df) > 0:
+            parts.append(segments_df)
+        parts = [part for part in parts if len(part) > 0]
+        
+        if parts:
+            self.segments = pd.concat(parts, ignore_index=True).sort_values('start_time', ignore_index=True)
+        else:
+            self.segments = pd.DataFrame()
+    
+    def prune(self, now):
+        """Drop segments older than the retention period."""
+        cutoff = now - timedelta(minutes=self.retention_minutes)
+        if self.covered_from is None or self.covered_from >= cutoff:
+            return
+        self.covered_from = cutoff
+        if len(self.segments) > 0:
+            self.segments = self.segments[self.segments['start_time'] >= cutoff].reset_index(drop=True)
+
+# Chart rendering
+MOTION_COLORS = {
+    'resting': 'lightgray',
+    'idle': 'darkgray',
+    'walking': 'skyblue',
+    'running': 'orange'
+}
+PATTERN_COLORS = {
+    'active': 'red',
+    'stationary': 'blue',
+    'mixed': 'green',
+    'unknown': 'gray'
+}
+
+def _date_numbers(values):
+    """Matplotlib date numbers (days) for datetime-like values."""
+    return mdates.date2num(pd.to_datetime(values).to_numpy('datetime64[us]'))
+
+def aggregate_breakdown(plot_df, max_bars):
+    """Motion proportions per bar, with segments pooled into at most max_bars time bins.
+    
+    Returns {'left': [...], 'width': [...], motion: proportions, ...}, x values in
+    matplotlib date numbers; bins are sample-weighted so a bar is the true mix.
+    """
+    start = _date_numbers(plot_df['start_time'])
+    end = _date_numbers(plot_df['end_time'])
+    columns = [motion for motion in MOTION_COLORS if f"{motion}_pct" in plot_df.columns]
+    
+    if len(plot_df) <= max_bars:
+        # One bar per segment (the original chart)
+        bars = {'left': start, 'width': end - start}
+        for motion in columns:
+            bars[motion] = plot_df[f"{motion}_pct"].to_numpy(np.float64) / 100
+        return bars
+    
+    # Equal-width time bins over the whole range; empty bins are dropped
+    edges = np.linspace(start.min(), end.max(), max_bars + 1)
+    bin_index = np.clip(np.searchsorted(edges, start, side='right') - 1, 0, max_bars - 1)
+    weights = (plot_df['samples'].to_numpy(np.float64) if 'samples' in plot_df.columns
+               else np.ones(len(plot_df)))
+    totals = np.bincount(bin_index, weights=weights, minlength=max_bars)
+    used = totals > 0
+    
+    bars = {'left': edges[:-1][used], 'width': np.diff(edges)[used]}
+    for motion in columns:
+        weighted = np.bincount(bin_index, weights=plot_df[f"{motion}_pct"].to_numpy(np.float64) * weights,
+                               minlength=max_bars)
+        bars[motion] = weighted[used] / totals[used] / 100
+    return bars
+
+def timeline_runs(plot_df, pattern_types, width_px):
+    """Pattern timeline as (x0, x1, row) arrays, merged down to at most width_px runs per row.
+    
+    Segments of the same pattern that touch (or land in the same pixel) become
+    one run, so a month of 15 s segments draws as a few thousand lines.
+    """
+    start = _date_numbers(plot_df['start_time'])
+    end = _date_numbers(plot_df['end_time'])
+    span = max(end.max() - start.min(), 1e-9)
+    pixel = span / width_px
+    origin = start.min()
+    
+    x0, x1, rows = [], [], []
+    patterns = plot_df['pattern'].to_numpy(object)
+    for row, pattern in enumerate(pattern_types):
+        mask = patterns == pattern
+        left = np.floor((start[mask] - origin) / pixel)
+        right = np.maximum(np.ceil((end[mask] - origin) / pixel), left + 1)
+        order = np.argsort(left, kind='stable')
+        left, right = left[order], right[order]
+        
+        # A new run starts where this segment begins after every earlier one ended
+        reach = np.maximum.accumulate(right)
+        new_run = np.ones(len(left), dtype=bool)
+        new_run[1:] = left[1:] > reach[:-1]
+        x0.append(origin + left[new_run] * pixel)
+        x1.append(origin + np.maximum.reduceat(right, np.flatnonzero(new_run)) * pixel)
+        rows.append(np.full(int(new_run.sum()), row))
+    
+    return np.concatenate(x0), np.concatenate(x1), np.concatenate(rows)
+
+def _format_date_axis(ax):
+    """Datetime x axis with automatically thinned, concise tick labels."""
+    locator = mdates.AutoDateLocator(minticks=4, maxticks=12)
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+    ax.xaxis_date()
+
+def draw_breakdown(fig, bars):
+    """Stacked motion breakdown bars (one PolyCollection per motion, not one patch per bar)."""
+    ax = fig.add_subplot()
+    left = bars['left']
+    right = left + bars['width'] * 0.8
+    bottom = np.zeros(len(left))
+    for motion, color in MOTION_COLORS.items():
+        if motion in bars:
+            top = bottom + bars[motion]
+            corners = np.stack([np.column_stack([left, bottom]), np.column_stack([left, top]),
+                                np.column_stack([right, top]), np.column_stack([right, bottom])], axis=1)
+            ax.add_collection(PolyCollection(corners, facecolors=color, linewidths=0, label=motion))
+            bottom = top
+    ax.set_xlim(left.min(), right.max())
+    ax.set_ylim(0, max(bottom.max(), 1.0) * 1.05)
+    ax.legend(handles=[Patch(color=color, label=motion) for motion, color in MOTION_COLORS.items() if motion in bars],
+              loc='upper right')
+    _format_date_axis(ax)
+    ax.set_xlabel('Time')
+    ax.set_ylabel('Percentage')
+    ax.set_title('Motion Breakdown by Time Segment')
+    fig.tight_layout()
+
+def draw_timeline(fig, runs, pattern_types):
+    """Pattern timeline drawn as a single LineCollection."""
+    ax = fig.add_subplot()
+    x0, x1, rows = runs
+    lines = np.stack([np.column_stack([x0, rows]), np.column_stack([x1, rows])], axis=1)
+    colors = [PATTERN_COLORS.get(pattern_types[row], 'gray') for row in rows.tolist()]
+    ax.add_collection(LineCollection(lines, colors=colors, linewidths=10))
+    ax.set_xlim(x0.min(), x1.max())
+    ax.set_ylim(-0.5, len(pattern_types) - 0.5)
+    _format_date_axis(ax)
+    ax.set_yticks(range(len(pattern_types)), pattern_types)
+    ax.set_xlabel('Time')
+    ax.set_title('Motion Patterns Timeline')
+    fig.tight_layout()
+
+def render_chart(kind, data, path, figsize, dpi=CHART_DPI):
+    """Draw one chart on a standalone Agg canvas and save it (no pyplot state, safe in a worker)."""
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    if kind == 'breakdown':
+        draw_breakdown(fig, data)
+    else:
+        draw_timeline(fig, *data)
+    fig.savefig(path)
+    return path
+
+class FixedPatternRecognizer(MotionPatternRules):
+    """Recognizes motion patterns with fixed motion breakdown visualization."""
+    
+    def __init__(self, storage=None):
+        # Sample store (opened on first use so connection errors are reported there)
+        self.storage = storage
+    
+        # Window size, motion labels and pattern rules
+        super().__init__()
+    
+    def get_storage(self):
+        """Return the storage backend, connecting to STORAGE_BACKEND on first use."""
+        if self.storage is None:
+            # Reads reconnect with backoff; there is nothing to spill, so no journal
+            self.storage = open_resilient_storage(STORAGE_BACKEND, DB_CONFIG)
+        return self.storage
+    
+    def storage_identity(self):
+        """Identity of the store get_storage() reads, without connecting to it."""
+        return (self.storage or create_storage(STORAGE_BACKEND, DB_CONFIG)).identity()
+    
+    def iter_recent_chunks(self, minutes=60, chunk_rows=FETCH_CHUNK_ROWS):
+        """Stream motion data from the last `minutes` as typed DataFrame chunks."""
+        end_time = datetime.now()
+        start_time = end_time - timedelta(minutes=minutes)
+        return self.iter_range_chunks(start_time, chunk_rows=chunk_rows)
+    
+    def iter_range_chunks(self, start_time, end_time=None, chunk_rows=FETCH_CHUNK_ROWS):
+        """Stream rows with start_time <= timestamp < end_time as typed DataFrame chunks, one row per sample."""
+        # Backends stream (MySQL: unbuffered cursor), so only one chunk is held at a time;
+        # hold records are expanded back into the samples they stand for
+        return (expand_holds(chunk) for chunk in self.get_storage().iter_range(start_time, end_time, chunk_rows))
+    
+    def fetch_new_windows(self, after_id, start_time, chunk_rows=FETCH_CHUNK_ROWS):
+        """Return (windows touched by rows with id > after_id, highest id seen)."""
+        touched = set()
+        high_water_id = after_id
+        for ids, timestamps in self.get_storage().iter_new_rows(after_id, start_time, chunk_rows):
+            windows = pd.DatetimeIndex(timestamps).floor(f"{self.window_size}s")
+            touched.update(windows.unique())
+            high_water_id = max(high_water_id, int(ids.max()))
+        
+        return sorted(touched), high_water_id
+    
+    def analyze_incremental(self, minutes=60, cache=None):
+        """Analyze only rows added since the last run, reusing cached segments.
+        
+        Late rows (new id, old timestamp) re-analyze just the windows they fall in.
+        """
+        cache = cache or SegmentCache(window_size=self.window_size)
+        cache.rules_hash = self.rules_hash()
+        cache.source = self.storage_identity()
+        cache.load()
+        
+        now = datetime.now()
+        start_time = pd.Timestamp(now - timedelta(minutes=minutes)).floor(f"{self.window_size}s")
+        
+        # Asking for more history than the cache covers means a rebuild from there
+        if cache.covered_from is None or start_time < cache.covered_from:
+            cache.reset(covered_from=start_time)
+        
+        try:
+            touched, high_water_id = self.fetch_new_windows(cache.high_water_id, cache.covered_from)
+            print(f"{len(touched)} time windows changed since the last run.")
+            
+            # Refetch each run of consecutive touched windows in full and re-analyze it
+            step = timedelta(seconds=self.window_size)
+            ranges = []
+            for window in touched:
+                if ranges and ranges[-1][1] == window:
+                    ranges[-1][1] = window + step
+                else:
+                    ranges.append([window, window + step])
+            
+            fresh = [self.analyze_motion_chunks(self.iter_range_chunks(range_start, range_end), verbose=False)
+                     for range_start, range_end in ranges]
+            fresh = [segments for segments in fresh if len(segments) > 0]
+            
+            cache.merge(pd.concat(fresh, ignore_index=True) if fresh else pd.DataFrame(), touched)
+            cache.high_water_id = high_water_id
+            cache.prune(now)
+            cache.save()
+            
+            if len(cache.segments) == 0:
+                self.print_database_diagnostics()
+            
+        except STORAGE_ERRORS as e:
+            print(f"Database error: {e}")
+            print("Showing cached segments only.")
+        
+        if len(cache.segments) == 0:
+            return cache.segments
+        segments_df = cache.segments[cache.segments['start_time'] >= start_time].reset_index(drop=True)
+        self.print_segment_summary(segments_df)
+        return segments_df
+    
+    def rows_to_frame(self, rows):
+        """Build a DataFrame straight from typed column arrays."""
+        return rows_to_frame(rows)
+    
+    def fetch_recent_data(self, minutes=60):
+        """Fetch motion data from the last hour (or specified minutes)."""
+        try:
+            # Calculate time range
+            end_time = datetime.now()
+            start_time = end_time - timedelta(minutes=minutes)
+            
+            print(f"Fetching data from {start_time} to {end_time}...")
+            
+            # Stream the window in chunks and join them once
+            chunks = list(self.iter_recent_chunks(minutes))
+            
+            # Check for empty result
+            if not chunks:
+                print(f"No data found since {start_time}")
+                self.print_database_diagnostics()
+                
+                # Create empty DataFrame
+                df = pd.DataFrame(columns=list(SENSOR_COLUMNS))
+            else:
+                # Create DataFrame
+                df = pd.concat(chunks, ignore_index=True)
+                
+                # Convert timestamp to datetime
+                df['timestamp'] = pd.to_datetime(df['timestamp'])
+                
+                print(f"Found {len(df)} data points from the last {minutes} minutes.")
+                
+                # Check distribution of motion labels in this data
+                label_counts = df['motion_label'].value_counts()
+                print("Motion label distribution in recent data:")
+                for label, count in label_counts.items():
+                    print(f"  {label}: {count} records")
+            
+            return df
+            
+        except STORAGE_ERRORS as e:
+            print(f"Database error: {e}")
+            return pd.DataFrame()  # Return empty DataFrame on error
+    
+    def print_database_diagnostics(self):
+        """Explain an empty result from the ingest-time rollups (no raw table scans)."""
+        # Check if there's any data at all (one rollup row per session and label)
+        total_count, latest, dist = self.get_storage().summary()
+        
+        if total_count > 0:
+            print(f"Total records in database: {total_count}")
+            print(f"Most recent record timestamp: {latest}")
+            print(f"Current time: {datetime.now()}")
+            
+            if latest:
+                time_diff = datetime.now() - latest
+                print(f"Data is {time_diff.total_seconds()/60:.1f} minutes old")
+                
+            # Check distribution of motion labels
+            print("Motion label distribution:")
+            for label, count in dist:
+                print(f"  {label}: {count} records")
+        else:
+            print("No data found in the database at all.")
+    
+    def analyze_motion_chunks(self, chunks, verbose=True):
+        """Analyze time-ordered DataFrame chunks without holding them all in memory."""
+        parts = []
+        carry = None
+        
+        for chunk in chunks:
+            if carry is not None:
+                chunk = pd.concat([carry, chunk], ignore_index=True)
+            
+            # The last window may continue in the next chunk, so hold it back
+            windows = pd.to_datetime(chunk['timestamp']).dt.floor(f"{self.window_size}s")
+            complete = (windows < windows.iloc[-1]).to_numpy()
+            carry = chunk[~complete]
+            
+            if complete.any():
+                parts.append(self.analyze_motion_segments(chunk[complete], verbose=False))
+        
+        if carry is not None and len(carry) > 0:
+            parts.append(self.analyze_motion_segments(carry, verbose=False))
+        
+        parts = [part for part in parts if len(part) > 0]
+        segments_df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+        if verbose:
+            self.print_segment_summary(segments_df)
+        return segments_df
+    
+    def analyze_motion_segments(self, df, verbose=True):
+        """Break the data into segments and analyze each segment."""
+        if len(df) == 0:
+            if verbose:
+                print("No data to analyze.")
+            return pd.DataFrame()
+            
+        # Group data into time windows (15 second segments)
+        time_window = pd.to_datetime(df['timestamp']).dt.floor(f"{self.window_size}s").to_numpy()
+        
+        # Encode labels as integer codes: 0..K-1 for motion_labels, K for anything else
+        num_labels = len(self.motion_labels)
+        label_codes = pd.Index(self.motion_labels).get_indexer(df['motion_label']).astype(np.int64)
+        label_codes[label_codes < 0] = num_labels
+        
+        # Raw factorized labels decide runs/transitions, so unlisted labels stay distinct
+        raw_codes = pd.factorize(df['motion_label'])[0]
+        
+        # Stable sort by window keeps each window's rows in their original order
+        order = np.argsort(time_window, kind='stable')
+        time_window = time_window[order]
+        label_codes = label_codes[order]
+        raw_codes = raw_codes[order]
+        
+        # Window boundaries and a dense window id per row
+        window_start = np.empty(len(order), dtype=bool)
+        window_start[0] = True
+        window_start[1:] = time_window[1:] != time_window[:-1]
+        window_id = np.cumsum(window_start) - 1
+        num_windows = int(window_id[-1]) + 1
+        
+        samples = np.bincount(window_id, minlength=num_windows)
+        
+        # Step cadence of each window's accel magnitude (stored rows carry the axes)
+        cadence = None
+        if {'accel_x', 'accel_y', 'accel_z'}.issubset(df.columns):
+            axes = df[['accel_x', 'accel_y', 'accel_z']].to_numpy(np.float64)[order]
+            accel = np.sqrt(axes[:, 0] * axes[:, 0] + axes[:, 1] * axes[:, 1] + axes[:, 2] * axes[:, 2])
+            cadence = segment_cadence(accel, np.flatnonzero(window_start))
+        
+        # Count each motion type per window with one flat bincount
+        counts = np.bincount(window_id * (num_labels + 1) + label_codes,
+                             minlength=num_windows * (num_labels + 1)).reshape(num_windows, num_labels + 1)
+        
+        # Run-length encoding: a run starts at every label change or window start
+        run_start = window_start.copy()
+        run_start[1:] |= raw_codes[1:] != raw_codes[:-1]
+        
+        # Count transitions between different motions (label changes inside a window)
+        transitions = np.bincount(window_id[run_start & ~window_start], minlength=num_windows)
+        
+        # Find longest consecutive sequence for each motion
+        run_positions = np.flatnonzero(run_start)
+        run_lengths = np.diff(np.append(run_positions, len(order)))
+        max_consecutive = np.zeros((num_windows, num_labels + 1), dtype=np.int64)
+        np.maximum.at(max_consecutive, (window_id[run_positions], label_codes[run_positions]), run_lengths)
+        
+        # Skip windows with too few data points
+        keep = samples >= MIN_SEGMENT_SAMPLES
+        window_names = pd.to_datetime(time_window[window_start][keep])
+        samples = samples[keep]
+        counts = counts[keep]
+        transitions = transitions[keep]
+        max_consecutive = max_consecutive[keep]
+        if cadence is not None:
+            cadence = [values[keep] for values in cadence]
+        
+        # Calculate percentages
+        percentages = counts[:, :num_labels] / samples[:, None] * 100
+        max_consecutive = max_consecutive[:, :num_labels]
+        
+        # Determine the pattern for each segment with the compiled rules
+        patterns = self.pattern_rules.evaluate(percentages, max_consecutive, transitions)
+        
+        motion_percentages = {motion: percentages[:, i] for i, motion in enumerate(self.motion_labels)}
+        max_consecutive = {motion: max_consecutive[:, i] for i, motion in enumerate(self.motion_labels)}
+        zeros = np.zeros(len(samples), dtype=np.int64)
+        
+        segments = {
+            'start_time': window_names,
+            'end_time': window_names + timedelta(seconds=self.window_size),
+            'resting_pct': motion_percentages.get('resting', zeros),
+            'idle_pct': motion_percentages.get('idle', zeros),
+            'walking_pct': motion_percentages.get('walking', zeros),
+            'running_pct': motion_percentages.get('running', zeros),
+            'max_consecutive_resting': max_consecutive.get('resting', zeros),
+            'max_consecutive_idle': max_consecutive.get('idle', zeros),
+            'max_consecutive_walking': max_consecutive.get('walking', zeros),
+            'max_consecutive_running': max_consecutive.get('running', zeros),
+            'transitions': transitions,
+            'samples': samples,
+            'pattern': patterns
+        }
+        if cadence is not None:
+            segments['cadence_hz'], segments['cadence_strength'] = cadence
+        
+        # Create DataFrame of segments
+        segments_df = pd.DataFrame(segments) if len(samples) > 0 else pd.DataFrame()
+        
+        if verbose:
+            self.print_segment_summary(segments_df)
+        
+        return segments_df
+    
+    def print_segment_summary(self, segments_df):
+        """Print the segment count and the first segment's motion breakdown."""
+        if len(segments_df) == 0:
+            print("No valid segments found in the data.")
+        else:
+            print(f"Created {len(segments_df)} segments.")
+            
+            # Check values in the first segment
+            if len(segments_df) > 0:
+                first_segment = segments_df.iloc[0]
+                print("\nFirst segment details:")
+                for col in ['resting_pct', 'idle_pct', 'walking_pct', 'running_pct']:
+                    print(f"  {col}: {first_segment[col]:.2f}%")
+                if 'cadence_hz' in segments_df:
+                    print(f"  cadence: {first_segment['cadence_hz']:.2f} Hz (strength {first_segment['cadence_strength']:.2f})")
+    
+    def visualize_results(self, segments_df, headless=HEADLESS_CHARTS, parallel=PARALLEL_CHARTS):
+        """Create visualizations of the motion patterns."""
+        if len(segments_df) == 0:
+            print("No data to visualize.")
+            return
+        
+        # Create a detailed summary of motion patterns
+        print("\n===== MOTION PATTERN SUMMARY =====")
+        pattern_counts = segments_df['pattern'].value_counts()
+        for pattern, count in pattern_counts.items():
+            print(f"{pattern}: {count} segments ({count/len(segments_df)*100:.1f}%)")
+        
+        # Print the 3 most recent segments in detail
+        print("\n===== MOST RECENT SEGMENTS =====")
+        recent_segments = segments_df.sort_values('end_time', ascending=False).head(3)
+        
+        for i, (_, segment) in enumerate(recent_segments.iterrows()):
+            print(f"\nSegment {i+1} ({segment['start_time'].strftime('%H:%M:%S')} - {segment['end_time'].strftime('%H:%M:%S')}):")
+            print(f"  Pattern: {segment['pattern']}")
+            print(f"  Motion breakdown: {segment['resting_pct']:.1f}% resting, {segment['idle_pct']:.1f}% idle, " +
+                  f"{segment['walking_pct']:.1f}% walking, {segment['running_pct']:.1f}% running")
+            print(f"  Longest sequences: {segment['max_consecutive_resting']} resting, {segment['max_consecutive_idle']} idle, " +
+                  f"{segment['max_consecutive_walking']} walking, {segment['max_consecutive_running']} running")
+            print(f"  Motion transitions: {segment['transitions']}")
+        
+        # Sort by start time
+        plot_df = segments_df.sort_values('start_time')
+        
+        # Debug information about the data being plotted
+        print("\nDebug info for motion breakdown chart:")
+        print(f"Number of time segments: {len(plot_df)}")
+        
+        # Check if there are any non-zero values
+        has_data = False
+        for motion in ['resting', 'idle', 'walking', 'running']:
+            col = f"{motion}_pct"
+            if col in plot_df.columns and plot_df[col].sum() > 0:
+                has_data = True
+                print(f"  {motion}: Sum={plot_df[col].sum():.1f}, Max={plot_df[col].max():.1f}%, Min={plot_df[col].min():.1f}%")
+        
+        if not has_data:
+            print("Warning: No motion data found to plot!")
+        
+        # Reduce both charts to what the figure width can show (one bar or run
+        # per pixel at most), so drawing time doesn't grow with the segment count
+        width_px = int(BREAKDOWN_FIGSIZE[0] * CHART_DPI)
+        bars = aggregate_breakdown(plot_df, max_bars=width_px // 2)
+        pattern_types = sorted(segments_df['pattern'].unique())
+        runs = timeline_runs(plot_df, pattern_types, width_px)
+        if len(bars['left']) < len(plot_df):
+            print(f"Chart pooled {len(plot_df)} segments into {len(bars['left'])} bars")
+        
+        charts = [('breakdown', bars, 'motion_breakdown.png', BREAKDOWN_FIGSIZE),
+                  ('timeline', (runs, pattern_types), 'pattern_timeline.png', TIMELINE_FIGSIZE)]
+        
+        if headless:
+            # Off-screen Agg canvases, optionally one process per figure
+            if parallel:
+                with ProcessPoolExecutor(max_workers=len(charts)) as pool:
+                    list(pool.map(render_chart, *zip(*charts)))
+            else:
+                for chart in charts:
+                    render_chart(*chart)
+            print("\nSaved motion breakdown chart to 'motion_breakdown.png'")
+            print("Saved pattern timeline chart to 'pattern_timeline.png'")
+            return
+        
+        # Interactive: the same drawing code on pyplot figures
+        for kind, data, path, figsize in charts:
+            fig = plt.figure(figsize=figsize, dpi=CHART_DPI)
+            if kind == 'breakdown':
+                draw_breakdown(fig, data)
+            else:
+                draw_timeline(fig, *data)
+            fig.savefig(path)
+        print("\nSaved motion breakdown chart to 'motion_breakdown.png'")
+        print("Saved pattern timeline chart to 'pattern_timeline.png'")
+        
+        # Try to display the plots
+        try:
+            plt.show()
+        except Exception as e:
+            print(f"Unable to display plots: {e}")
+            print("The images have been saved to files.")
+    
+    def get_pattern_color(self, pattern):
+        """Return color for a given pattern."""
+        return PATTERN_COLORS.get(pattern, 'gray')
+
+def main():
+    """Main function to demonstrate pattern recognition with fixed visualization."""
+    print("\n===== FIXED MOTION PATTERN RECOGNITION =====")
+    print("This script analyzes recent motion data and identifies patterns")
+    print("with an improved motion breakdown visualization.")
+    
+    # Create the recognizer
+    recognizer = FixedPatternRecognizer()
+    
+    # Analyze the last hour; only rows added since the previous run are fetched,
+    # completed segments come from the on-disk segment cache
+    print("\nAnalyzing motion data into 15-second segments...")
+    segments = recognizer.analyze_incremental(minutes=60)
+    
+    if len(segments) > 0:
+        # Visualize the results
+        recognizer.visualize_results(segments)
+    else:
+        print("\nNo data found for analysis.")
+        print("Make sure your motion detection script is running and collecting data.")
+        print("Try the following troubleshooting steps:")
+        print("1. Check that your Arduino and MPU6050 are properly connected")
+        print("2. Verify that your motion detection script is running and correctly storing data")
+        print(f"3. Confirm that the {STORAGE_BACKEND} storage backend is reachable")
+        print("4. Run it for a few minutes while performing various activities to collect more data")
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,675 @@
+import os
+import io
+import gc
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import tracemalloc
+import subprocess
+import contextlib
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from collections import deque
+
+# Render charts off-screen; must happen before pyplot is imported
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from motion_storage import SQLiteStorage
+from motion_metrics import MetricsRegistry
+from motion_replay import generate_samples, encode_csv, encode_frames, encode_edge_frames
+from test_db_connection import (WINDOW_SIZE, WRITE_BATCH_SIZE, SampleRingBuffer,
+                                RollingFeatures, SimpleMotionRecognizer, BatchMotionClassifier, DeviceSession)
+from motion_model import MODEL_WINDOW, synthetic_training_data, window_features, train_tree
+from motion_cadence import SlidingSpectrum
+from machine_learned_results import FixedPatternRecognizer
+
+# Dataset sizes (rows / samples) selectable with --scales
+SCALES = {'1k': 1000, '100k': 100000, '10m': 10000000}
+DEFAULT_SCALES = '1k,100k'  # 10m takes a while; ask for it explicitly
+
+# Streams larger than this are fed by repeating one pre-rendered block
+BLOCK_ROWS = 100000
+
+# Each benchmark repeats until it has MIN_REPEATS runs or has used TIME_BUDGET seconds
+MIN_REPEATS = 3
+MAX_REPEATS = 20
+TIME_BUDGET = 2.0
+
+RESULTS_DIR = 'benchmark_results'
+REGRESSION_THRESHOLD = 0.10  # --compare flags benchmarks this much slower
+
+MOTION_LABELS = np.array(['resting', 'idle', 'walking', 'running'], dtype=object)
+
+BENCHMARKS = []
+
+def benchmark(name, params=(None,)):
+    """Register setup(n, param) -> run callable; the returned callable is what gets timed.
+    
+    setup may attach run.measurements = {name: value} (taken outside the
+    timing, e.g. memory); they are printed and saved with the result.
+    """
+    def register(setup):
+        BENCHMARKS.append((name, params, setup))
+        return setup
+    return register
+
+# ----- Synthetic data -----
+
+def sensor_block(n, seed=0):
+    """Synthetic (millis, values) cycling resting/walking/running minutes, at most BLOCK_ROWS long."""
+    rows = min(n, BLOCK_ROWS)
+    schedule = [(name, 60) for _ in range(rows // 1800 + 1) for name in ('resting', 'walking', 'running')]
+    millis, values = generate_samples(schedule, seed=seed)
+    return millis[:rows], values[:rows]
+
+def sensor_frame(n, start_time=datetime(2025, 1, 1), seed=0):
+    """sensor_data-shaped DataFrame: 10 Hz rows with labels in runs of 1-40 samples."""
+    rng = np.random.default_rng(seed)
+    run_lengths = rng.integers(1, 41, n // 10 + 1)  # ~2n labels, trimmed to n
+    labels = np.repeat(MOTION_LABELS[rng.integers(0, len(MOTION_LABELS), len(run_lengths))], run_lengths)[:n]
+    axes = rng.normal(0, 1, (n, 6)).astype(np.float32)
+    
+    frame = pd.DataFrame({
+        'timestamp': np.datetime64(start_time, 'us') + np.arange(n) * np.timedelta64(100, 'ms'),
+        'motion_label': labels
+    })
+    for index, name in enumerate(('accel_x', 'accel_y', 'accel_z', 'gyro_x', 'gyro_y', 'gyro_z')):
+        frame[name] = axes[:, index]
+    frame['sequence_id'] = 'bench'
+    return frame
+
+def sensor_rows(n, start_time, span):
+    """One block of plain writer rows (timestamp, label, 6 axes, sequence_id, 1, None) spread over span."""
+    rows = min(n, BLOCK_ROWS)
+    frame = sensor_frame(rows)
+    timestamps = [start_time + span * (i / rows) for i in range(rows)]
+    axes = frame[['accel_x', 'accel_y', 'accel_z', 'gyro_x', 'gyro_y', 'gyro_z']].to_numpy(np.float64).tolist()
+    return [(timestamp, label, *values, 'bench', 1, None)
+            for timestamp, label, values in zip(timestamps, frame['motion_label'].tolist(), axes)]
+
+# Trained once per run; training isn't part of any timing
+_trained = {}
+
+def trained_tree():
+    """Decision tree fitted to the synthetic profiles."""
+    if 'tree' not in _trained:
+        values, labels = synthetic_training_data('resting:300,walking:300,running:300')
+        _trained['tree'] = train_tree(window_features(values), labels[MODEL_WINDOW - 1:])
+    return _trained['tree']
+
+def repeat_block(block, n):
+    """Yield (block slice, count) pieces totalling n items."""
+    remaining = n
+    while remaining > 0:
+        count = min(remaining, len(block))
+        yield block[:count], count
+        remaining -= count
+
+# ----- Ingest script -----
+
+class OriginalMotionRecognizer:
+    """The recognizer as first written: a deque of dicts, every statistic recomputed per sample.
+    
+    Kept verbatim (apart from the name) as the reference for the parity tests
+    and the ingest.recognizer_add_and_recognize[original] timing.
+    """
+    
+    def __init__(self):
+        """Initialize with calibrated thresholds for the reliable motion types."""
+        # Baseline values for your specific sensor
+        self.baseline_accel = 9.82  # Your sensor's gravity baseline
+        
+        # Idle thresholds - keeping these exact since they work perfectly
+        self.idle_accel_range = 0.05  # Maximum deviation from baseline to be considered idle
+        self.idle_std_max = 0.03     # Maximum standard deviation for idle
+        self.idle_gyro_max = 0.05    # Maximum gyro reading for idle
+        
+        # Movement thresholds - these work well according to feedback
+        self.walk_threshold_min = 10.3  # Minimum for walking
+        self.walk_threshold_max = 14.0  # Maximum for walking
+        self.run_threshold = 14.0       # Above this is running
+        
+        # Buffer for recent samples
+        self.buffer = deque(maxlen=WINDOW_SIZE)
+        
+        # Debug mode
+        self.debug = True
+        
+        # Output throttling
+        self.output_counter = 0
+        self.output_frequency = 5  # Only print every X readings
+    
+    def add_sample(self, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z):
+        """Add a new motion sample to the buffer."""
+        self.buffer.append({
+            'accel_x': accel_x,
+            'accel_y': accel_y,
+            'accel_z': accel_z,
+            'gyro_x': gyro_x,
+            'gyro_y': gyro_y,
+            'gyro_z': gyro_z
+        })
+    
+    def recognize_pattern(self):
+        """Analyze buffer and determine the motion state."""
+        self.output_counter += 1
+        print_output = (self.output_counter % self.output_frequency == 0)
+        
+        if len(self.buffer) < WINDOW_SIZE // 2:
+            return "collecting_data"  # Not enough data yet
+            
+        # Extract features from buffer
+        accel_magnitudes = []
+        gyro_magnitudes = []
+        
+        for sample in self.buffer:
+            # Calculate acceleration and gyroscope magnitudes
+            accel_mag = np.sqrt(sample['accel_x']**2 + sample['accel_y']**2 + sample['accel_z']**2)
+            gyro_mag = np.sqrt(sample['gyro_x']**2 + sample['gyro_y']**2 + sample['gyro_z']**2)
+            
+            accel_magnitudes.append(accel_mag)
+            gyro_magnitudes.append(gyro_mag)
+            
+        # Statistical features
+        accel_mean = np.mean(accel_magnitudes)
+        accel_std = np.std(accel_magnitudes)
+        accel_max = np.max(accel_magnitudes)
+        
+        gyro_mean = np.mean(gyro_magnitudes)
+        
+        # Calculate acceleration change over time (first derivative)
+        accel_changes = [abs(accel_magnitudes[i] - accel_magnitudes[i-1]) 
+                         for i in range(1, len(accel_magnitudes))]
+        mean_accel_change = np.mean(accel_changes) if accel_changes else 0
+        
+        # Debug print features if enabled (throttled)
+        if self.debug and print_output:
+            print(f"\nFEATURES: accel_mean={accel_mean:.2f}, accel_std={accel_std:.2f}, " +
+                  f"accel_max={accel_max:.2f}, gyro_mean={gyro_mean:.2f}, change={mean_accel_change:.2f}")
+        
+        # ----- MOTION DETECTION LOGIC -----
+        
+        # FIRST CHECK: Is it idle? (very specific criteria that worked well)
+        if (abs(accel_mean - self.baseline_accel) < self.idle_accel_range and
+            accel_std < self.idle_std_max and
+            gyro_mean < self.idle_gyro_max):
+            return "resting"
+        
+        # Detect running (high consistent acceleration)
+        if accel_mean > self.run_threshold:
+            return "running"
+            
+        # Detect walking (moderate consistent acceleration)
+        if self.walk_threshold_min < accel_mean < self.walk_threshold_max:
+            return "walking"
+            
+        # Any other motion that's not idle, walking, or running is "moving"
+        return "idle"
+
+@benchmark('ingest.recognizer_add_and_recognize', params=(None, 'original'))
+def bench_recognizer(n, param):
+    millis, values = sensor_block(n)
+    samples = values[:, :6].tolist()
+    
+    def make_recognizer():
+        if param != 'original':
+            return SimpleMotionRecognizer()
+        # The original prints features every 5th sample; the current code doesn't
+        recognizer = OriginalMotionRecognizer()
+        recognizer.debug = False
+        return recognizer
+    
+    def run():
+        recognizer = make_recognizer()
+        for block, count in repeat_block(samples, n):
+            for sample in block:
+                recognizer.add_sample(*sample)
+                recognizer.recognize_pattern()
+    return run
+
+@benchmark('ingest.recognizer_classifier', params=('thresholds', 'tree'))
+def bench_recognizer_classifier(n, kind):
+    # Live per-sample cost of the threshold rules vs the trained tree
+    millis, values = sensor_block(n)
+    samples = values[:, :6].tolist()
+    classifier = trained_tree() if kind == 'tree' else None
+    
+    def run():
+        recognizer = SimpleMotionRecognizer(classifier)
+        for block, count in repeat_block(samples, n):
+            for sample in block:
+                recognizer.add_sample(*sample)
+                recognizer.recognize_pattern()
+    return run
+
+@benchmark('ingest.ring_buffer_append_window', params=(20, 200, 2000))
+def bench_ring_buffer(n, capacity):
+    millis, values = sensor_block(n)
+    samples = values[:, :6].tolist()
+    
+    def run():
+        buffer = SampleRingBuffer(capacity)
+        for block, count in repeat_block(samples, n):
+            for sample in block:
+                buffer.append(*sample)
+                buffer.window()
+    return run
+
+# Sample stores at each window length: the ring buffer and the original deque of dicts
+SAMPLE_STORES = tuple(f"{kind}:{capacity}" for capacity in (20, 200, 2000) for kind in ('ring', 'deque'))
+
+@benchmark('ingest.sample_store', params=SAMPLE_STORES)
+def bench_sample_store(n, param):
+    kind, capacity = param.split(':')
+    capacity = int(capacity)
+    millis, values = sensor_block(n)
+    samples = values[:, :6].tolist()
+    
+    def new_store():
+        if kind == 'ring':
+            buffer = SampleRingBuffer(capacity)
+            return buffer, buffer.append
+        buffer = deque(maxlen=capacity)
+        return buffer, lambda accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z: buffer.append({
+            'accel_x': accel_x, 'accel_y': accel_y, 'accel_z': accel_z,
+            'gyro_x': gyro_x, 'gyro_y': gyro_y, 'gyro_z': gyro_z})
+    
+    def run():
+        buffer, append = new_store()
+        for block, count in repeat_block(samples, n):
+            for sample in block:
+                append(*sample)
+    
+    # Memory a full store holds, measured once outside the timing. Readings
+    # are fresh floats (as parsed from the port), so the deque keeps six
+    # float objects per sample besides its dict
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        buffer, append = new_store()
+        for sample in (samples * (capacity // len(samples) + 1))[:capacity]:
+            append(*[value + 0.0 for value in sample])
+        held = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    run.measurements = {'bytes_per_sample': held / capacity}
+    return run
+
+@benchmark('ingest.window_features', params=('rolling', 'recompute'))
+def bench_window_features(n, method):
+    millis, values = sensor_block(n)
+    accel = np.sqrt((values[:, :3] ** 2).sum(axis=1)).tolist()
+    gyro = np.sqrt((values[:, 3:6] ** 2).sum(axis=1)).tolist()
+    
+    def rolling():
+        features = RollingFeatures(WINDOW_SIZE, shift=9.82)
+        for (accel_block, count), (gyro_block, _) in zip(repeat_block(accel, n), repeat_block(gyro, n)):
+            for accel_mag, gyro_mag in zip(accel_block, gyro_block):
+                features.push(accel_mag, gyro_mag)
+                features.features()
+    
+    def recompute():
+        # Every statistic rebuilt per sample from a ring buffer (the features alone;
+        # the original recognizer end to end is ingest.recognizer_add_and_recognize[original])
+        window = SampleRingBuffer(WINDOW_SIZE, columns=('accel', 'gyro'), dtype=np.float64)
+        for (accel_block, count), (gyro_block, _) in zip(repeat_block(accel, n), repeat_block(gyro, n)):
+            for accel_mag, gyro_mag in zip(accel_block, gyro_block):
+                window.append(accel_mag, gyro_mag)
+                if len(window) < WINDOW_SIZE // 2:
+                    continue
+                accel_window = window.column('accel')
+                (np.mean(accel_window), np.std(accel_window), np.max(accel_window),
+                 np.mean(window.column('gyro')), np.mean(np.abs(np.diff(accel_window))))
+    
+    return rolling if method == 'rolling' else recompute
+
+# Cadence window lengths: per-sample cost should stay flat for the sliding spectrum
+CADENCE_WINDOWS = (20, 80, 320, 1280, 5120)
+
+@benchmark('ingest.cadence_sliding', params=CADENCE_WINDOWS)
+def bench_cadence_sliding(n, window):
+    millis, values = sensor_block(n)
+    accel = np.sqrt((values[:, :3] ** 2).sum(axis=1)).tolist()
+    
+    def run():
+        spectrum = SlidingSpectrum(window)
+        for block, count in repeat_block(accel, n):
+            for accel_mag in block:
+                spectrum.push(accel_mag)
+                spectrum.features()
+    return run
+
+@benchmark('ingest.cadence_fft', params=CADENCE_WINDOWS)
+def bench_cadence_fft(n, window):
+    # The alternative: a full FFT of the window on every sample (grows with the window)
+    millis, values = sensor_block(n)
+    accel = np.sqrt((values[:, :3] ** 2).sum(axis=1)).tolist()
+    
+    def run():
+        buffer = SampleRingBuffer(window, columns=('accel',), dtype=np.float64)
+        for block, count in repeat_block(accel, n):
+            for accel_mag in block:
+                buffer.append(accel_mag)
+                if len(buffer) < window:
+                    continue
+                magnitudes = buffer.column('accel')
+                power = np.abs(np.fft.rfft(magnitudes - magnitudes.mean())) ** 2
+                power[1:].argmax()
+    return run
+
+class _NullWriter:
+    """Writer stand-in that discards rows."""
+    
+    def put(self, row):
+        return True
+
+@benchmark('ingest.session_handle_sample', params=('metrics_off', 'metrics_on'))
+def bench_handle_sample(n, mode):
+    millis, values = sensor_block(n)
+    samples = values[:, :6].tolist()
+    metrics = MetricsRegistry(enabled=mode == 'metrics_on')
+    
+    def run():
+        session = DeviceSession('bench', _NullWriter(), 'bench', metrics=metrics)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for block, count in repeat_block(samples, n):
+                for sample in block:
+                    session.handle_sample(*sample)
+    return run
+
+class _ParseOnlySession(DeviceSession):
+    """DeviceSession that stops after parsing, so only the wire format is timed."""
+    
+    def handle_sample(self, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z):
+        self.samples += 1
+
+@benchmark('ingest.parse_stream', params=('csv', 'binary'))
+def bench_parse(n, protocol):
+    millis, values = sensor_block(n)
+    payloads = encode_frames(millis, values) if protocol == 'binary' else encode_csv(millis, values)
+    data = b''.join(payloads)
+    
+    def run():
+        session = _ParseOnlySession('bench', writer=None, sequence_id='bench', protocol=protocol)
+        session.samples = 0
+        for block, count in repeat_block(payloads, n):
+            session.source = io.BytesIO(data if count == len(payloads) else b''.join(block))
+            session.is_file = True
+            session.closed = False
+            while not session.closed:
+                session.read_available()
+        assert session.samples == n
+    return run
+
+@benchmark('ingest.session_frames', params=('raw', 'edge_x10'))
+def bench_session_frames(n, mode):
+    # Host work per sensor sample: raw frames recognized on the PC, or an edge
+    # board sending one feature frame and one raw frame per 10 samples
+    millis, values = sensor_block(n)
+    if mode == 'raw':
+        payloads, per_payload = encode_frames(millis, values), 1
+    else:
+        payloads, per_payload = encode_edge_frames(millis, values, feature_every=10, raw_every=10)[0], 10
+    
+    def run():
+        session = DeviceSession('bench', _NullWriter(), 'bench', protocol='binary')
+        with contextlib.redirect_stdout(io.StringIO()):
+            for block, count in repeat_block(payloads, n // per_payload):
+                session.source = io.BytesIO(b''.join(block))
+                session.is_file = True
+                session.closed = False
+                while not session.closed:
+                    session.read_available()
+    return run
+
+@benchmark('ingest.sqlite_write_samples')
+def bench_sqlite_insert(n, param):
+    rows = sensor_rows(n, datetime(2025, 1, 1), timedelta(seconds=n / 10))
+    workdir = tempfile.mkdtemp(prefix='motion_bench_')
+    
+    def run():
+        path = os.path.join(workdir, 'insert.sqlite3')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        storage = SQLiteStorage(path)
+        storage.connect()
+        for block, count in repeat_block(rows, n):
+            for offset in range(0, count, WRITE_BATCH_SIZE):
+                storage.write_samples(block[offset:offset + WRITE_BATCH_SIZE])
+        storage.close()
+    run.cleanup = lambda: shutil.rmtree(workdir, ignore_errors=True)
+    return run
+
+# ----- Analysis script -----
+
+@benchmark('analysis.fetch_recent_data_sqlite')
+def bench_fetch(n, param):
+    workdir = tempfile.mkdtemp(prefix='motion_bench_')
+    storage = SQLiteStorage(os.path.join(workdir, 'fetch.sqlite3'))
+    storage.connect()
+    
+    # Everything lands inside the last hour so fetch_recent_data(60) returns all n rows
+    rows = sensor_rows(n, datetime.now() - timedelta(minutes=59), timedelta(minutes=58))
+    for block, count in repeat_block(rows, n):
+        for offset in range(0, count, 10000):
+            storage.write_samples(block[offset:offset + 10000])
+    
+    recognizer = FixedPatternRecognizer(storage=storage)
+    
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            frame = recognizer.fetch_recent_data(minutes=60)
+        assert len(frame) == n
+    run.cleanup = lambda: shutil.rmtree(workdir, ignore_errors=True)
+    return run
+
+@benchmark('analysis.analyze_motion_segments')
+def bench_analyze(n, param):
+    frame = sensor_frame(n)
+    recognizer = FixedPatternRecognizer()
+    return lambda: recognizer.analyze_motion_segments(frame, verbose=False)
+
+@benchmark('analysis.batch_classify', params=('thresholds', 'tree'))
+def bench_batch_classify(n, kind):
+    # Re-labeling throughput (motion_relabel) with either classifier
+    millis, values = sensor_block(n)
+    classifier = trained_tree() if kind == 'tree' else None
+    
+    def run():
+        batch = BatchMotionClassifier(SimpleMotionRecognizer(classifier))
+        for block, count in repeat_block(values, n):
+            batch.classify(block)
+    return run
+
+@benchmark('analysis.determine_pattern', params=('scalar', 'compiled'))
+def bench_determine_pattern(n, method):
+    # n segments with random breakdowns
+    rng = np.random.default_rng(0)
+    recognizer = FixedPatternRecognizer()
+    labels = recognizer.motion_labels
+    percentages = rng.dirichlet(np.ones(len(labels)), n) * 100
+    max_consecutive = rng.integers(0, 40, (n, len(labels)))
+    transitions = rng.integers(0, 30, n)
+    
+    if method == 'compiled':
+        return lambda: recognizer.pattern_rules.evaluate(percentages, max_consecutive, transitions)
+    
+    segments = [(dict(zip(labels, pct)), dict(zip(labels, cons)), int(trans))
+                for pct, cons, trans in zip(percentages.tolist(), max_consecutive.tolist(), transitions.tolist())]
+    
+    def scalar():
+        for segment_pct, segment_cons, segment_trans in segments:
+            recognizer.determine_pattern(segment_pct, segment_cons, segment_trans)
+    return scalar
+
+@benchmark('analysis.visualize_results', params=('serial', 'parallel'))
+def bench_visualize(n, param):
+    recognizer = FixedPatternRecognizer()
+    segments = recognizer.analyze_motion_segments(sensor_frame(n), verbose=False)
+    workdir = tempfile.mkdtemp(prefix='motion_bench_')
+    
+    def run():
+        # Charts are written to the working directory
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                recognizer.visualize_results(segments, headless=True, parallel=param == 'parallel')
+        finally:
+            plt.close('all')
+            os.chdir(cwd)
+    run.cleanup = lambda: shutil.rmtree(workdir, ignore_errors=True)
+    return run
+
+# ----- Runner -----
+
+def measure(run):
+    """Time run() repeatedly (GC off, like timeit) and return the per-run seconds."""
+    times = []
+    started = time.perf_counter()
+    while len(times) < MAX_REPEATS and (len(times) < MIN_REPEATS or time.perf_counter() - started < TIME_BUDGET):
+        gc.collect()
+        gc.disable()
+        try:
+            run_started = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - run_started)
+        finally:
+            gc.enable()
+        if times[-1] > TIME_BUDGET:
+            break  # Large scales: one run is enough
+    return times
+
+def git_commit():
+    """Return (commit, dirty) for the checkout, or (None, None) outside git."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=here, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=here,
+                                capture_output=True, text=True, check=True).stdout
+        return commit, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+def run_benchmarks(scales, name_filter=None):
+    """Run every registered benchmark at every scale; return the results document."""
+    commit, dirty = git_commit()
+    results = []
+    
+    for name, params, setup in BENCHMARKS:
+        if name_filter and name_filter not in name:
+            continue
+        for scale in scales:
+            n = SCALES[scale]
+            for param in params:
+                label = f"{name}[{scale}{'' if param is None else f',{param}'}]"
+                print(f"{label:<60}", end='', flush=True)
+                
+                run = setup(n, param)
+                try:
+                    times = measure(run)
+                finally:
+                    if hasattr(run, 'cleanup'):
+                        run.cleanup()
+                
+                best = min(times)
+                measurements = getattr(run, 'measurements', {})
+                results.append({
+                    'name': name,
+                    'scale': scale,
+                    'n': n,
+                    'param': param,
+                    'repeats': len(times),
+                    'min_s': best,
+                    'median_s': float(np.median(times)),
+                    'mean_s': float(np.mean(times)),
+                    'per_item_us': best / n * 1e6,
+                    'items_per_s': n / best,
+                    **measurements
+                })
+                extra = ''.join(f"  {key}={value:.1f}" for key, value in measurements.items())
+                print(f"{best * 1000:>12.2f} ms  {best / n * 1e6:>10.3f} us/item  ({len(times)} runs){extra}")
+    
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'machine': {
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'matplotlib': matplotlib.__version__
+        },
+        'results': results
+    }
+
+def compare_results(baseline_path, current_path, threshold=REGRESSION_THRESHOLD):
+    """Print current/baseline time ratios; return True if anything regressed past threshold."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+    
+    key = lambda result: (result['name'], result['scale'], str(result['param']))
+    baseline_times = {key(result): result['min_s'] for result in baseline['results']}
+    
+    print(f"Baseline: {baseline['commit'] or baseline_path}  Current: {current['commit'] or current_path}")
+    regressed = False
+    for result in current['results']:
+        before = baseline_times.get(key(result))
+        if before is None:
+            continue
+        ratio = result['min_s'] / before
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressed = True
+        elif ratio < 1 - threshold:
+            flag = '  faster'
+        label = f"{result['name']}[{result['scale']}{'' if result['param'] is None else ','+str(result['param'])}]"
+        print(f"{label:<60}{before * 1000:>12.2f} ms -> {result['min_s'] * 1000:>10.2f} ms  x{ratio:.2f}{flag}")
+    return regressed
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark the ingest and analysis hot paths.")
+    parser.add_argument('--scales', default=DEFAULT_SCALES, help=f"comma list of {', '.join(SCALES)}")
+    parser.add_argument('--filter', help="only run benchmarks whose name contains this")
+    parser.add_argument('--output', help=f"results file (default: {RESULTS_DIR}/<time>-<commit>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help="compare two results files instead of running")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+    
+    if args.compare:
+        sys.exit(1 if compare_results(*args.compare, threshold=args.threshold) else 0)
+    
+    scales = [scale.strip().lower() for scale in args.scales.split(',')]
+    for scale in scales:
+        if scale not in SCALES:
+            parser.error(f"unknown scale {scale} (choose from {', '.join(SCALES)})")
+    
+    document = run_benchmarks(scales, args.filter)
+    
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{(document['commit'] or 'nogit')[:8]}.json")
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import math
+import numpy as np
+from collections import deque
+
+# Step cadence from the accel magnitude spectrum. The spectrum is only ever
+# evaluated on a fixed frequency grid, so a longer window sharpens the peak
+# without adding bins: every sample costs O(bins) whatever the window length.
+CADENCE_WINDOW = 40          # Samples per spectrum (4 s at 10 Hz)
+CADENCE_SAMPLING_RATE = 10   # Hz
+CADENCE_STEP_HZ = 0.25       # Grid spacing; sampling rate / step must be a whole number of samples
+CADENCE_RESYNC_INTERVAL = 1000  # Recompute the sliding sums from the window every N samples
+
+# Grid range and energy bands in Hz (bands are [low, high) except the last, which includes 5 Hz)
+CADENCE_BANDS_HZ = (0.5, 1.5, 2.5, 3.5, 5.0)
+
+# Feature order returned by SlidingSpectrum.features and sliding_cadence_features
+CADENCE_FEATURES = ('cadence_hz', 'cadence_strength',
+                    'band_0_5_1_5hz', 'band_1_5_2_5hz', 'band_2_5_3_5hz', 'band_3_5_5hz')
+
+# Rows per vectorized pass (bounds the (rows, bins) complex temporaries)
+CADENCE_CHUNK_ROWS = 50000
+
+# Grid lookups per sampling rate, and window phase sums per (window, sampling rate)
+_grid_tables = {}
+_window_tables = {}
+
+def cadence_grid(sampling_rate=CADENCE_SAMPLING_RATE):
+    """Return (frequencies, phasors, band_bins) for a sampling rate, built once.
+    
+    Every grid frequency is a multiple of CADENCE_STEP_HZ, so the phasor of
+    sample i repeats every sampling_rate / CADENCE_STEP_HZ samples and is read
+    from a (period, bins) table instead of being rotated (and drifting).
+    """
+    if sampling_rate not in _grid_tables:
+        period = sampling_rate / CADENCE_STEP_HZ
+        if abs(period - round(period)) > 1e-9:
+            raise ValueError(f"Sampling rate {sampling_rate} Hz is not a whole number of {CADENCE_STEP_HZ} Hz steps")
+        period = int(round(period))
+        low, high = CADENCE_BANDS_HZ[0], min(CADENCE_BANDS_HZ[-1], sampling_rate / 2)
+        frequencies = np.arange(round(low / CADENCE_STEP_HZ), round(high / CADENCE_STEP_HZ) + 1) * CADENCE_STEP_HZ
+        phasors = np.exp(-2j * np.pi * np.outer(np.arange(period), frequencies) / sampling_rate)
+        edges = CADENCE_BANDS_HZ
+        band_bins = [(int(np.searchsorted(frequencies, low, side='left')),
+                      int(np.searchsorted(frequencies, high, side='right' if high == edges[-1] else 'left')))
+                     for low, high in zip(edges[:-1], edges[1:])]
+        _grid_tables[sampling_rate] = (frequencies, phasors, band_bins)
+    return _grid_tables[sampling_rate]
+
+def window_phase_sums(window, sampling_rate=CADENCE_SAMPLING_RATE):
+    """(period, bins) table: the sum of the window's phasors, by the newest sample's phase."""
+    key = (window, sampling_rate)
+    if key not in _window_tables:
+        phasors = cadence_grid(sampling_rate)[1]
+        period = len(phasors)
+        lags = (np.arange(period)[:, None] - np.arange(window)[None, :]) % period
+        _window_tables[key] = phasors[lags].sum(axis=1)
+    return _window_tables[key]
+
+def spectral_summary(power, sampling_rate=CADENCE_SAMPLING_RATE):
+    """Cadence features (CADENCE_FEATURES order) from grid power, one row per spectrum.
+    
+    The cadence is the strongest grid frequency, refined between its
+    neighbours by a parabola; the strength is the share of the power within
+    one grid step of it (a clean step rhythm is close to 1, noise about 0.2).
+    """
+    frequencies, phasors, band_bins = cadence_grid(sampling_rate)
+    power = np.atleast_2d(power)
+    rows = np.arange(len(power))
+    total = power.sum(axis=1)
+    peak = power.argmax(axis=1)
+    
+    # Neighbours past either end of the grid count as zero
+    centre = power[rows, peak]
+    left = np.where(peak > 0, power[rows, np.maximum(peak - 1, 0)], 0.0)
+    right = np.where(peak < len(frequencies) - 1, power[rows, np.minimum(peak + 1, len(frequencies) - 1)], 0.0)
+    curvature = left - 2 * centre + right
+    inside = (peak > 0) & (peak < len(frequencies) - 1) & (curvature < 0)
+    offset = np.where(inside, 0.5 * (left - right) / np.where(inside, curvature, -1.0), 0.0)
+    
+    features = np.zeros((len(power), len(CADENCE_FEATURES)))
+    moving = total > 0
+    features[:, 0] = np.where(moving, frequencies[peak] + np.clip(offset, -0.5, 0.5) * CADENCE_STEP_HZ, 0.0)
+    features[:, 1] = np.where(moving, (left + centre + right) / np.where(moving, total, 1.0), 0.0)
+    for band, (first_bin, end_bin) in enumerate(band_bins):
+        features[:, 2 + band] = power[:, first_bin:end_bin].sum(axis=1)
+    return features
+
+class SlidingSpectrum:
+    """Sliding DFT of one signal (the accel magnitude) on the cadence grid.
+    
+    Each push adds the new sample's term and removes the evicted one's, so
+    the per-sample cost depends on the number of grid bins, not the window.
+    NaN/inf samples are kept out of the sums (one would poison them until the
+    next resync); while one is inside the window there is no spectrum.
+    """
+    
+    def __init__(self, window_size=CADENCE_WINDOW, sampling_rate=CADENCE_SAMPLING_RATE,
+                 resync_interval=CADENCE_RESYNC_INTERVAL):
+        """Set up empty sums for a window of `window_size` samples."""
+        self.window_size = window_size
+        self.sampling_rate = sampling_rate
+        self.frequencies, self.phasors, self.band_bins = cadence_grid(sampling_rate)
+        self.period = len(self.phasors)
+        self.phase_sums = window_phase_sums(window_size, sampling_rate)
+        
+        # Recompute the sums from scratch every N samples to bound float drift
+        self.resync_interval = resync_interval
+        
+        # Values inside the window (oldest first), their sum and their
+        # phasor-weighted sums (phases counted from the first sample ever pushed)
+        self.values = deque()
+        self.total = 0.0
+        self.sums = np.zeros(len(self.frequencies), dtype=complex)
+        self.samples_seen = 0
+        self.nonfinite = 0
+    
+    def push(self, value):
+        """Slide the window forward by one sample."""
+        phasors = self.phasors
+        if len(self.values) == self.window_size:
+            old = self.values.popleft()
+            if math.isfinite(old):
+                self.total -= old
+                self.sums -= old * phasors[(self.samples_seen - self.window_size) % self.period]
+            else:
+                self.nonfinite -= 1
+        
+        self.values.append(value)
+        if math.isfinite(value):
+            self.total += value
+            self.sums += value * phasors[self.samples_seen % self.period]
+        else:
+            self.nonfinite += 1
+        
+        self.samples_seen += 1
+        if self.samples_seen % self.resync_interval == 0:
+            self.resync()
+    
+    def resync(self):
+        """Recompute the sums exactly from the window contents."""
+        first = self.samples_seen - len(self.values)
+        phases = (first + np.arange(len(self.values))) % self.period
+        values = np.array(self.values, dtype=np.float64)
+        finite = np.isfinite(values)
+        self.total = math.fsum(values[finite])
+        self.sums = values[finite] @ self.phasors[phases[finite]]
+    
+    def __len__(self):
+        return len(self.values)
+    
+    def power(self):
+        """Grid power of the de-meaned window (None until it is full, or while it holds a NaN/inf)."""
+        if len(self.values) < self.window_size or self.nonfinite:
+            return None
+        # The window mean only contributes mean * (sum of the window's phasors)
+        spectrum = self.sums - self.total / self.window_size * self.phase_sums[(self.samples_seen - 1) % self.period]
+        return (spectrum.real * spectrum.real + spectrum.imag * spectrum.imag) / self.window_size
+    
+    def features(self):
+        """Return CADENCE_FEATURES for the current window (None whenever power() is)."""
+        power = self.power()
+        if power is None:
+            return None
+        # spectral_summary for a single spectrum, on plain floats (a few
+        # microseconds instead of tens for the array version's overhead)
+        power = power.tolist()
+        last = len(power) - 1
+        bands = [sum(power[first_bin:end_bin]) for first_bin, end_bin in self.band_bins]
+        total = sum(power)
+        if not total > 0:
+            return (0.0, 0.0, *bands)
+        
+        peak = power.index(max(power))
+        centre = power[peak]
+        left = power[peak - 1] if peak > 0 else 0.0
+        right = power[peak + 1] if peak < last else 0.0
+        curvature = left - 2 * centre + right
+        offset = 0.5 * (left - right) / curvature if 0 < peak < last and curvature < 0 else 0.0
+        cadence = self.frequencies[peak] + min(max(offset, -0.5), 0.5) * CADENCE_STEP_HZ
+        return (float(cadence), (left + centre + right) / total, *bands)
+
+def sliding_cadence_features(values, first_index=0, window=CADENCE_WINDOW, sampling_rate=CADENCE_SAMPLING_RATE):
+    """CADENCE_FEATURES for every full trailing window of a 1-D signal, in bulk.
+    
+    values[0] is sample number first_index of the stream (it sets the phases,
+    as in SlidingSpectrum); row i describes values[i:i + window]. Windows
+    holding a NaN/inf get NaN rows, where SlidingSpectrum has no features.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    if not finite.all():
+        # Zeros keep the running sums clean; the affected windows are masked below
+        values = np.where(finite, values, 0.0)
+    rows = len(values) - window + 1
+    if rows <= 0:
+        return np.empty((0, len(CADENCE_FEATURES)))
+    frequencies, phasors, band_bins = cadence_grid(sampling_rate)
+    phase_sums = window_phase_sums(window, sampling_rate)
+    period = len(phasors)
+    
+    features = np.empty((rows, len(CADENCE_FEATURES)))
+    for start in range(0, rows, CADENCE_CHUNK_ROWS):
+        stop = min(start + CADENCE_CHUNK_ROWS, rows)
+        block = values[start:stop + window - 1]
+        phases = (first_index + start + np.arange(len(block))) % period
+        
+        # Window sums as differences of running sums (restarted every chunk to bound their size)
+        weighted = np.zeros((len(block) + 1, len(frequencies)), dtype=complex)
+        np.cumsum(block[:, None] * phasors[phases], axis=0, out=weighted[1:])
+        running = np.concatenate([[0.0], np.cumsum(block)])
+        sums = weighted[window:] - weighted[:-window]
+        totals = running[window:] - running[:-window]
+        
+        spectrum = sums - (totals / window)[:, None] * phase_sums[phases[window - 1:]]
+        power = (spectrum.real * spectrum.real + spectrum.imag * spectrum.imag) / window
+        features[start:stop] = spectral_summary(power, sampling_rate)
+    
+    if not finite.all():
+        bad = np.concatenate([[0], np.cumsum(~finite)])
+        features[(bad[window:] - bad[:-window]) > 0] = np.nan
+    return features
+
+def segment_cadence(values, window_starts, sampling_rate=CADENCE_SAMPLING_RATE):
+    """(cadence_hz, cadence_strength) arrays for consecutive segments of a 1-D signal.
+    
+    window_starts are the row indices where each segment begins (the first is 0);
+    each segment's spectrum covers exactly its own samples.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    frequencies, phasors, band_bins = cadence_grid(sampling_rate)
+    period = len(phasors)
+    window_starts = np.asarray(window_starts)
+    ends = np.append(window_starts[1:], len(values))
+    counts = ends - window_starts
+    
+    # Phases count from each segment's first sample
+    positions = np.arange(len(values)) - np.repeat(window_starts, counts)
+    cadence = np.empty(len(window_starts))
+    strength = np.empty(len(window_starts))
+    
+    # Whole segments per pass, about CADENCE_CHUNK_ROWS rows at a time
+    first = 0
+    while first < len(window_starts):
+        last = max(int(np.searchsorted(window_starts, window_starts[first] + CADENCE_CHUNK_ROWS, side='right')), first + 1)
+        rows = slice(window_starts[first], ends[last - 1])
+        offsets = window_starts[first:last] - window_starts[first]
+        block_phasors = phasors[positions[rows] % period]
+        
+        sums = np.add.reduceat(values[rows, None] * block_phasors, offsets, axis=0)
+        phase_sums = np.add.reduceat(block_phasors, offsets, axis=0)
+        n = counts[first:last]
+        spectrum = sums - (np.add.reduceat(values[rows], offsets) / n)[:, None] * phase_sums
+        power = (spectrum.real * spectrum.real + spectrum.imag * spectrum.imag) / n[:, None]
+        summary = spectral_summary(power, sampling_rate)
+        cadence[first:last] = summary[:, 0]
+        strength[first:last] = summary[:, 1]
+        first = last
+    return cadence, strength
@@ -0,0 +1,183 @@
+import json
+import bisect
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds (Prometheus 'le' upper bounds), 10 us .. 2.5 s
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001,
+                   0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+METRICS_HOST = '127.0.0.1'  # Local only; put a proxy in front to expose it further
+
+def _format_labels(labels):
+    """Render {'device': 'COM4'} as {device="COM4"} (empty string for no labels)."""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{str(value)}"' for key, value in sorted(labels.items())) + '}'
+
+class Counter:
+    """Monotonic count (one label set)."""
+    
+    def __init__(self):
+        self.value = 0
+    
+    def inc(self, amount=1):
+        self.value += amount
+
+class Gauge:
+    """Last observed value (one label set)."""
+    
+    def __init__(self):
+        self.value = 0.0
+    
+    def set(self, value):
+        self.value = value
+
+class Histogram:
+    """Fixed-bucket histogram (one label set); observe() is a bisect and three adds."""
+    
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+    
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside its bucket."""
+        if self.count == 0:
+            return None
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= target:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (target - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+class MetricsRegistry:
+    """Named metric families plus scrape-time collectors.
+    
+    Hot paths should check `enabled` before taking timestamps; counts that are
+    already kept elsewhere (writer stats, decoder stats) are read by collectors
+    only when scraped, so they cost nothing per sample.
+    """
+    
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.families = {}  # name -> (type, help, {label tuple: metric})
+        self.collectors = []
+        self.lock = threading.Lock()
+    
+    def _metric(self, kind, factory, name, help_text, labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            family = self.families.setdefault(name, (kind, help_text, {}))
+            metric = family[2].get(key)
+            if metric is None:
+                metric = family[2][key] = factory()
+        return metric
+    
+    def counter(self, name, help_text, **labels):
+        return self._metric('counter', Counter, name, help_text, labels)
+    
+    def gauge(self, name, help_text, **labels):
+        return self._metric('gauge', Gauge, name, help_text, labels)
+    
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS, **labels):
+        return self._metric('histogram', lambda: Histogram(buckets), name, help_text, labels)
+    
+    def add_collector(self, collect):
+        """Register collect() -> [(name, type, help, labels, value), ...], called at scrape time."""
+        self.collectors.append(collect)
+    
+    def collect(self):
+        """Gather every family (registered and collected) as {name: (type, help, [(labels, metric|value)])}."""
+        with self.lock:
+            families = {name: (kind, help_text, [(dict(key), metric) for key, metric in metrics.items()])
+                        for name, (kind, help_text, metrics) in self.families.items()}
+        for collect in self.collectors:
+            for name, kind, help_text, labels, value in collect():
+                families.setdefault(name, (kind, help_text, []))[2].append((labels, value))
+        return families
+    
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for name, (kind, help_text, samples) in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in samples:
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (float('inf'),), metric.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f"{name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {metric.sum!r}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+                else:
+                    value = metric.value if isinstance(metric, (Counter, Gauge)) else metric
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+    
+    def snapshot(self):
+        """Compact dict for structured log lines (histograms as count / mean / p50 / p99 in ms)."""
+        result = {}
+        for name, (kind, help_text, samples) in self.collect().items():
+            for labels, metric in samples:
+                key = name + _format_labels(labels)
+                if isinstance(metric, Histogram):
+                    if metric.count:
+                        result[key] = {'count': metric.count,
+                                       'mean_ms': round(metric.sum / metric.count * 1000, 4),
+                                       'p50_ms': round(metric.quantile(0.5) * 1000, 4),
+                                       'p99_ms': round(metric.quantile(0.99) * 1000, 4)}
+                else:
+                    result[key] = metric.value if isinstance(metric, (Counter, Gauge)) else metric
+        return result
+    
+    def log_line(self):
+        """Print one structured (JSON) metrics line."""
+        print(json.dumps({'time': datetime.now().isoformat(timespec='seconds'),
+                          'event': 'metrics', 'metrics': self.snapshot()}))
+
+class MetricsServer:
+    """Serves GET /metrics from a registry on a background thread."""
+    
+    def __init__(self, registry, port, host=METRICS_HOST):
+        self.registry = registry
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.split('?')[0] != '/metrics':
+                    handler.send_error(404)
+                    return
+                body = registry.render().encode()
+                handler.send_response(200)
+                handler.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                handler.send_header('Content-Length', str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+            
+            def log_message(handler, format, *args):
+                pass  # Scrapes would otherwise flood the console
+        
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True)
+    
+    def start(self):
+        self.thread.start()
+        print(f"Metrics available at http://{self.server.server_address[0]}:{self.server.server_address[1]}/metrics")
+    
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
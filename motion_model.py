@@ -0,0 +1,422 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from collections import Counter
+from datetime import datetime
+from motion_storage import STORAGE_ERRORS, open_storage, expand_holds
+
+# Trained model written by `python motion_model.py train` (NumPy .npz, loads in milliseconds)
+MODEL_FILE = 'motion_model.npz'
+
+# Window the features are computed over (matches the ingest recognizer's buffer)
+MODEL_WINDOW = 20
+MODEL_SAMPLING_RATE = 10  # Hz
+
+# Accel-magnitude spectrum bands in Hz; with 20 samples at 10 Hz the bins are 0.5 Hz apart
+SPECTRAL_BANDS_HZ = (0.5, 1.5, 2.5, 3.5, 5.0)
+
+# Feature columns, in the order window_features returns them
+MODEL_FEATURES = ('accel_mean', 'accel_std', 'accel_max', 'gyro_mean', 'accel_change',
+                  'var_accel_x', 'var_accel_y', 'var_accel_z', 'var_gyro_x', 'var_gyro_y', 'var_gyro_z',
+                  'band_0_5_1_5hz', 'band_1_5_2_5hz', 'band_2_5_3_5hz', 'band_3_5_5hz', 'cadence_hz')
+
+# Rows per vectorized feature pass (bounds the (rows, 6, window) temporaries)
+FEATURE_CHUNK_ROWS = 20000
+
+# Live classification may use at most this much CPU per sample: 2% of the
+# 100 ms sample period shared by 10 devices on one core
+SAMPLE_CPU_BUDGET_US = 200.0
+
+# Tree training defaults
+TREE_MAX_DEPTH = 8
+TREE_MIN_LEAF = 20
+TREE_THRESHOLDS = 32  # Candidate split points per feature (quantiles)
+
+# Spectral lookups per (window, sampling rate): bin frequencies, each band's
+# bin range and the bins a cadence may come from
+_spectral_tables = {}
+
+def spectral_tables(window, sampling_rate=MODEL_SAMPLING_RATE):
+    """Return (frequencies, [(first_bin, end_bin) per band], cadence_bins) for a window length, built once."""
+    key = (window, sampling_rate)
+    if key not in _spectral_tables:
+        frequencies = np.fft.rfftfreq(window, 1.0 / sampling_rate)
+        edges = SPECTRAL_BANDS_HZ
+        # Bands are [low, high) except the last, which includes its top edge
+        band_bins = [(int(np.searchsorted(frequencies, low, side='left')),
+                      int(np.searchsorted(frequencies, high, side='right' if high == edges[-1] else 'left')))
+                     for low, high in zip(edges[:-1], edges[1:])]
+        cadence_bins = (frequencies >= edges[0]) & (frequencies <= edges[-1])
+        _spectral_tables[key] = (frequencies, band_bins, cadence_bins)
+    return _spectral_tables[key]
+
+def window_features(values, window=MODEL_WINDOW, sampling_rate=MODEL_SAMPLING_RATE):
+    """Feature rows (MODEL_FEATURES order) for every full trailing window of an (n, 6+) sample block.
+    
+    Row i describes samples i..i+window-1, so n samples give n - window + 1 rows.
+    Values are rounded to float32 first, as the store and the ring buffer keep them.
+    """
+    values = np.asarray(values)
+    rows = len(values) - window + 1
+    if rows <= 0:
+        return np.empty((0, len(MODEL_FEATURES)))
+    frequencies, band_bins, cadence_bins = spectral_tables(window, sampling_rate)
+    
+    # Columns 0-5 the axes, 6 the accel magnitude, 7 the gyro magnitude
+    columns = np.empty((len(values), 8))
+    columns[:, :6] = values[:, :6].astype(np.float32)
+    squares = columns[:, :6] * columns[:, :6]
+    columns[:, 6] = np.sqrt(squares[:, 0] + squares[:, 1] + squares[:, 2])
+    columns[:, 7] = np.sqrt(squares[:, 3] + squares[:, 4] + squares[:, 5])
+    
+    features = np.empty((rows, len(MODEL_FEATURES)))
+    for start in range(0, rows, FEATURE_CHUNK_ROWS):
+        stop = min(start + FEATURE_CHUNK_ROWS, rows)
+        # One (rows, 8, window) view covers every column's windows (a single
+        # window, the live case, is just the transposed block)
+        block = columns[start:stop + window - 1]
+        windows = block.T[None] if stop - start == 1 else np.lib.stride_tricks.sliding_window_view(block, window, axis=0)
+        accel = windows[:, 6]
+        means = windows.mean(axis=2)
+        variances = windows.var(axis=2)
+        out = features[start:stop]
+        
+        out[:, 0] = means[:, 6]
+        out[:, 1] = np.sqrt(variances[:, 6])
+        out[:, 2] = accel.max(axis=1)
+        out[:, 3] = means[:, 7]
+        out[:, 4] = np.abs(accel[:, 1:] - accel[:, :-1]).mean(axis=1)
+        out[:, 5:11] = variances[:, :6]
+        
+        # Power spectrum of the de-meaned magnitude: band energies and the dominant frequency
+        power = np.abs(np.fft.rfft(accel - means[:, 6:7], axis=1)) ** 2 / window
+        # (plain slice sums rather than a matmul: one window or many, the sums are bit-identical)
+        for band, (first_bin, end_bin) in enumerate(band_bins):
+            out[:, 11 + band] = power[:, first_bin:end_bin].sum(axis=1)
+        cadence_power = np.where(cadence_bins, power, -1.0)
+        out[:, 15] = np.where(out[:, 11:15].sum(axis=1) > 0, frequencies[cadence_power.argmax(axis=1)], 0.0)
+    return features
+
+def synthetic_training_data(schedule, noise_scale=1.0, seed=0):
+    """(values, labels) from motion_replay's synthetic profiles, labeled with the profile names."""
+    # Imported here: motion_replay imports the ingest script, which imports this module
+    from motion_replay import parse_schedule, generate_samples
+    steps = parse_schedule(schedule)
+    millis, values = generate_samples(steps, noise_scale, seed=seed)
+    labels = np.concatenate([np.full(int(seconds * MODEL_SAMPLING_RATE), name, dtype=object)
+                             for name, seconds in steps] or [np.empty(0, dtype=object)])
+    return values, labels
+
+def stored_training_data(storage, since, until=None, every=1):
+    """(values, labels) from sensor_data, per sequence so no window spans two sessions.
+    
+    Rows labeled 'collecting_data' or with no label are left out; every=N keeps
+    every Nth window to bound memory on long histories.
+    """
+    tails = {}
+    features, labels = [], []
+    for chunk in storage.iter_range(since, until):
+        chunk = expand_holds(chunk)
+        values = chunk[['accel_x', 'accel_y', 'accel_z', 'gyro_x', 'gyro_y', 'gyro_z']].to_numpy(np.float64)
+        chunk_labels = chunk['motion_label'].to_numpy(object)
+        for sequence_id, positions in chunk.groupby('sequence_id', dropna=False, sort=False).indices.items():
+            tail_values, tail_labels = tails.get(sequence_id, (np.empty((0, 6)), np.empty(0, dtype=object)))
+            block = np.concatenate([tail_values, values[positions]])
+            block_labels = np.concatenate([tail_labels, chunk_labels[positions]])
+            tails[sequence_id] = (block[-(MODEL_WINDOW - 1):], block_labels[-(MODEL_WINDOW - 1):])
+            
+            # Each full window is labeled with its newest sample's stored label
+            window_labels = block_labels[MODEL_WINDOW - 1:]
+            keep = np.zeros(len(window_labels), dtype=bool)
+            keep[::every] = True
+            keep &= pd.notna(window_labels) & (window_labels != 'collecting_data')
+            if keep.any():
+                features.append(window_features(block)[keep])
+                labels.append(window_labels[keep])
+    if not features:
+        return np.empty((0, len(MODEL_FEATURES))), np.empty(0, dtype=object)
+    return np.concatenate(features), np.concatenate(labels)
+
+class MotionClassifier:
+    """Interface for pluggable window classifiers used by the recognizers."""
+    
+    name = 'base'
+    window_size = MODEL_WINDOW
+    classes = ()
+    
+    def predict(self, features):
+        """Return class indices (into self.classes) for an (n, MODEL_FEATURES) feature matrix."""
+        raise NotImplementedError
+    
+    def predict_labels(self, features):
+        """Return label names (object array) for an (n, MODEL_FEATURES) feature matrix."""
+        return np.array(self.classes, dtype=object)[self.predict(features)]
+    
+    def classify_window(self, window):
+        """Return the label for one full (window, 6) block of samples, oldest first."""
+        return self.classes[int(self.predict(window_features(window, self.window_size))[0])]
+
+class ThresholdClassifier(MotionClassifier):
+    """The hand-tuned SimpleMotionRecognizer rules applied to feature rows (for comparisons).
+    
+    Magnitude rules only: the cadence rule needs the recognizer's longer
+    sliding window, which a 20-sample feature row doesn't have.
+    """
+    
+    name = 'thresholds'
+    classes = ('resting', 'running', 'walking', 'idle')
+    
+    def __init__(self, recognizer):
+        """Take the thresholds from a SimpleMotionRecognizer (or anything with the same attributes)."""
+        self.recognizer = recognizer
+    
+    def predict(self, features):
+        r = self.recognizer
+        accel_mean, accel_std, gyro_mean = features[:, 0], features[:, 1], features[:, 3]
+        # Same rule order as classify_features
+        resting = ((np.abs(accel_mean - r.baseline_accel) < r.idle_accel_range) &
+                   (accel_std < r.idle_std_max) & (gyro_mean < r.idle_gyro_max))
+        running = accel_mean > r.run_threshold
+        walking = (accel_mean > r.walk_threshold_min) & (accel_mean < r.walk_threshold_max)
+        return np.select([resting, running, walking], [0, 1, 2], default=3)
+
+class TreeClassifier(MotionClassifier):
+    """Decision tree over window features, stored as flat node arrays.
+    
+    Node i splits on feature[i] <= threshold[i] (left) or goes right;
+    feature[i] == -1 marks a leaf whose class is value[i].
+    """
+    
+    name = 'tree'
+    
+    def __init__(self, feature, threshold, left, right, value, classes, window_size=MODEL_WINDOW):
+        self.feature = np.asarray(feature, dtype=np.int16)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.int16)
+        self.classes = tuple(str(label) for label in classes)
+        self.window_size = int(window_size)
+        self.depth = self.tree_depth()
+        
+        # Plain lists for the one-window walk (indexing lists beats NumPy scalars)
+        self.nodes = list(zip(self.feature.tolist(), self.threshold.tolist(), self.left.tolist(),
+                              self.right.tolist(), self.value.tolist()))
+    
+    def tree_depth(self):
+        """Longest root-to-leaf path."""
+        depth = np.zeros(len(self.feature), dtype=np.int64)
+        for node in range(len(self.feature)):
+            if self.feature[node] >= 0:
+                depth[self.left[node]] = depth[self.right[node]] = depth[node] + 1
+        return int(depth.max()) if len(depth) else 0
+    
+    def predict(self, features):
+        # All rows descend one level per pass; leaves point at themselves
+        features = np.asarray(features, dtype=np.float64)
+        rows = np.arange(len(features))
+        node = np.zeros(len(features), dtype=np.int64)
+        for _ in range(self.depth):
+            feature = self.feature[node]
+            go_left = features[rows, np.maximum(feature, 0)] <= self.threshold[node]
+            node = np.where(feature < 0, node, np.where(go_left, self.left[node], self.right[node]))
+        return self.value[node].astype(np.int64)
+    
+    def classify_window(self, window):
+        features = window_features(window, self.window_size)[0].tolist()
+        feature, threshold, left, right, value = self.nodes[0]
+        while feature >= 0:
+            feature, threshold, left, right, value = self.nodes[left if features[feature] <= threshold else right]
+        return self.classes[value]
+    
+    def save(self, path=MODEL_FILE):
+        """Write the node arrays and metadata to an .npz file."""
+        np.savez(path, feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+                 value=self.value, classes=np.array(self.classes), feature_names=np.array(MODEL_FEATURES),
+                 window_size=self.window_size, sampling_rate=MODEL_SAMPLING_RATE)
+
+def load_model(path=MODEL_FILE):
+    """Load a TreeClassifier saved by TreeClassifier.save (raises ValueError for another feature set)."""
+    with np.load(path, allow_pickle=False) as data:
+        if tuple(data['feature_names'].tolist()) != MODEL_FEATURES or int(data['sampling_rate']) != MODEL_SAMPLING_RATE:
+            raise ValueError(f"{path} was trained on a different feature set; retrain it with motion_model.py train")
+        return TreeClassifier(data['feature'], data['threshold'], data['left'], data['right'], data['value'],
+                              data['classes'].tolist(), int(data['window_size']))
+
+def _gini(counts):
+    """Gini impurity times sample count for rows of class counts."""
+    totals = counts.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(totals > 0, totals - (counts * counts).sum(axis=-1) / totals, 0.0)
+
+def train_tree(features, labels, max_depth=TREE_MAX_DEPTH, min_leaf=TREE_MIN_LEAF, thresholds=TREE_THRESHOLDS):
+    """Fit a CART (Gini) tree on feature rows and label names; returns a TreeClassifier.
+    
+    Split points are per-feature quantiles, so every node's search is a few
+    bincounts over pre-binned features rather than a sort.
+    """
+    classes, y = np.unique(np.asarray(labels, dtype=str), return_inverse=True)
+    num_classes = len(classes)
+    features = np.asarray(features, dtype=np.float64)
+    
+    # Candidate thresholds and each row's bin: x <= edges[k] exactly when bin <= k
+    edges = [np.unique(np.quantile(features[:, f], np.linspace(0, 1, thresholds + 2)[1:-1]))
+             for f in range(features.shape[1])]
+    bins = np.column_stack([np.searchsorted(edges[f], features[:, f], side='left') for f in range(features.shape[1])])
+    
+    feature, threshold, left, right, value = [], [], [], [], []
+    
+    def add_node():
+        for column in (feature, threshold, left, right, value):
+            column.append(0)
+        return len(feature) - 1
+    
+    stack = [(add_node(), np.arange(len(y)), 0)]
+    while stack:
+        node, rows, depth = stack.pop()
+        counts = np.bincount(y[rows], minlength=num_classes)
+        feature[node], threshold[node], left[node], right[node], value[node] = -1, 0.0, node, node, int(counts.argmax())
+        if depth >= max_depth or len(rows) < 2 * min_leaf or counts.max() == len(rows):
+            continue
+        
+        # Best split over every feature and candidate threshold
+        best = (_gini(counts), None, None)
+        for f, f_edges in enumerate(edges):
+            if len(f_edges) == 0:
+                continue
+            hist = np.bincount(bins[rows, f] * num_classes + y[rows],
+                               minlength=(len(f_edges) + 1) * num_classes).reshape(-1, num_classes)
+            left_counts = np.cumsum(hist, axis=0)[:-1]
+            right_counts = counts - left_counts
+            impurity = _gini(left_counts) + _gini(right_counts)
+            valid = (left_counts.sum(axis=1) >= min_leaf) & (right_counts.sum(axis=1) >= min_leaf)
+            if not valid.any():
+                continue
+            k = int(np.argmin(np.where(valid, impurity, np.inf)))
+            if impurity[k] < best[0] - 1e-9:
+                best = (impurity[k], f, k)
+        
+        if best[1] is None:
+            continue
+        f, k = best[1], best[2]
+        goes_left = bins[rows, f] <= k
+        feature[node], threshold[node] = f, float(edges[f][k])
+        left[node], right[node] = add_node(), add_node()
+        stack.append((right[node], rows[~goes_left], depth + 1))
+        stack.append((left[node], rows[goes_left], depth + 1))
+    
+    return TreeClassifier(feature, threshold, left, right, value, classes.tolist())
+
+def confusion_table(truth, predicted):
+    """Print accuracy and a truth x predicted count table."""
+    truth = np.asarray(truth, dtype=object)
+    predicted = np.asarray(predicted, dtype=object)
+    accuracy = float((truth == predicted).mean()) if len(truth) else 0.0
+    labels = sorted(set(truth.tolist()) | set(predicted.tolist()))
+    pairs = Counter(zip(truth.tolist(), predicted.tolist()))
+    print(f"  accuracy: {accuracy * 100:.2f}% of {len(truth)} windows")
+    print("  " + f"{'truth / predicted':<18}" + "".join(f"{label:>12}" for label in labels))
+    for label in labels:
+        print("  " + f"{label:<18}" + "".join(f"{pairs[(label, other)]:>12}" for other in labels))
+    return accuracy
+
+def time_per_sample(recognizer_class, batch_class, classifier, values, live_samples=3000):
+    """(batch us/sample, live us/sample) of the ingest recognizers using a classifier (None: the thresholds)."""
+    values = np.asarray(values, dtype=np.float64)
+    started = time.perf_counter()
+    batch_class(recognizer_class(classifier)).classify(values)
+    batch_us = (time.perf_counter() - started) / max(len(values), 1) * 1e6
+    
+    # The live path: one add_sample + recognize_pattern per sample
+    recognizer = recognizer_class(classifier)
+    samples = values[:live_samples, :6].tolist()
+    started = time.perf_counter()
+    for sample in samples:
+        recognizer.add_sample(*sample)
+        recognizer.recognize_pattern()
+    live_us = (time.perf_counter() - started) / max(len(samples), 1) * 1e6
+    return batch_us, live_us
+
+def evaluate(model, features, labels, values):
+    """Compare a model with the threshold rules on labeled windows; returns a results dict."""
+    # Imported here: the ingest script imports this module
+    from test_db_connection import SimpleMotionRecognizer, BatchMotionClassifier
+    results = {}
+    for classifier, live_classifier in ((ThresholdClassifier(SimpleMotionRecognizer()), None), (model, model)):
+        print(f"\n{classifier.name}:")
+        accuracy = confusion_table(labels, classifier.predict_labels(features))
+        batch_us, live_us = time_per_sample(SimpleMotionRecognizer, BatchMotionClassifier, live_classifier, values)
+        within = "within" if live_us <= SAMPLE_CPU_BUDGET_US else "OVER"
+        print(f"  latency: batch {batch_us:.2f} us/sample, live {live_us:.1f} us/sample "
+              f"({within} the {SAMPLE_CPU_BUDGET_US:.0f} us budget)")
+        results[classifier.name] = {'accuracy': accuracy, 'batch_us': batch_us, 'live_us': live_us}
+    return results
+
+def main():
+    """Command line entry point: train a model, or evaluate one against the thresholds."""
+    # The analyzer's store settings; imported here because the ingest script
+    # loads this module for the classifier and must not pull in the chart code
+    from machine_learned_results import DB_CONFIG, STORAGE_BACKEND
+    
+    parser = argparse.ArgumentParser(description="Train or evaluate the decision-tree motion classifier.")
+    parser.add_argument('command', choices=['train', 'evaluate'])
+    parser.add_argument('--model', default=MODEL_FILE, help="model file to write (train) or read (evaluate)")
+    parser.add_argument('--synthetic', metavar='SCHEDULE',
+                        help="use motion_replay profiles (e.g. resting:600,walking:300,running:300) instead of sensor_data")
+    parser.add_argument('--noise', type=float, default=1.0, help="synthetic: scale the profiles' sensor noise")
+    parser.add_argument('--seed', type=int, help="synthetic: random seed (default 0 to train, 1 to evaluate)")
+    parser.add_argument('--backend', choices=['mysql', 'sqlite', 'parquet', 'standin'], default=STORAGE_BACKEND)
+    parser.add_argument('--since', default='1970-01-01', help="first stored timestamp to use")
+    parser.add_argument('--until', help="stop before this timestamp")
+    parser.add_argument('--every', type=int, default=1, help="use every Nth stored window")
+    parser.add_argument('--max-depth', type=int, default=TREE_MAX_DEPTH)
+    parser.add_argument('--min-leaf', type=int, default=TREE_MIN_LEAF)
+    args = parser.parse_args()
+    
+    values = None
+    if args.synthetic:
+        seed = args.seed if args.seed is not None else (0 if args.command == 'train' else 1)
+        values, labels = synthetic_training_data(args.synthetic, args.noise, seed)
+        features, labels = window_features(values), labels[MODEL_WINDOW - 1:]
+    else:
+        storage = None
+        try:
+            storage = open_storage(args.backend, DB_CONFIG)
+            until = datetime.fromisoformat(args.until) if args.until else None
+            features, labels = stored_training_data(storage, datetime.fromisoformat(args.since), until, args.every)
+        except STORAGE_ERRORS as e:
+            print(f"Database error: {e}")
+            return
+        finally:
+            if storage:
+                storage.close()
+    
+    if len(labels) == 0:
+        print("No labeled windows found.")
+        return
+    print(f"{len(labels)} labeled windows: " +
+          ", ".join(f"{label} {count}" for label, count in Counter(labels.tolist()).most_common()))
+    
+    if args.command == 'train':
+        started = time.perf_counter()
+        model = train_tree(features, labels, args.max_depth, args.min_leaf)
+        print(f"Trained a depth-{model.depth} tree with {len(model.feature)} nodes in {time.perf_counter() - started:.2f} s")
+        confusion_table(labels, model.predict_labels(features))
+        model.save(args.model)
+        print(f"Model written to {args.model}")
+        return
+    
+    if not os.path.exists(args.model):
+        print(f"No model at {args.model}; run: python motion_model.py train")
+        sys.exit(1)
+    model = load_model(args.model)
+    if values is None:
+        # Stored windows have no raw block handy for timing; time on synthetic data
+        values = synthetic_training_data('resting:60,walking:60,running:60')[0]
+    evaluate(model, features, labels, values)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import os
+import glob
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from collections import Counter
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from motion_storage import STORAGE_ERRORS
+from machine_learned_results import STORAGE_BACKEND, FixedPatternRecognizer
+
+# Shard length: a multiple of the 15 s analysis window, so no window is ever
+# split between shards and every shard can be analyzed on its own
+SHARD_MINUTES = 60
+
+# Per-shard columns, appended as raw arrays and memory-mapped by the workers
+SHARD_COLUMNS = {'timestamp': np.int64, 'label': np.int16,  # datetime64[us] ticks, label code
+                 'accel_x': np.float32, 'accel_y': np.float32, 'accel_z': np.float32}  # for the window cadence
+
+class ShardWriter:
+    """Splits time-ordered sample chunks into memory-mappable shard files.
+    
+    by='time' keys shards on the hour; by='sequence' on (sequence_id, hour),
+    which also keeps one long session from becoming a single oversized task.
+    """
+    
+    def __init__(self, directory, by='time', shard_minutes=SHARD_MINUTES, window_size=15):
+        if by not in ('time', 'sequence'):
+            raise ValueError(f"Unknown shard key: {by} (choose 'time' or 'sequence')")
+        if shard_minutes * 60 % window_size:
+            raise ValueError("shard_minutes must be a whole number of analysis windows")
+        self.directory = directory
+        self.by = by
+        self.span_us = shard_minutes * 60 * 1000000
+        
+        # Shards are appended to, so a reused --shard-dir must not keep an
+        # earlier run's files (workers map only the first `rows` of each)
+        for path in glob.glob(os.path.join(directory, 'shard-*.*')):
+            os.remove(path)
+        
+        # Label vocabulary shared by all shards (code -1 is a missing label)
+        self.labels = {}
+        
+        # key -> (file prefix, rows)
+        self.shards = {}
+        self.rows = 0
+    
+    def _label_codes(self, labels):
+        codes, uniques = pd.factorize(labels)
+        mapping = np.array([self.labels.setdefault(label, len(self.labels)) for label in uniques] + [-1],
+                           dtype=np.int16)
+        return mapping[codes]  # codes of -1 pick the trailing -1
+    
+    def add(self, chunk):
+        """Append one chunk's rows to their shards (file order stays time order)."""
+        if len(chunk) == 0:
+            return
+        ticks = chunk['timestamp'].to_numpy('datetime64[us]').view(np.int64)
+        codes = self._label_codes(chunk['motion_label'].to_numpy(object))
+        columns = {'timestamp': ticks, 'label': codes}
+        columns.update((axis, chunk[axis].to_numpy()) for axis in ('accel_x', 'accel_y', 'accel_z'))
+        
+        span = ticks // self.span_us
+        if self.by == 'sequence':
+            sequence_codes, sequences = pd.factorize(chunk['sequence_id'], use_na_sentinel=False)
+            group = sequence_codes.astype(np.int64) * (int(span.max()) + 1) + span
+        else:
+            sequences = None
+            group = span
+        
+        # Stable sort groups rows by shard without reordering them inside one
+        order = np.argsort(group, kind='stable')
+        bounds = np.flatnonzero(np.diff(group[order])) + 1
+        for rows in np.split(order, bounds):
+            first = rows[0]
+            if sequences is None:
+                key = (int(span[first]),)
+            else:
+                key = (sequences[sequence_codes[first]], int(span[first]))
+            prefix, count = self.shards.get(key, (None, 0))
+            if prefix is None:
+                prefix = os.path.join(self.directory, f"shard-{len(self.shards):06d}")
+            for column, values in columns.items():
+                with open(f"{prefix}.{column}", 'ab') as f:
+                    f.write(values[rows].astype(SHARD_COLUMNS[column]).tobytes())
+            self.shards[key] = (prefix, count + len(rows))
+        self.rows += len(chunk)
+    
+    def tasks(self):
+        """(key, prefix, rows) per shard, largest first so stragglers start early."""
+        return sorted(((key, prefix, rows) for key, (prefix, rows) in self.shards.items()),
+                      key=lambda task: -task[2])
+    
+    def vocabulary(self):
+        """Labels in code order."""
+        return list(self.labels)
+
+def _shard_order(key):
+    """Sort key for shard keys (sequence ids may be missing, so compare them as text)."""
+    return tuple(part if isinstance(part, int) else str(part) for part in key)
+
+# Per-process recognizer, built once by the pool initializer
+_worker = {}
+
+def _init_worker(pattern_definitions, motion_labels, window_size, vocabulary):
+    """Build the worker's recognizer with the parent's rules."""
+    recognizer = FixedPatternRecognizer()
+    recognizer.pattern_definitions = pattern_definitions
+    recognizer.motion_labels = motion_labels
+    recognizer.window_size = window_size
+    recognizer.compile_patterns()
+    _worker['recognizer'] = recognizer
+    _worker['vocabulary'] = pd.Index(vocabulary, dtype=object)
+
+def analyze_shard(prefix, rows):
+    """Analyze one memory-mapped shard and return its segments."""
+    columns = {column: np.memmap(f"{prefix}.{column}", dtype=dtype, mode='r', shape=(rows,))
+               for column, dtype in SHARD_COLUMNS.items()}
+    df = pd.DataFrame({
+        'timestamp': columns['timestamp'].view('datetime64[us]'),
+        'motion_label': pd.Categorical.from_codes(columns['label'], categories=_worker['vocabulary']),
+        'accel_x': columns['accel_x'],
+        'accel_y': columns['accel_y'],
+        'accel_z': columns['accel_z']
+    })
+    return _worker['recognizer'].analyze_motion_segments(df, verbose=False)
+
+def analyze_parallel(recognizer, chunks, by='time', workers=None, shard_minutes=SHARD_MINUTES, shard_dir=None):
+    """Analyze time-ordered chunks across a process pool; returns (segments_df, stats).
+    
+    Results are merged in shard key order, so the output does not depend on
+    which worker finishes first. by='time' gives exactly the segments of
+    analyze_motion_chunks; by='sequence' gives per-sequence segments with a
+    sequence_id column.
+    """
+    workdir = shard_dir or tempfile.mkdtemp(prefix='motion_shards_')
+    os.makedirs(workdir, exist_ok=True)
+    stats = {}
+    try:
+        # Stage 1: stream the chunks out to shard files
+        started = time.perf_counter()
+        writer = ShardWriter(workdir, by, shard_minutes, recognizer.window_size)
+        for chunk in chunks:
+            writer.add(chunk)
+        stats['shard_seconds'] = time.perf_counter() - started
+        tasks = writer.tasks()
+        
+        # Stage 2: workers map the shards; only paths and segments are pickled
+        started = time.perf_counter()
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(recognizer.pattern_definitions, recognizer.motion_labels,
+                                           recognizer.window_size, writer.vocabulary())) as pool:
+            futures = {key: pool.submit(analyze_shard, prefix, rows) for key, prefix, rows in tasks}
+            results = {key: future.result() for key, future in futures.items()}
+        stats['analyze_seconds'] = time.perf_counter() - started
+        
+        # Deterministic merge: sort by shard key (time, or sequence then time)
+        parts = []
+        for key in sorted(results, key=_shard_order):
+            segments = results[key]
+            if len(segments) == 0:
+                continue
+            if by == 'sequence':
+                segments.insert(0, 'sequence_id', key[0])
+            parts.append(segments)
+        segments_df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+        
+        stats.update({'rows': writer.rows, 'shards': len(tasks), 'workers': workers})
+        return segments_df, stats
+    finally:
+        if shard_dir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def print_report(segments_df, stats, by):
+    """Print throughput and the pattern breakdown (per sequence when sharded by sequence)."""
+    total = stats['shard_seconds'] + stats['analyze_seconds']
+    print(f"\nAnalyzed {stats['rows']} rows in {stats['shards']} shards on {stats['workers']} workers")
+    print(f"  sharding: {stats['shard_seconds']:.2f} s, analysis: {stats['analyze_seconds']:.2f} s "
+          f"({stats['rows'] / total if total else 0:.0f} rows/s overall)")
+    if len(segments_df) == 0:
+        print("No valid segments found in the data.")
+        return
+    
+    print(f"\n{len(segments_df)} segments")
+    for pattern, count in Counter(segments_df['pattern']).most_common():
+        print(f"  {pattern}: {count} ({count / len(segments_df) * 100:.1f}%)")
+    
+    if by == 'sequence':
+        print(f"\n{'Sequence':<40} {'Segments':>9}  Most common pattern")
+        print("-" * 72)
+        for sequence_id, group in segments_df.groupby('sequence_id', sort=True, dropna=False):
+            pattern, count = Counter(group['pattern']).most_common(1)[0]
+            print(f"{str(sequence_id):<40} {len(group):>9}  {pattern} ({count / len(group) * 100:.0f}%)")
+
+def main():
+    """Command line entry point (e.g. a fleet-wide daily report)."""
+    parser = argparse.ArgumentParser(description="Analyze stored motion data into segments on all cores.")
+    parser.add_argument('--since', help="first timestamp (default: 24 hours ago)")
+    parser.add_argument('--until', help="stop before this timestamp")
+    parser.add_argument('--by', choices=['time', 'sequence'], default='sequence',
+                        help="shard by hour, or by sequence (one device session) and hour")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per core)")
+    parser.add_argument('--shard-minutes', type=int, default=SHARD_MINUTES)
+    parser.add_argument('--shard-dir', help="keep the memory-mapped shards in this directory")
+    parser.add_argument('--output', help="write the segments to this CSV")
+    parser.add_argument('--json', help="also write the timing stats to this JSON file")
+    args = parser.parse_args()
+    
+    since = datetime.fromisoformat(args.since) if args.since else datetime.now() - timedelta(days=1)
+    until = datetime.fromisoformat(args.until) if args.until else None
+    
+    recognizer = FixedPatternRecognizer()
+    print(f"Analyzing {STORAGE_BACKEND} data from {since} ({args.by} shards)...")
+    try:
+        segments_df, stats = analyze_parallel(recognizer, recognizer.iter_range_chunks(since, until), args.by,
+                                              args.workers, args.shard_minutes, args.shard_dir)
+    except STORAGE_ERRORS as e:
+        print(f"Database error: {e}")
+        return
+    finally:
+        if recognizer.storage:
+            recognizer.storage.close()
+    
+    print_report(segments_df, stats, args.by)
+    if args.output and len(segments_df) > 0:
+        segments_df.to_csv(args.output, index=False)
+        print(f"\nSegments written to {args.output}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(stats, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import os
+import json
+import hashlib
+import numpy as np
+from datetime import datetime, timedelta
+
+# Pattern rules and the live segment aggregator: everything segment analysis
+# needs except the charts, so the ingest script can use it without matplotlib
+
+# Optional JSON file with pattern rules, checked in priority order:
+# {"pattern_name": [{"motions": [...], "min_percentage": 0.4,
+#                    "min_consecutive": 3, "min_transitions": 3}, ...], ...}
+PATTERN_DEFINITIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pattern_definitions.json')
+
+def load_pattern_definitions(path):
+    """Load pattern rules from a JSON file, keeping the file's priority order."""
+    with open(path) as f:
+        return json.load(f)
+
+# Segments need at least this many samples (batch and live analysis)
+MIN_SEGMENT_SAMPLES = 5
+
+# Windows are aligned to multiples of the window size since the epoch
+WINDOW_EPOCH = datetime(1970, 1, 1)
+
+class CompiledPatternRules:
+    """Pattern rules compiled into threshold arrays for vectorized first-match."""
+    
+    def __init__(self, pattern_definitions, motion_labels):
+        """Flatten the rules in priority order into per-rule columns and thresholds."""
+        self.pattern_names = []
+        self.member_columns = []
+        min_percentage = []
+        min_consecutive = []
+        min_transitions = []
+        
+        for pattern_name, rules in pattern_definitions.items():
+            for rule in rules:
+                motions = rule.get('motions') or []
+                self.pattern_names.append(pattern_name)
+                
+                # Columns summed in the rule's own order so totals round the same way;
+                # labels outside motion_labels contribute 0 and are dropped
+                self.member_columns.append([motion_labels.index(m) for m in motions if m in motion_labels])
+                
+                # A check that doesn't apply gets a threshold of -inf (always passes)
+                min_percentage.append(rule['min_percentage'] * 100
+                                      if 'min_percentage' in rule and motions else -np.inf)
+                min_consecutive.append(rule['min_consecutive']
+                                       if 'min_consecutive' in rule and motions else -np.inf)
+                min_transitions.append(rule.get('min_transitions', -np.inf))
+        
+        # Threshold matrix: one row per check, one column per rule
+        self.thresholds = np.array([min_percentage, min_consecutive, min_transitions], dtype=np.float64)
+        self.labels = np.array(self.pattern_names + ["unknown"], dtype=object)
+    
+    def evaluate(self, percentages, max_consecutive, transitions):
+        """Return the first matching pattern for every row (or "unknown").
+        
+        percentages and max_consecutive are (segments x motion_labels) arrays,
+        transitions is a (segments,) array.
+        """
+        num_segments = len(transitions)
+        num_rules = len(self.pattern_names)
+        if not num_rules:
+            return np.full(num_segments, "unknown", dtype=object)
+        total_pct = np.zeros((num_segments, num_rules))
+        max_cons = np.zeros((num_segments, num_rules))
+        
+        for r, columns in enumerate(self.member_columns):
+            for column in columns:
+                total_pct[:, r] += percentages[:, column]
+            if columns:
+                max_cons[:, r] = max_consecutive[:, columns].max(axis=1)
+        
+        matches = ((total_pct >= self.thresholds[0]) &
+                   (max_cons >= self.thresholds[1]) &
+                   (np.asarray(transitions)[:, None] >= self.thresholds[2]))
+        
+        # First match in priority order; rows with no match map to "unknown"
+        first = np.where(matches.any(axis=1), matches.argmax(axis=1), num_rules)
+        return self.labels[first]
+
+class MotionPatternRules:
+    """Window size, motion labels and compiled pattern rules (the batch and live analysis share them)."""
+    
+    def __init__(self):
+        # Time window for pattern analysis
+        self.window_size = 15  # seconds
+        
+        # Hard-coded motion labels to match what's in your database
+        self.motion_labels = ['resting', 'idle', 'walking', 'running']
+        
+        # Pattern definitions (overridden by PATTERN_DEFINITIONS_FILE if present)
+        self.pattern_definitions = {
+            'active': [
+                {'motions': ['walking', 'running'], 'min_consecutive': 3, 'min_percentage': 0.4}
+            ],
+            'stationary': [
+                {'motions': ['resting', 'idle'], 'min_consecutive': 5, 'min_percentage': 0.7}
+            ],
+            'mixed': [
+                {'motions': ['walking', 'idle'], 'min_percentage': 0.4, 'min_transitions': 3}
+            ]
+        }
+        if os.path.exists(PATTERN_DEFINITIONS_FILE):
+            self.pattern_definitions = load_pattern_definitions(PATTERN_DEFINITIONS_FILE)
+        
+        # Rules compiled once into threshold arrays for whole-table matching
+        self.compile_patterns()
+    
+    def compile_patterns(self):
+        """Recompile the rule set (call again after editing pattern_definitions)."""
+        self.pattern_rules = CompiledPatternRules(self.pattern_definitions, self.motion_labels)
+    
+    def rules_hash(self):
+        """Digest of everything that decides a segment's pattern (labels and pattern rules)."""
+        rules = json.dumps({'motion_labels': self.motion_labels, 'patterns': self.pattern_definitions})
+        return hashlib.sha256(rules.encode()).hexdigest()
+    
+    def determine_pattern(self, percentages, max_consecutive, transitions):
+        """Determine the pattern for a segment based on simple rules."""
+        # Check each pattern definition
+        for pattern_name, rules in self.pattern_definitions.items():
+            for rule in rules:
+                # Check if this rule matches
+                rule_matches = True
+                
+                # Check motion percentages
+                if 'min_percentage' in rule and rule['motions']:
+                    total_pct = sum(percentages.get(m, 0) for m in rule['motions'])
+                    if total_pct < rule['min_percentage'] * 100:
+                        rule_matches = False
+                
+                # Check consecutive counts
+                if 'min_consecutive' in rule and rule['motions']:
+                    max_cons = max([max_consecutive.get(m, 0) for m in rule['motions']])
+                    if max_cons < rule['min_consecutive']:
+                        rule_matches = False
+                
+                # Check transitions
+                if 'min_transitions' in rule and transitions < rule['min_transitions']:
+                    rule_matches = False
+                
+                # If this rule matches, return the pattern
+                if rule_matches:
+                    return pattern_name
+        
+        # If no patterns match, return unknown
+        return "unknown"
+
+class OnlineSegmentAggregator:
+    """analyze_motion_segments for one live stream, one sample at a time.
+    
+    Keeps the open window's label counts, current run and transitions, and
+    returns the finished segment (same label fields and pattern rules as the
+    batch analysis; no cadence, which needs the raw axes) when a sample lands
+    in a later window or flush() is called.
+    """
+    
+    def __init__(self, recognizer=None):
+        recognizer = recognizer or MotionPatternRules()
+        self.rules = recognizer.pattern_rules
+        self.motion_labels = recognizer.motion_labels
+        self.window = timedelta(seconds=recognizer.window_size)
+        
+        # Listed labels map to 0..K-1, anything else to K (counted, never reported)
+        self.codes = {label: i for i, label in enumerate(self.motion_labels)}
+        self.other = len(self.motion_labels)
+        
+        self.window_start = None
+        self.window_end = None
+    
+    def open_window(self, timestamp):
+        """Start the window containing timestamp (floored like pandas .dt.floor)."""
+        self.window_start = WINDOW_EPOCH + (timestamp - WINDOW_EPOCH) // self.window * self.window
+        self.window_end = self.window_start + self.window
+        self.samples = 0
+        self.counts = [0] * (self.other + 1)
+        self.max_consecutive = [0] * (self.other + 1)
+        self.transitions = 0
+        self.run_label = None
+        self.run_length = 0
+    
+    def add(self, timestamp, label):
+        """Count one stored sample; returns the previous window's segment once it closes."""
+        closed = None
+        if self.window_start is None or not self.window_start <= timestamp < self.window_end:
+            closed = self.flush()
+            self.open_window(timestamp)
+        
+        # Runs and transitions follow the raw label, counts the listed code
+        code = self.codes.get(label, self.other)
+        if self.samples and label == self.run_label:
+            self.run_length += 1
+        else:
+            if self.samples:
+                self.transitions += 1
+            self.run_label = label
+            self.run_length = 1
+        if self.run_length > self.max_consecutive[code]:
+            self.max_consecutive[code] = self.run_length
+        self.counts[code] += 1
+        self.samples += 1
+        return closed
+    
+    def flush(self, now=None):
+        """Close the open window (only if now is past its end, when given) and return its segment."""
+        if self.window_start is None or (now is not None and now < self.window_end):
+            return None
+        start_time, samples = self.window_start, self.samples
+        self.window_start = self.window_end = None
+        
+        # Skip windows with too few data points
+        if samples < MIN_SEGMENT_SAMPLES:
+            return None
+        
+        num_labels = self.other
+        percentages = np.array(self.counts[:num_labels]) / np.array([samples])[:, None] * 100
+        max_consecutive = np.array([self.max_consecutive[:num_labels]])
+        pattern = self.rules.evaluate(percentages, max_consecutive, np.array([self.transitions]))[0]
+        
+        segment = {'start_time': start_time, 'end_time': start_time + self.window}
+        for motion in ('resting', 'idle', 'walking', 'running'):
+            segment[f'{motion}_pct'] = percentages[0, self.codes[motion]] if motion in self.codes else 0
+        for motion in ('resting', 'idle', 'walking', 'running'):
+            segment[f'max_consecutive_{motion}'] = self.max_consecutive[self.codes[motion]] if motion in self.codes else 0
+        segment.update({'transitions': self.transitions, 'samples': samples, 'pattern': pattern})
+        return segment
@@ -0,0 +1,694 @@
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import random
+import signal
+import argparse
+import tempfile
+import threading
+import itertools
+import contextlib
+import subprocess
+import socketserver
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from motion_storage import (SENSOR_COLUMNS, STORAGE_ERRORS, FETCH_CHUNK_ROWS, StorageBackend, SQLiteStorage,
+                            create_storage, encode_row, decode_row, is_connection_error)
+
+# Connection pool defaults
+POOL_SIZE = 4
+POOL_TIMEOUT = 10.0           # Seconds to wait for a free connection
+HEALTH_CHECK_SECONDS = 30.0   # Idle connections older than this are pinged before reuse
+
+# Reconnect backoff: 0.5 s, 1 s, 2 s ... capped, with jitter so several
+# ingest hosts don't all reconnect in the same instant after a restart
+RECONNECT_INITIAL_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30.0
+CONNECT_ATTEMPTS = 4  # Tries (with backoff) before a read or the first connect gives up
+
+# Samples the store couldn't take are appended here and written back in bulk
+# once it reconnects (also on the next start if the process exits first)
+SPILL_JOURNAL_PATH = 'motion_spill.journal'
+SPILL_REPLAY_ROWS = 5000  # Rows per bulk write when replaying the journal
+
+# Batches the store refused (not an outage: retrying can't help) are moved
+# here, next to the journal, for someone to inspect
+SPILL_REJECTED_SUFFIX = '.rejected'
+
+# Local stand-in store (python motion_pool.py standin): SQLite behind a TCP
+# socket, so "the database" can be killed and restarted like a real server
+STANDIN_ADDRESS = ('127.0.0.1', 3307)
+STANDIN_PATH = 'motion_standin.sqlite3'
+STANDIN_TIMEOUT = 5.0
+
+class ConnectionPool:
+    """Thread-safe pool of DB-API style connections with health checks.
+    
+    connect() opens a connection and ping(conn) raises if it is dead. Any
+    error inside a checkout discards that connection and makes every idle
+    one older than the failure suspect (pinged before it is handed out).
+    """
+    
+    def __init__(self, connect, ping, size=POOL_SIZE, health_check_seconds=HEALTH_CHECK_SECONDS, timeout=POOL_TIMEOUT):
+        self.connect = connect
+        self.ping = ping
+        self.health_check_seconds = health_check_seconds
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        
+        # Idle (connection, returned_at) pairs; the most recently used is reused first
+        self.idle = []
+        
+        # Prepared statements per connection: id(connection) -> {key: statement}
+        self.statements = {}
+        
+        # Connections returned before this moment are pinged before reuse
+        self.suspect_before = 0.0
+        
+        self.stats = {'opened': 0, 'reused': 0, 'health_checks': 0, 'discarded': 0, 'prepared': 0}
+    
+    @contextlib.contextmanager
+    def connection(self):
+        """Check out a healthy connection; it goes back to the pool unless the block raises (or is abandoned)."""
+        if not self.slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No free database connection within {self.timeout:.0f} s")
+        try:
+            conn = self._checkout()
+            try:
+                yield conn
+            except BaseException:
+                self.discard(conn)
+                raise
+            with self.lock:
+                self.idle.append((conn, time.monotonic()))
+        finally:
+            self.slots.release()
+    
+    def _checkout(self):
+        """Reuse an idle connection (pinging stale or suspect ones) or open a new one."""
+        while True:
+            with self.lock:
+                conn, returned_at = self.idle.pop() if self.idle else (None, None)
+            if conn is None:
+                conn = self.connect()
+                self.stats['opened'] += 1
+                return conn
+            
+            if returned_at <= self.suspect_before or time.monotonic() - returned_at >= self.health_check_seconds:
+                self.stats['health_checks'] += 1
+                try:
+                    self.ping(conn)
+                except Exception:
+                    self._drop(conn)
+                    continue
+            self.stats['reused'] += 1
+            return conn
+    
+    def statement(self, conn, key, prepare):
+        """Return conn's statement for key, calling prepare(conn) only the first time."""
+        cache = self.statements.setdefault(id(conn), {})
+        if key not in cache:
+            cache[key] = prepare(conn)
+            self.stats['prepared'] += 1
+        return cache[key]
+    
+    def discard(self, conn):
+        """Close a connection that failed, and distrust the ones idle since before it."""
+        self.suspect_before = time.monotonic()
+        self._drop(conn)
+    
+    def _drop(self, conn):
+        self.statements.pop(id(conn), None)
+        self.stats['discarded'] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass  # Already broken
+    
+    def close(self):
+        """Close every idle connection (checked-out ones close when discarded)."""
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn, returned_at in idle:
+            self.statements.pop(id(conn), None)
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+class Backoff:
+    """Exponential reconnect delays with jitter, reset after a success."""
+    
+    def __init__(self, initial=RECONNECT_INITIAL_DELAY, maximum=RECONNECT_MAX_DELAY):
+        self.initial = initial
+        self.maximum = maximum
+        self.attempts = 0
+    
+    def next_delay(self):
+        """Seconds to wait before the next attempt."""
+        delay = min(self.initial * 2 ** self.attempts, self.maximum)
+        self.attempts = min(self.attempts + 1, 32)
+        return delay * random.uniform(0.8, 1.0)
+    
+    def reset(self):
+        self.attempts = 0
+
+class SpillJournal:
+    """Append-only file of sample batches the store couldn't take, one JSON line per batch."""
+    
+    def __init__(self, path=SPILL_JOURNAL_PATH):
+        self.path = path
+        # Rows left by an earlier run are replayed like any others
+        self.rows = sum(len(batch) for batch in self._read())
+    
+    def _read(self):
+        """Journaled batches, oldest first (a torn last line from a crash is skipped)."""
+        if not os.path.exists(self.path):
+            return []
+        batches = []
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    batches.append(json.loads(line))
+                except ValueError:
+                    print(f"Skipping a damaged line in {self.path}")
+        return batches
+    
+    def __len__(self):
+        return self.rows
+    
+    def append(self, rows):
+        """Durably add one batch (fsynced, so it survives a crash right after)."""
+        with open(self.path, 'a') as f:
+            f.write(json.dumps([encode_row(row) for row in rows]) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.rows += len(rows)
+    
+    def replay(self, write, batch_rows=SPILL_REPLAY_ROWS, reject=None):
+        """Write the journaled rows in bulk, oldest first; returns how many were written.
+        
+        Progress is kept after every bulk write, so a failure part way leaves
+        only the unwritten rows in the journal. With reject(rows, error), a bulk
+        write the store refuses is retried batch by batch and the refused
+        batches are handed to reject instead of stopping the replay.
+        """
+        batches = self._read()
+        done = 0
+        written = 0
+        isolate_until = 0  # After a refused bulk write, batches before this go one at a time
+        try:
+            while done < len(batches):
+                end = done + 1
+                if done >= isolate_until:
+                    rows = len(batches[done])
+                    while end < len(batches) and rows + len(batches[end]) <= batch_rows:
+                        rows += len(batches[end])
+                        end += 1
+                group = [decode_row(values) for batch in batches[done:end] for values in batch]
+                try:
+                    write(group)
+                    written += len(group)
+                except STORAGE_ERRORS as e:
+                    if reject is None or is_connection_error(e):
+                        raise
+                    if end - done > 1:
+                        isolate_until = end
+                        continue
+                    reject(group, e)
+                done = end
+        finally:
+            self._rewrite(batches[done:])
+        return written
+    
+    def _rewrite(self, batches):
+        """Replace the journal with the batches still pending (atomically)."""
+        if not batches:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        else:
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as f:
+                f.writelines(json.dumps(batch) + '\n' for batch in batches)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        self.rows = sum(len(batch) for batch in batches)
+
+class ResilientStorage(StorageBackend):
+    """Any storage backend plus reconnect with backoff and (for writers) a spill journal.
+    
+    While the store is down, write_samples appends to the journal instead of
+    failing, and retries the store once the backoff delay has passed; on
+    reconnect the journal is written back in bulk before new rows. Batches the
+    store refuses while up (anything but is_connection_error) go to the rejected file
+    (journal path + SPILL_REJECTED_SUFFIX) rather than blocking the journal.
+    Reads are retried with backoff up to `attempts` times.
+    """
+    
+    def __init__(self, storage, journal_path=None, attempts=CONNECT_ATTEMPTS, backoff=None):
+        """Wrap an unconnected backend; journal_path=None (readers) raises write errors instead of spilling."""
+        self.storage = storage
+        self.name = storage.name
+        self.journal = SpillJournal(journal_path) if journal_path else None
+        self.rejected = SpillJournal(journal_path + SPILL_REJECTED_SUFFIX) if journal_path else None
+        self.attempts = attempts
+        self.backoff = backoff or Backoff()
+        
+        self.available = False
+        self.down_since = None
+        self.retry_at = 0.0
+        self.last_error = None
+        
+        # The writer thread and close() may both write
+        self.lock = threading.Lock()
+        
+        self.stats = {'outages': 0, 'reconnects': 0, 'spilled_rows': 0, 'replayed_rows': 0, 'rejected_rows': 0}
+    
+    def _reconnect(self):
+        """Try the store once; returns whether it is available."""
+        try:
+            self.storage.connect()
+        except STORAGE_ERRORS as e:
+            self._mark_down(e)
+            return False
+        
+        if self.down_since is not None:
+            self.stats['reconnects'] += 1
+            pending = f"; replaying {len(self.journal)} spilled samples" if self.journal is not None and len(self.journal) else ""
+            print(f"Database reconnected after {time.monotonic() - self.down_since:.1f} s{pending}")
+        self.available = True
+        self.down_since = None
+        self.backoff.reset()
+        return True
+    
+    def _mark_down(self, error):
+        """Record a failure and schedule the next attempt."""
+        if self.available or self.down_since is None:
+            self.stats['outages'] += 1
+            self.down_since = time.monotonic()
+            spilling = f"; spilling samples to {self.journal.path}" if self.journal is not None else ""
+            print(f"Database unavailable: {error}{spilling}")
+        self.available = False
+        self.last_error = error
+        self.retry_at = time.monotonic() + self.backoff.next_delay()
+    
+    def connect(self):
+        """Connect, retrying with backoff; raises the last error once `attempts` tries have failed."""
+        for attempt in range(self.attempts):
+            if self._reconnect():
+                return
+            if attempt + 1 < self.attempts:
+                time.sleep(max(self.retry_at - time.monotonic(), 0))
+        raise self.last_error
+    
+    def write_samples(self, rows):
+        if self.journal is None:
+            return self._read(lambda: self.storage.write_samples(rows))
+        with self.lock:
+            # Don't hammer a store that is down: spill until the retry is due
+            if not self.available and (time.monotonic() < self.retry_at or not self._reconnect()):
+                self._spill(rows)
+                return
+            try:
+                self._replay_journal()
+                self.storage.write_samples(rows)
+            except STORAGE_ERRORS as e:
+                if is_connection_error(e):
+                    self._mark_down(e)
+                    self._spill(rows)
+                else:
+                    self._reject(rows, e)
+    
+    def _spill(self, rows):
+        self.journal.append(rows)
+        self.stats['spilled_rows'] += len(rows)
+    
+    def _reject(self, rows, error):
+        """Set aside a batch the store refused; the store itself is fine."""
+        self.rejected.append(rows)
+        self.stats['rejected_rows'] += len(rows)
+        print(f"Database rejected {len(rows)} samples ({error}); kept in {self.rejected.path}")
+    
+    def _replay_journal(self):
+        """Write spilled rows back in bulk (what was written stays written if it fails part way)."""
+        pending = len(self.journal)
+        if pending:
+            rejected = self.stats['rejected_rows']
+            try:
+                self.journal.replay(self.storage.write_samples, reject=self._reject)
+            finally:
+                self.stats['replayed_rows'] += pending - len(self.journal) - (self.stats['rejected_rows'] - rejected)
+    
+    def _read(self, read):
+        """Run read(), reconnecting with backoff between failed attempts."""
+        for attempt in range(self.attempts):
+            if self.available or self._reconnect():
+                try:
+                    return read()
+                except STORAGE_ERRORS as e:
+                    if not is_connection_error(e):
+                        raise
+                    self._mark_down(e)
+            if attempt + 1 < self.attempts:
+                time.sleep(max(self.retry_at - time.monotonic(), 0))
+        raise self.last_error
+    
+    def _stream(self, open_stream):
+        """Retry until a stream yields its first item; later failures are raised (a retry would repeat rows)."""
+        def first():
+            stream = open_stream()
+            for item in stream:
+                return itertools.chain([item], stream)
+            return iter(())
+        yield from self._read(first)
+    
+    def iter_range(self, start_time, end_time=None, chunk_rows=FETCH_CHUNK_ROWS):
+        return self._stream(lambda: self.storage.iter_range(start_time, end_time, chunk_rows))
+    
+    def iter_new_rows(self, after_id, start_time, chunk_rows=FETCH_CHUNK_ROWS):
+        return self._stream(lambda: self.storage.iter_new_rows(after_id, start_time, chunk_rows))
+    
+    def identity(self):
+        return self.storage.identity()
+    
+    def summary(self):
+        return self._read(self.storage.summary)
+    
+    def collect_metrics(self):
+        """Outage and journal counters for the metrics registry."""
+        yield ('motion_db_available', 'gauge', 'Whether the database is reachable', {}, int(self.available))
+        if self.journal is not None:
+            yield ('motion_spill_journal_rows', 'gauge', 'Samples waiting in the spill journal', {}, len(self.journal))
+            yield ('motion_spill_rejected_rows', 'gauge', 'Samples set aside in the rejected file', {}, len(self.rejected))
+        for key, help_text in (('outages', 'Times the database became unreachable'),
+                               ('reconnects', 'Successful reconnects after an outage'),
+                               ('spilled_rows', 'Samples written to the spill journal'),
+                               ('replayed_rows', 'Spilled samples written back to the database'),
+                               ('rejected_rows', 'Samples the database refused (moved to the rejected file)')):
+            yield (f'motion_db_{key}_total', 'counter', help_text, {}, self.stats[key])
+    
+    def close(self):
+        """Write back what the journal holds if the store is up, then close it."""
+        if self.journal is not None:
+            with self.lock:
+                if len(self.journal) and (self.available or self._reconnect()):
+                    try:
+                        self._replay_journal()
+                    except STORAGE_ERRORS as e:
+                        self._mark_down(e)
+            if self.stats['spilled_rows'] or len(self.journal):
+                print("Spill journal: " + ", ".join(f"{key}={value}" for key, value in self.stats.items()) +
+                      f", pending={len(self.journal)}")
+            if len(self.journal):
+                print(f"{len(self.journal)} samples remain in {self.journal.path}; they are written on the next start")
+            if self.stats['rejected_rows']:
+                print(f"{self.stats['rejected_rows']} samples the database refused are in {self.rejected.path}")
+        self.storage.close()
+
+def open_resilient_storage(backend, db_config, journal_path=None):
+    """Create and connect a ResilientStorage over the configured backend.
+    
+    With a journal, an unreachable store is reported and writes spill until
+    it comes back; without one (readers), the connect error is raised.
+    """
+    storage = ResilientStorage(create_storage(backend, db_config), journal_path)
+    try:
+        storage.connect()
+    except STORAGE_ERRORS:
+        if journal_path is None:
+            raise
+    return storage
+
+# ----- Local stand-in store -----
+
+class StandinError(OSError):
+    """An error reported by the stand-in's store."""
+
+class StandinRejected(sqlite3.DatabaseError):
+    """The stand-in's store refused the request (it is up; the same rows would fail again)."""
+
+def encode_frame(chunk):
+    """JSON-ready columns for one sensor_data chunk."""
+    columns = {}
+    for name, dtype in SENSOR_COLUMNS.items():
+        values = chunk[name].to_numpy()
+        if str(dtype).startswith('datetime64'):
+            columns[name] = np.datetime_as_string(values.astype('datetime64[us]'), unit='us').tolist()
+        else:
+            columns[name] = values.tolist()
+    return columns
+
+def decode_frame(columns):
+    """Typed sensor_data chunk back from encode_frame's columns."""
+    return pd.DataFrame({name: np.array(columns[name], dtype=dtype) for name, dtype in SENSOR_COLUMNS.items()})
+
+class StandinHandler(socketserver.StreamRequestHandler):
+    """One client connection: JSON request lines in, JSON reply lines out."""
+    
+    def send(self, message):
+        self.wfile.write(json.dumps(message).encode() + b'\n')
+    
+    def handle(self):
+        storage = self.server.storage
+        try:
+            for line in self.rfile:
+                request = json.loads(line)
+                op = request['op']
+                try:
+                    if op == 'ping':
+                        self.send({'ok': True})
+                    elif op == 'write':
+                        storage.write_samples([decode_row(values) for values in request['rows']])
+                        self.send({'ok': True})
+                    elif op == 'range':
+                        end_time = datetime.fromisoformat(request['end']) if request['end'] else None
+                        for chunk in storage.iter_range(datetime.fromisoformat(request['start']), end_time,
+                                                        request['chunk_rows']):
+                            self.send({'columns': encode_frame(chunk)})
+                        self.send({'done': True})
+                    elif op == 'new_rows':
+                        for ids, timestamps in storage.iter_new_rows(request['after_id'],
+                                                                     datetime.fromisoformat(request['start']),
+                                                                     request['chunk_rows']):
+                            self.send({'ids': ids.tolist(),
+                                       'timestamps': np.datetime_as_string(timestamps, unit='us').tolist()})
+                        self.send({'done': True})
+                    elif op == 'summary':
+                        total_count, latest, distribution = storage.summary()
+                        self.send({'summary': [total_count, latest.isoformat() if latest else None, distribution]})
+                    else:
+                        self.send({'error': f"Unknown request: {op}"})
+                except STORAGE_ERRORS as e:
+                    self.send({'error': str(e), 'rejected': not is_connection_error(e)})
+        except OSError:
+            pass  # Client went away mid-reply
+
+class StandinServer(socketserver.ThreadingTCPServer):
+    """SQLite store served over TCP on localhost; kill the process to simulate an outage."""
+    
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, address=STANDIN_ADDRESS, path=STANDIN_PATH):
+        self.storage = SQLiteStorage(path)
+        self.storage.connect()
+        super().__init__(address, StandinHandler)
+
+class StandinConnection:
+    """Client socket to a stand-in server."""
+    
+    def __init__(self, address, timeout=STANDIN_TIMEOUT):
+        self.sock = socket.create_connection(address, timeout=timeout)
+        self.file = self.sock.makefile('rwb')
+    
+    def request(self, message):
+        self.file.write(json.dumps(message).encode() + b'\n')
+        self.file.flush()
+    
+    def reply(self):
+        line = self.file.readline()
+        if not line.endswith(b'\n'):
+            # Nothing, or a torn reply from a server killed mid-write
+            raise ConnectionResetError("Stand-in closed the connection")
+        message = json.loads(line)
+        if 'error' in message:
+            raise (StandinRejected if message.get('rejected') else StandinError)(message['error'])
+        return message
+    
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+class StandinStorage(StorageBackend):
+    """StorageBackend client for the stand-in server, over a ConnectionPool of sockets."""
+    
+    name = 'standin'
+    
+    def __init__(self, address=STANDIN_ADDRESS, pool_size=POOL_SIZE):
+        self.address = tuple(address)
+        self.pool_size = pool_size
+        self.pool = None
+    
+    def _ping(self, conn):
+        conn.request({'op': 'ping'})
+        conn.reply()
+    
+    def connect(self):
+        if self.pool is not None:
+            self.pool.close()
+        self.pool = ConnectionPool(lambda: StandinConnection(self.address), ping=self._ping, size=self.pool_size)
+        with self.pool.connection() as conn:
+            self._ping(conn)
+    
+    def write_samples(self, rows):
+        with self.pool.connection() as conn:
+            conn.request({'op': 'write', 'rows': [encode_row(row) for row in rows]})
+            conn.reply()
+    
+    def iter_range(self, start_time, end_time=None, chunk_rows=FETCH_CHUNK_ROWS):
+        with self.pool.connection() as conn:
+            conn.request({'op': 'range', 'start': pd.Timestamp(start_time).isoformat(),
+                          'end': pd.Timestamp(end_time).isoformat() if end_time is not None else None,
+                          'chunk_rows': chunk_rows})
+            while True:
+                message = conn.reply()
+                if 'done' in message:
+                    break
+                yield decode_frame(message['columns'])
+    
+    def iter_new_rows(self, after_id, start_time, chunk_rows=FETCH_CHUNK_ROWS):
+        with self.pool.connection() as conn:
+            conn.request({'op': 'new_rows', 'after_id': int(after_id),
+                          'start': pd.Timestamp(start_time).isoformat(), 'chunk_rows': chunk_rows})
+            while True:
+                message = conn.reply()
+                if 'done' in message:
+                    break
+                yield np.array(message['ids'], dtype=np.int64), np.array(message['timestamps'], dtype='datetime64[us]')
+    
+    def identity(self):
+        return f"standin:{self.address[0]}:{self.address[1]}"
+    
+    def summary(self):
+        with self.pool.connection() as conn:
+            conn.request({'op': 'summary'})
+            total_count, latest, distribution = conn.reply()['summary']
+        return total_count, datetime.fromisoformat(latest) if latest else None, [tuple(pair) for pair in distribution]
+    
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+
+# ----- Outage drill -----
+
+def start_standin(port, path):
+    """Run a stand-in server in a child process and wait until it answers."""
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'standin', '--port', str(port), '--path', path])
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            conn = StandinConnection(('127.0.0.1', port))
+            conn.close()
+            return process
+        except OSError:
+            if time.monotonic() > deadline or process.poll() is not None:
+                process.kill()
+                raise
+            time.sleep(0.05)
+
+def run_drill(seconds=12.0, rate=100, batch_rows=10, down=(3.0, 7.0), workdir=None, port=STANDIN_ADDRESS[1]):
+    """Write samples through ResilientStorage while the stand-in is killed and restarted; returns a report."""
+    workdir = workdir or tempfile.mkdtemp(prefix='motion_drill_')
+    path = os.path.join(workdir, 'standin.sqlite3')
+    journal_path = os.path.join(workdir, 'spill.journal')
+    
+    server = start_standin(port, path)
+    storage = ResilientStorage(StandinStorage(('127.0.0.1', port)), journal_path,
+                               backoff=Backoff(initial=0.25, maximum=1.0))
+    storage.connect()
+    
+    # Distinct timestamps so every stored row can be matched to a written one
+    start_time = datetime(2026, 1, 1)
+    written = 0
+    latencies = {'up': [], 'down': []}
+    started = time.monotonic()
+    try:
+        while time.monotonic() - started < seconds:
+            elapsed = time.monotonic() - started
+            phase = 'down' if down[0] <= elapsed < down[1] else 'up'
+            if phase == 'down' and server.poll() is None:
+                server.send_signal(signal.SIGKILL)
+                server.wait()
+                print(f"[{elapsed:5.1f} s] stand-in killed")
+            elif phase == 'up' and server.poll() is not None:
+                server = start_standin(port, path)
+                print(f"[{elapsed:5.1f} s] stand-in restarted")
+            
+            rows = [(start_time + timedelta(milliseconds=10 * (written + i)), 'walking',
+                     0.1, 0.2, 9.8, 0.0, 0.0, 0.0, 'drill', 1, None) for i in range(batch_rows)]
+            call_started = time.perf_counter()
+            storage.write_samples(rows)
+            latencies[phase].append(time.perf_counter() - call_started)
+            written += batch_rows
+            time.sleep(max(batch_rows / rate - (time.perf_counter() - call_started), 0))
+        storage.close()
+        
+        # Every written sample must be stored exactly once
+        check = StandinStorage(('127.0.0.1', port))
+        check.connect()
+        stored = pd.concat(list(check.iter_range(start_time)), ignore_index=True)
+        check.close()
+    finally:
+        server.kill()
+        server.wait()
+    
+    timestamps = stored['timestamp'][stored['sequence_id'] == 'drill']
+    expected = pd.date_range(start_time, periods=written, freq='10ms')
+    report = {
+        'written': written,
+        'stored': int(len(timestamps)),
+        'missing': int(len(expected.difference(pd.DatetimeIndex(timestamps)))),
+        'duplicates': int(timestamps.duplicated().sum()),
+        **storage.stats,
+        'write_ms_up_p50': float(np.percentile(latencies['up'], 50) * 1000) if latencies['up'] else None,
+        'write_ms_down_p50': float(np.percentile(latencies['down'], 50) * 1000) if latencies['down'] else None
+    }
+    return report
+
+def main():
+    """Command line entry point: run a stand-in store, or an outage drill against one."""
+    parser = argparse.ArgumentParser(description="Local stand-in store and outage drill for the resilient storage layer.")
+    parser.add_argument('command', choices=['standin', 'drill'])
+    parser.add_argument('--port', type=int, default=STANDIN_ADDRESS[1])
+    parser.add_argument('--path', default=STANDIN_PATH, help="standin: SQLite file behind the server")
+    parser.add_argument('--seconds', type=float, default=12.0, help="drill: how long to write")
+    parser.add_argument('--down', default='3,7', help="drill: kill the stand-in at A s and restart it at B s")
+    args = parser.parse_args()
+    
+    if args.command == 'standin':
+        server = StandinServer(('127.0.0.1', args.port), args.path)
+        print(f"Stand-in store on 127.0.0.1:{args.port} ({args.path}); Ctrl+C or kill to stop")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return
+    
+    down = tuple(float(value) for value in args.down.split(','))
+    report = run_drill(args.seconds, down=down, port=args.port)
+    print("\n===== OUTAGE DRILL =====")
+    for key, value in report.items():
+        print(f"  {key}: {value:.3f}" if isinstance(value, float) else f"  {key}: {value}")
+    if report['missing'] or report['duplicates']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import os
+import json
+import time
+import sqlite3
+import argparse
+import numpy as np
+from datetime import datetime
+from motion_benchmarks import RESULTS_DIR, git_commit
+
+try:
+    import mysql.connector
+except ImportError:
+    mysql = None
+
+# Table sizes selectable with --rows
+ROW_SCALES = {'100k': 100000, '1m': 1000000, '10m': 10000000, '100m': 100000000}
+
+# Synthetic fleet: DEVICES boards at 10 Hz, each starting a new session every
+# SESSION_SECONDS (so sequence_id cardinality grows with the table like the real one)
+DEVICES = 20
+SAMPLING_RATE = 10
+SESSION_SECONDS = 3600
+START_TIME = np.datetime64('2025-01-01T00:00:00', 'us')
+LABELS = np.array(['resting', 'idle', 'walking', 'running'])
+
+GENERATE_CHUNK_ROWS = 200000
+QUERY_REPEATS = 3  # After the indexes; a full scan runs once
+
+SQLITE_BENCH_PATH = 'motion_query_bench.sqlite3'
+MYSQL_BENCH_TABLE = 'sensor_data_bench'  # Scratch table next to sensor_data, dropped and rebuilt per size
+
+# The migration's step 1, for both engines
+INDEX_STATEMENTS = {
+    'sqlite': ["CREATE INDEX idx_timestamp ON {table} (timestamp)",
+               "CREATE INDEX idx_sequence_timestamp ON {table} (sequence_id, timestamp)",
+               "CREATE INDEX idx_label_timestamp ON {table} (motion_label, timestamp)"],
+    'mysql': ["ALTER TABLE {table} ADD INDEX idx_timestamp (timestamp), "
+              "ADD INDEX idx_sequence_timestamp (sequence_id, timestamp), "
+              "ADD INDEX idx_label_timestamp (motion_label, timestamp)"]
+}
+
+CREATE_TABLE = {
+    'sqlite': '''CREATE TABLE {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, motion_label TEXT,
+        accel_x REAL, accel_y REAL, accel_z REAL, gyro_x REAL, gyro_y REAL, gyro_z REAL, sequence_id TEXT)''',
+    'mysql': '''CREATE TABLE {table} (
+        id INT AUTO_INCREMENT PRIMARY KEY, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, motion_label VARCHAR(50),
+        accel_x FLOAT, accel_y FLOAT, accel_z FLOAT, gyro_x FLOAT, gyro_y FLOAT, gyro_z FLOAT, sequence_id VARCHAR(50))'''
+}
+
+# The hot queries: (name, SQL, parameter names filled from the generated data)
+HOT_QUERIES = [
+    # fetch_recent_data(60) / iter_range_chunks
+    ('recent_hour', '''SELECT timestamp, motion_label, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z, sequence_id
+                       FROM {table} WHERE timestamp >= {p} ORDER BY timestamp ASC, id ASC''', ('hour_ago',)),
+    # fetch_recent_data's freshness check
+    ('latest_timestamp', "SELECT MAX(timestamp) FROM {table}", ()),
+    # One session's samples (per-session diagnostics)
+    ('one_sequence', '''SELECT timestamp, motion_label FROM {table}
+                        WHERE sequence_id = {p} ORDER BY timestamp''', ('sequence_id',)),
+    # One label over the last hour
+    ('label_last_hour', '''SELECT COUNT(*) FROM {table}
+                           WHERE motion_label = 'running' AND timestamp >= {p}''', ('hour_ago',)),
+    # Label distribution (the analysis summary before the rollups)
+    ('label_counts', "SELECT motion_label, COUNT(*) FROM {table} GROUP BY motion_label", ()),
+    # Sessions with their sample counts
+    ('sequence_counts', "SELECT sequence_id, COUNT(*) FROM {table} GROUP BY sequence_id", ())
+]
+
+def session_ids(session, device):
+    """sequence_id strings like the ingest script's (session start as %Y%m%d%H%M%S, then the device)."""
+    starts = np.datetime_as_string(START_TIME + np.asarray(session) * np.timedelta64(SESSION_SECONDS, 's'), unit='s')
+    for separator in ('-', 'T', ':'):
+        starts = np.char.replace(starts, separator, '')
+    return np.char.add(np.char.add(starts, '-dev'), np.asarray(device).astype(str))
+
+def generate_chunks(total_rows, devices=DEVICES, seed=0):
+    """Yield lists of (timestamp, label, 6 axes, sequence_id) rows in time order, devices interleaved."""
+    rng = np.random.default_rng(seed)
+    step = np.timedelta64(1000000 // SAMPLING_RATE // devices, 'us')
+    session_rows = SESSION_SECONDS * SAMPLING_RATE
+    for start in range(0, total_rows, GENERATE_CHUNK_ROWS):
+        count = min(GENERATE_CHUNK_ROWS, total_rows - start)
+        index = np.arange(start, start + count)
+        
+        # Sample index i is device i % devices, reading number i // devices
+        timestamps = np.datetime_as_string(START_TIME + index * step, unit='us')
+        timestamps = np.char.replace(timestamps, 'T', ' ')
+        device = index % devices
+        sequence_ids = session_ids(index // devices // session_rows, device)
+        
+        # Labels in runs of 50 readings per device
+        labels = LABELS[(index // devices // 50 * 7 + device) % len(LABELS)]
+        axes = rng.normal(0, 1, (count, 6)).astype(np.float32).astype(np.float64)
+        axes[:, 2] += 9.8
+        yield list(zip(timestamps.tolist(), labels.tolist(), *axes.T.tolist(), sequence_ids.tolist()))
+
+def query_params(total_rows, devices=DEVICES):
+    """Parameter values for HOT_QUERIES: an hour before the newest row, and the newest session."""
+    step = np.timedelta64(1000000 // SAMPLING_RATE // devices, 'us')
+    newest = START_TIME + (total_rows - 1) * step
+    session = (total_rows - 1) // devices // (SESSION_SECONDS * SAMPLING_RATE)
+    return {
+        'hour_ago': str(newest - np.timedelta64(3600, 's')).replace('T', ' '),
+        'sequence_id': str(session_ids([session], [0])[0])
+    }
+
+class BenchDatabase:
+    """One scratch table on SQLite or MySQL."""
+    
+    def __init__(self, backend, path=SQLITE_BENCH_PATH, db_config=None):
+        self.backend = backend
+        self.placeholder = '?' if backend == 'sqlite' else '%s'
+        if backend == 'sqlite':
+            self.table = 'sensor_data'
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            self.conn = sqlite3.connect(path)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=OFF")   # Loading only; durability isn't measured
+            self.conn.execute("PRAGMA cache_size=-262144")  # 256 MB page cache
+        else:
+            if mysql is None:
+                raise ImportError("The MySQL backend needs mysql-connector-python (pip install mysql-connector-python)")
+            self.table = MYSQL_BENCH_TABLE
+            self.conn = mysql.connector.connect(**db_config)
+            self.conn.cursor().execute(f"DROP TABLE IF EXISTS {self.table}")
+        self.conn.cursor().execute(CREATE_TABLE[backend].format(table=self.table))
+    
+    def load(self, total_rows):
+        """Insert total_rows synthetic rows; returns seconds taken."""
+        started = time.perf_counter()
+        insert = (f"INSERT INTO {self.table} (timestamp, motion_label, accel_x, accel_y, accel_z, "
+                  f"gyro_x, gyro_y, gyro_z, sequence_id) VALUES ({', '.join([self.placeholder] * 9)})")
+        cursor = self.conn.cursor()
+        for rows in generate_chunks(total_rows):
+            cursor.executemany(insert, rows)
+            self.conn.commit()
+        return time.perf_counter() - started
+    
+    def add_indexes(self):
+        """Run the migration's index step (and refresh planner statistics); returns seconds taken."""
+        started = time.perf_counter()
+        cursor = self.conn.cursor()
+        for statement in INDEX_STATEMENTS[self.backend]:
+            cursor.execute(statement.format(table=self.table))
+        cursor.execute("ANALYZE" if self.backend == 'sqlite' else f"ANALYZE TABLE {self.table}")
+        if self.backend == 'mysql':
+            cursor.fetchall()
+        self.conn.commit()
+        return time.perf_counter() - started
+    
+    def time_query(self, sql, params, repeats):
+        """Best of `repeats` runs (every row fetched), and the row count."""
+        sql = sql.format(table=self.table, p=self.placeholder)
+        times = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            cursor = self.conn.cursor()
+            cursor.execute(sql, params)
+            rows = 0
+            while True:
+                chunk = cursor.fetchmany(50000)
+                if not chunk:
+                    break
+                rows += len(chunk)
+            times.append(time.perf_counter() - started)
+        return min(times), rows
+    
+    def plan(self, sql, params):
+        """One-line query plan (which index, if any, the engine picked)."""
+        sql = sql.format(table=self.table, p=self.placeholder)
+        cursor = self.conn.cursor()
+        if self.backend == 'sqlite':
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            return '; '.join(row[-1] for row in cursor.fetchall())
+        cursor.execute("EXPLAIN " + sql, params)
+        rows = [dict(zip(cursor.column_names, row)) for row in cursor.fetchall()]
+        return '; '.join(f"{row['type']}:{row['key'] or 'scan'}" for row in rows)
+    
+    def close(self):
+        if self.backend == 'mysql':
+            self.conn.cursor().execute(f"DROP TABLE IF EXISTS {self.table}")
+        self.conn.close()
+
+def run_size(backend, total_rows, path=SQLITE_BENCH_PATH, db_config=None):
+    """Load one table size and time every hot query before and after the indexes."""
+    database = BenchDatabase(backend, path, db_config)
+    params = query_params(total_rows)
+    result = {'rows': total_rows, 'queries': {}}
+    try:
+        result['load_s'] = database.load(total_rows)
+        print(f"  loaded {total_rows:,} rows in {result['load_s']:.1f} s")
+        
+        for stage, repeats in (('before', 1), ('after', QUERY_REPEATS)):
+            if stage == 'after':
+                result['index_s'] = database.add_indexes()
+                print(f"  indexes built in {result['index_s']:.1f} s")
+            for name, sql, names in HOT_QUERIES:
+                values = tuple(params[key] for key in names)
+                seconds, rows = database.time_query(sql, values, repeats)
+                entry = result['queries'].setdefault(name, {'rows': rows})
+                entry[f'{stage}_ms'] = seconds * 1000
+                entry[f'{stage}_plan'] = database.plan(sql, values)
+                print(f"  {stage:<7}{name:<18}{seconds * 1000:>12.1f} ms  {rows:>10,} rows  {entry[f'{stage}_plan']}")
+        if backend == 'sqlite':
+            result['file_bytes'] = os.path.getsize(path)
+    finally:
+        database.close()
+        if backend == 'sqlite':
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+    return result
+
+def print_report(document):
+    """Before/after table for every size."""
+    print(f"\n===== HOT QUERY LATENCY ({document['backend']}) =====")
+    print(f"{'rows':>12} {'query':<18} {'matched':>10} {'no index ms':>12} {'indexed ms':>11} {'speedup':>8}")
+    for result in document['results']:
+        for name, entry in result['queries'].items():
+            speedup = entry['before_ms'] / entry['after_ms'] if entry['after_ms'] else float('inf')
+            print(f"{result['rows']:>12,} {name:<18} {entry['rows']:>10,} {entry['before_ms']:>12.1f} "
+                  f"{entry['after_ms']:>11.1f} {speedup:>7.1f}x")
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Time the sensor_data hot queries before and after the migration's indexes.")
+    parser.add_argument('--rows', default='1m,10m', help=f"comma list of {', '.join(ROW_SCALES)}")
+    parser.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite',
+                        help=f"mysql uses a scratch {MYSQL_BENCH_TABLE} table in DB_CONFIG's database")
+    parser.add_argument('--path', default=SQLITE_BENCH_PATH, help="sqlite: scratch database file (deleted afterwards)")
+    parser.add_argument('--output', help=f"results file (default: {RESULTS_DIR}/queries-<time>-<commit>.json)")
+    args = parser.parse_args()
+    
+    sizes = [size.strip().lower() for size in args.rows.split(',')]
+    for size in sizes:
+        if size not in ROW_SCALES:
+            parser.error(f"unknown size {size} (choose from {', '.join(ROW_SCALES)})")
+    db_config = None
+    if args.backend == 'mysql':
+        from test_db_connection import DB_CONFIG
+        db_config = DB_CONFIG
+    
+    commit, dirty = git_commit()
+    document = {'backend': args.backend, 'commit': commit, 'dirty': dirty,
+                'created': datetime.now().isoformat(timespec='seconds'), 'devices': DEVICES, 'results': []}
+    for size in sizes:
+        print(f"\n{size} rows ({args.backend}):")
+        document['results'].append(run_size(args.backend, ROW_SCALES[size], args.path, db_config))
+    print_report(document)
+    
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"queries-{datetime.now():%Y%m%d-%H%M%S}-{(commit or 'nogit')[:8]}.json")
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import csv
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from collections import Counter
+from datetime import datetime
+from motion_storage import STORAGE_ERRORS, open_storage, expand_holds
+from motion_model import load_model
+from test_db_connection import DB_CONFIG, STORAGE_BACKEND, SimpleMotionRecognizer, BatchMotionClassifier
+
+# Recognizer attributes that --set may override
+TUNABLE_THRESHOLDS = ('baseline_accel', 'idle_accel_range', 'idle_std_max', 'idle_gyro_max',
+                      'walk_threshold_min', 'walk_threshold_max', 'run_threshold',
+                      'cadence_min_strength', 'cadence_min_std', 'gait_min_hz', 'gait_max_hz', 'run_cadence_hz')
+
+SENSOR_VALUES = ['accel_x', 'accel_y', 'accel_z', 'gyro_x', 'gyro_y', 'gyro_z']
+
+def parse_overrides(items):
+    """Parse ['name=value', ...] into {name: float}."""
+    overrides = {}
+    for item in items:
+        name, _, value = item.partition('=')
+        if name not in TUNABLE_THRESHOLDS:
+            raise ValueError(f"Unknown threshold: {name} (choose from {', '.join(TUNABLE_THRESHOLDS)})")
+        overrides[name] = float(value)
+    return overrides
+
+def build_recognizer(overrides, classifier=None):
+    """SimpleMotionRecognizer with its thresholds replaced by the overrides (or a trained classifier)."""
+    recognizer = SimpleMotionRecognizer(classifier)
+    for name, value in overrides.items():
+        setattr(recognizer, name, value)
+    return recognizer
+
+def relabel(storage, recognizer, since, until=None, output=None):
+    """Re-label stored samples in time order and return (rows, seconds, Counter of (old, new))."""
+    # One classifier per sequence: each sequence is one device session, so
+    # windows and debounce state never cross between them
+    classifiers = {}
+    transitions = Counter()
+    rows = 0
+    start = time.perf_counter()
+    
+    writer = None
+    if output:
+        out_file = open(output, 'w', newline='')
+        writer = csv.writer(out_file)
+        writer.writerow(['timestamp', 'sequence_id', 'motion_label', 'new_label'])
+    
+    try:
+        for chunk in storage.iter_range(since, until):
+            # Held samples are re-labeled from the one reading their hold record kept
+            chunk = expand_holds(chunk)
+            values = chunk[SENSOR_VALUES].to_numpy(np.float64)
+            new_labels = np.empty(len(chunk), dtype=object)
+            for sequence_id, positions in chunk.groupby('sequence_id', dropna=False, sort=False).indices.items():
+                classifier = classifiers.get(sequence_id)
+                if classifier is None:
+                    classifier = classifiers[sequence_id] = BatchMotionClassifier(recognizer)
+                new_labels[positions] = classifier.classify(values[positions])
+            
+            old_labels = chunk['motion_label'].to_numpy(object)
+            transitions.update(zip(old_labels.tolist(), new_labels.tolist()))
+            rows += len(chunk)
+            
+            if writer:
+                timestamps = pd.Series(chunk['timestamp']).dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+                writer.writerows(zip(timestamps, chunk['sequence_id'], old_labels, new_labels))
+    finally:
+        if writer:
+            out_file.close()
+    
+    return rows, time.perf_counter() - start, transitions
+
+def print_summary(rows, seconds, transitions):
+    """Print throughput and an old -> new label table."""
+    print(f"\nRe-labeled {rows} rows in {seconds:.2f} s ({rows / seconds if seconds else 0:.0f} rows/s)")
+    if not rows:
+        return
+    changed = sum(count for (old, new), count in transitions.items() if old != new)
+    print(f"Changed: {changed} ({changed / rows * 100:.2f}%)")
+    
+    print(f"\n{'Stored':<16} {'New':<16} {'Rows':>12}")
+    print("-" * 46)
+    for (old, new), count in sorted(transitions.items(), key=lambda item: (str(item[0][0]), -item[1])):
+        marker = '' if old == new else '  *'
+        print(f"{str(old):<16} {new:<16} {count:>12}{marker}")
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Re-label stored sensor_data with the current (or overridden) thresholds.")
+    parser.add_argument('--backend', choices=['mysql', 'sqlite', 'parquet', 'standin'], default=STORAGE_BACKEND)
+    parser.add_argument('--since', default='1970-01-01', help="first timestamp to re-label (default: all history)")
+    parser.add_argument('--until', help="stop before this timestamp")
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                        help=f"override a threshold ({', '.join(TUNABLE_THRESHOLDS)}); repeatable")
+    parser.add_argument('--model', help="re-label with a trained classifier (motion_model.py train) instead of the thresholds")
+    parser.add_argument('--output', help="write timestamp, sequence_id, stored and new label to this CSV")
+    args = parser.parse_args()
+    
+    try:
+        classifier = load_model(args.model) if args.model else None
+        recognizer = build_recognizer(parse_overrides(args.set), classifier)
+    except (OSError, ValueError, KeyError) as e:
+        parser.error(str(e))
+    
+    since = datetime.fromisoformat(args.since)
+    until = datetime.fromisoformat(args.until) if args.until else None
+    
+    storage = None
+    try:
+        storage = open_storage(args.backend, DB_CONFIG)
+        print_summary(*relabel(storage, recognizer, since, until, args.output))
+        if args.output:
+            print(f"\nLabels written to {args.output}")
+    except STORAGE_ERRORS as e:
+        print(f"Database error: {e}")
+    finally:
+        if storage:
+            storage.close()
+
+if __name__ == "__main__":
+    main()
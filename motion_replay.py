@@ -0,0 +1,586 @@
+import os
+import time
+import json
+import shutil
+import select
+import argparse
+import binascii
+import tempfile
+import threading
+import numpy as np
+from collections import deque
+from datetime import datetime
+from motion_storage import StorageBackend, SQLiteStorage, ParquetStorage, open_storage
+from motion_metrics import MetricsRegistry, MetricsServer
+from test_db_connection import (DB_CONFIG, SAMPLING_RATE, FRAME_DTYPE, FRAME_SYNC, FRAME_TYPE_SAMPLE,
+                                FRAME_CRC_INIT, FRAME_TYPE_STATE, FRAME_TYPE_FEATURES, STATE_FRAME_DTYPE, STATE_FRAME_SIZE,
+                                WINDOW_SIZE, ADAPTIVE_STORAGE,
+                                MOTION_CODES, DOWNLINK_PATTERNS, BatchedSampleWriter, DeviceSession, IngestHub)
+from motion_patterns import MotionPatternRules
+
+# Synthetic MPU6050 profiles (m/s^2 and rad/s, gravity on the z axis)
+# accel_z = gravity + offset + amplitude * sin(2*pi*cadence*t), plus Gaussian noise
+PROFILES = {
+    'resting': {'offset': 0.0, 'amplitude': 0.0, 'cadence': 0.0, 'gyro': 0.0, 'noise': 0.01},
+    'walking': {'offset': 1.8, 'amplitude': 2.5, 'cadence': 1.8, 'gyro': 0.8, 'noise': 0.4},
+    'running': {'offset': 6.5, 'amplitude': 5.0, 'cadence': 2.7, 'gyro': 2.0, 'noise': 1.0}
+}
+GRAVITY = 9.82
+DEFAULT_SCHEDULE = 'resting:60,walking:60,running:60'
+
+# Samples written per chunk when replaying at maximum speed
+MAX_SPEED_CHUNK = 64
+
+# Seconds a pty feeder waits for the reader to catch up before hanging up
+PTY_DRAIN_TIMEOUT = 5.0
+
+def parse_schedule(text):
+    """Parse 'profile:seconds,...' into [(profile, seconds), ...]."""
+    schedule = []
+    for part in text.split(','):
+        name, seconds = part.split(':')
+        if name not in PROFILES:
+            raise ValueError(f"Unknown profile: {name} (choose from {', '.join(PROFILES)})")
+        schedule.append((name, float(seconds)))
+    return schedule
+
+def generate_samples(schedule, noise_scale=1.0, sampling_rate=SAMPLING_RATE, seed=0):
+    """Synthesize (millis, values) for a schedule; values columns are ax ay az gx gy gz temp."""
+    rng = np.random.default_rng(seed)
+    parts = []
+    for name, seconds in schedule:
+        profile = PROFILES[name]
+        count = int(seconds * sampling_rate)
+        t = np.arange(count) / sampling_rate
+        noise = profile['noise'] * noise_scale
+        
+        values = np.empty((count, 7))
+        values[:, 0:2] = rng.normal(0, noise, (count, 2))
+        values[:, 2] = (GRAVITY + profile['offset'] +
+                        profile['amplitude'] * np.sin(2 * np.pi * profile['cadence'] * t + rng.uniform(0, 2 * np.pi)) +
+                        rng.normal(0, noise, count))
+        values[:, 3:6] = rng.normal(0, profile['gyro'] * noise_scale + 0.005, (count, 3))
+        values[:, 6] = 24.0 + rng.normal(0, 0.1, count)
+        parts.append(values)
+    
+    values = np.concatenate(parts) if parts else np.empty((0, 7))
+    millis = (np.arange(len(values)) * (1000 // sampling_rate)).astype(np.uint32)
+    return millis, values
+
+def load_recording(path):
+    """Load a captured serial stream (millis,ax,ay,az,gx,gy,gz,temp lines) as (millis, values)."""
+    rows = []
+    with open(path, 'rb') as f:
+        for raw_line in f:
+            parts = raw_line.decode('utf-8', 'replace').strip().split(',')
+            if len(parts) != 8:
+                continue  # Boot messages and partial lines
+            try:
+                rows.append([float(part) for part in parts])
+            except ValueError:
+                continue
+    
+    rows = np.array(rows, dtype=np.float64).reshape(-1, 8)
+    return rows[:, 0].astype(np.uint32), rows[:, 1:]
+
+def encode_csv(millis, values):
+    """Render samples exactly as the sketch prints them in CSV mode."""
+    return [f"{m},{ax:.4f},{ay:.4f},{az:.4f},{gx:.4f},{gy:.4f},{gz:.4f},{temp:.2f}\n".encode()
+            for m, (ax, ay, az, gx, gy, gz, temp) in zip(millis.tolist(), values.tolist())]
+
+def encode_frames(millis, values, frame_type=FRAME_TYPE_SAMPLE):
+    """Render samples as binary SampleFrames (same layout and CRC as the sketch)."""
+    frames = np.zeros(len(millis), dtype=FRAME_DTYPE)
+    frames['sync'] = int.from_bytes(FRAME_SYNC, 'little')
+    frames['type'] = frame_type
+    frames['millis'] = millis
+    frames['values'] = values
+    
+    payloads = []
+    for frame in frames:
+        data = bytearray(frame.tobytes())
+        data[-2:] = binascii.crc_hqx(bytes(data[2:-2]), FRAME_CRC_INIT).to_bytes(2, 'little')
+        payloads.append(bytes(data))
+    return payloads
+
+class EdgeFeatureEmulator:
+    """The sketch's EDGE_FEATURES window code, step for step in float32.
+    
+    Same operations in the same order as pushWindow() / computeFeatures(), so
+    its output should match the board bit for bit (IEEE single precision).
+    """
+    
+    def __init__(self, window_size=WINDOW_SIZE, baseline=9.82):
+        self.window_size = window_size
+        self.baseline = np.float32(baseline)
+        self.accel = deque(maxlen=window_size)
+        self.gyro = deque(maxlen=window_size)
+    
+    def push(self, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z):
+        x, y, z, gx, gy, gz = (np.float32(value) for value in (accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z))
+        self.accel.append(np.sqrt(x * x + y * y + z * z))
+        self.gyro.append(np.sqrt(gx * gx + gy * gy + gz * gz))
+    
+    def features(self):
+        """Return the 7 feature frame values (FEATURE_FRAME_VALUES) as float32."""
+        zero = np.float32(0)
+        if not self.accel:
+            return [zero] * 6 + [np.float32(self.window_size)]
+        
+        n = np.float32(len(self.accel))
+        shifted_sum = gyro_sum = change_sum = zero
+        max_accel = zero
+        for i, (accel, gyro) in enumerate(zip(self.accel, self.gyro)):
+            shifted_sum = shifted_sum + (accel - self.baseline)
+            gyro_sum = gyro_sum + gyro
+            if i == 0 or accel > max_accel:
+                max_accel = accel
+            if i > 0:
+                change_sum = change_sum + abs(accel - previous)
+            previous = accel
+        
+        # Two-pass variance around the window mean
+        shifted_mean = shifted_sum / n
+        squares = zero
+        for accel in self.accel:
+            deviation = (accel - self.baseline) - shifted_mean
+            squares = squares + deviation * deviation
+        
+        mean_change = change_sum / (n - np.float32(1)) if len(self.accel) > 1 else zero
+        return [self.baseline + shifted_mean, np.sqrt(squares / n), max_accel, gyro_sum / n, mean_change,
+                n, np.float32(self.window_size)]
+
+def encode_edge_frames(millis, values, window_size=WINDOW_SIZE, feature_every=1, raw_every=1):
+    """Render what an EDGE_FEATURES board sends: (payloads, payload millis).
+    
+    Each payload starts with one feature frame and holds the raw frames sent
+    until the next one, in the sketch's order (features first, so a stored
+    raw row carries the label its own sample produced).
+    """
+    emulator = EdgeFeatureEmulator(window_size)
+    feature_rows, feature_samples = [], []
+    for index, row in enumerate(values.tolist()):
+        emulator.push(*row[:6])
+        if (index + 1) % feature_every == 0:
+            feature_rows.append(emulator.features())
+            feature_samples.append(index)
+    
+    feature_millis = millis[feature_samples].astype(np.uint32)
+    feature_frames = encode_frames(feature_millis, np.array(feature_rows, dtype=np.float32).reshape(-1, 7),
+                                   FRAME_TYPE_FEATURES)
+    sample_frames = encode_frames(millis, values)
+    
+    # Raw frames before the first feature frame ride along with it
+    payloads = [b''] * len(feature_frames)
+    group = -1
+    for index in range(len(values)):
+        if group + 1 < len(feature_samples) and feature_samples[group + 1] == index:
+            group += 1
+            payloads[group] += feature_frames[group]
+        if raw_every and (index + 1) % raw_every == 0 and payloads:
+            payloads[max(group, 0)] += sample_frames[index]
+    return payloads, feature_millis
+
+def _write_all(fd, data):
+    """os.write until every byte is out (pipes and ptys may take partial writes)."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+class StateFrameDecoder:
+    """Byte-at-a-time downlink parser, as readHostFrames() in MPUMotion.ino does it."""
+    
+    def __init__(self):
+        self.frame = bytearray()
+        self.states = []  # (motion, pattern) per valid frame
+        self.crc_errors = 0
+    
+    def feed(self, data):
+        for byte in data:
+            if not self.frame and byte != FRAME_SYNC[0]:
+                continue
+            if len(self.frame) == 1 and byte != FRAME_SYNC[1]:
+                # A repeated first sync byte may still start a frame
+                if byte != FRAME_SYNC[0]:
+                    self.frame.clear()
+                continue
+            self.frame.append(byte)
+            if len(self.frame) == STATE_FRAME_SIZE:
+                frame = np.frombuffer(bytes(self.frame), STATE_FRAME_DTYPE)[0]
+                if frame['type'] == FRAME_TYPE_STATE and binascii.crc_hqx(self.frame[2:-2], FRAME_CRC_INIT) == frame['crc']:
+                    self.states.append((MOTION_CODES[frame['motion']], DOWNLINK_PATTERNS[frame['pattern']]))
+                else:
+                    self.crc_errors += 1
+                self.frame.clear()
+
+class StreamFeeder(threading.Thread):
+    """Plays one virtual device's samples into a named pipe or pty at a given speed."""
+    
+    def __init__(self, name, payloads, millis, speed, source='fifo', workdir=None):
+        super().__init__(name=f"replay-{name}", daemon=True)
+        self.payloads = payloads
+        self.speed = speed  # 1.0 = real time, N = N x, 0 = as fast as the reader allows
+        self.source = source
+        
+        # Offset of each sample from the start of the stream, in replay seconds
+        self.due = (millis.astype(np.float64) - float(millis[0])) / 1000.0 / speed if speed > 0 and len(millis) else None
+        
+        # Feed time of every sample not yet picked up by the reader (in order)
+        self.fed_times = deque()
+        
+        self.start_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.error = None
+        
+        # What the board would receive from the host (pty only; a FIFO is one-way)
+        self.downlink = StateFrameDecoder()
+        
+        if source == 'pty':
+            self.master_fd, self.slave_fd = os.openpty()
+            self.port = os.ttyname(self.slave_fd)
+        else:
+            self.master_fd = self.slave_fd = None
+            self.port = os.path.join(workdir or tempfile.mkdtemp(), f"{name}.fifo")
+            os.mkfifo(self.port)
+    
+    def run(self):
+        try:
+            # Opening a FIFO for writing waits for the reader (DeviceSession.open)
+            fd = self.master_fd if self.source == 'pty' else os.open(self.port, os.O_WRONLY)
+            self.start_event.wait()
+            self.feed(fd)
+            
+            if self.source == 'pty':
+                # Hanging up discards unread bytes, so wait for the reader first
+                deadline = time.monotonic() + PTY_DRAIN_TIMEOUT
+                while self.fed_times and time.monotonic() < deadline and not self.stop_event.is_set():
+                    self.read_downlink(fd)
+                    time.sleep(0.01)
+                self.read_downlink(fd)
+            os.close(fd)
+        except OSError as e:
+            self.error = e
+    
+    def feed(self, fd):
+        """Write every sample once it is due."""
+        started = time.perf_counter()
+        position = 0
+        while position < len(self.payloads) and not self.stop_event.is_set():
+            if self.due is None:
+                end = min(position + MAX_SPEED_CHUNK, len(self.payloads))
+            else:
+                elapsed = time.perf_counter() - started
+                end = int(np.searchsorted(self.due, elapsed, side='right'))
+                if end <= position:
+                    time.sleep(min(self.due[position] - elapsed, 0.01))
+                    continue
+            
+            # Stamp before writing so the reader never finds an unstamped sample
+            self.fed_times.extend([time.perf_counter()] * (end - position))
+            _write_all(fd, b''.join(self.payloads[position:end]))
+            position = end
+            if self.source == 'pty':
+                self.read_downlink(fd)
+    
+    def read_downlink(self, fd):
+        """Decode whatever state frames the host has written back to the pty."""
+        try:
+            while select.select([fd], [], [], 0)[0]:
+                data = os.read(fd, 4096)
+                if not data:
+                    break
+                self.downlink.feed(data)
+        except OSError:
+            pass  # Slave side already closed
+    
+    def cleanup(self):
+        """Remove the FIFO / close the pty slave once the reader is done."""
+        if self.source == 'pty':
+            if self.slave_fd is not None:
+                os.close(self.slave_fd)
+                self.slave_fd = None
+        elif os.path.exists(self.port):
+            os.remove(self.port)
+
+class StageTimings:
+    """Per-stage latency samples (seconds), appended from the hub and writer threads."""
+    
+    STAGES = ('process', 'queue_wait', 'storage_write', 'end_to_end')
+    
+    def __init__(self):
+        self.samples = {stage: [] for stage in self.STAGES}
+    
+    def record(self, stage, seconds):
+        self.samples[stage].append(seconds)
+    
+    def extend(self, stage, values):
+        self.samples[stage].extend(values)
+    
+    def summary(self):
+        """Return {stage: {count, p50_ms, p90_ms, p99_ms, max_ms}}."""
+        result = {}
+        for stage, values in self.samples.items():
+            values = np.array(values) * 1000
+            if len(values) == 0:
+                result[stage] = {'count': 0}
+                continue
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            result[stage] = {'count': len(values), 'p50_ms': float(p50), 'p90_ms': float(p90),
+                             'p99_ms': float(p99), 'max_ms': float(values.max())}
+        return result
+
+class ReplayWriter(BatchedSampleWriter):
+    """BatchedSampleWriter that also times the queue and storage stages of each row."""
+    
+    def __init__(self, storage, timings, **kwargs):
+        super().__init__(storage, **kwargs)
+        self.timings = timings
+        
+        # Feed time of the sample currently being handled (set by ReplaySession)
+        self.fed_at = None
+    
+    def put(self, row):
+        return super().put((self.fed_at, time.perf_counter(), row))
+    
+    def _flush(self, batch):
+        started = time.perf_counter()
+        failed_rows = self.stats['failed_rows']
+        super()._flush([row for fed_at, queued_at, row in batch])
+        finished = time.perf_counter()
+        
+        if self.stats['failed_rows'] == failed_rows:
+            self.timings.record('storage_write', finished - started)
+            self.timings.extend('queue_wait', [started - queued_at for fed_at, queued_at, row in batch])
+            self.timings.extend('end_to_end', [finished - fed_at for fed_at, queued_at, row in batch])
+
+class ReplaySession(DeviceSession):
+    """DeviceSession that matches each parsed sample to its feed time."""
+    
+    def __init__(self, port, writer, sequence_id, feeder, **kwargs):
+        super().__init__(port, writer, sequence_id, **kwargs)
+        self.feeder = feeder
+        self.timings = writer.timings
+        self.samples_handled = 0
+    
+    def handle_sample(self, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z):
+        if self.edge:
+            # Stored only; the feature frame closing this payload is what gets timed
+            super().handle_sample(accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z)
+            return
+        self.writer.fed_at = self.feeder.fed_times.popleft()
+        started = time.perf_counter()
+        super().handle_sample(accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z)
+        self.timings.record('process', time.perf_counter() - started)
+        self.samples_handled += 1
+    
+    def handle_features(self, frame_values):
+        self.writer.fed_at = self.feeder.fed_times.popleft()
+        started = time.perf_counter()
+        super().handle_features(frame_values)
+        self.timings.record('process', time.perf_counter() - started)
+        self.samples_handled += 1
+
+class NullStorage(StorageBackend):
+    """Discards rows, for measuring the pipeline without a database."""
+    
+    name = 'none'
+    
+    def connect(self):
+        pass
+    
+    def write_samples(self, rows):
+        pass
+
+def open_replay_storage(backend, workdir):
+    """Open the storage for a replay run (embedded stores go in a scratch directory)."""
+    if backend == 'none':
+        storage = NullStorage()
+    elif backend == 'sqlite':
+        storage = SQLiteStorage(os.path.join(workdir, 'replay.sqlite3'))
+    elif backend == 'parquet':
+        storage = ParquetStorage(os.path.join(workdir, 'parquet'))
+    else:
+        return open_storage(backend, DB_CONFIG)
+    storage.connect()
+    return storage
+
+def run_replay(devices=1, speed=1.0, schedule=DEFAULT_SCHEDULE, noise_scale=1.0, recording=None,
+               protocol='csv', source='fifo', backend='sqlite', metrics_port=None, seed=0,
+               edge_decimation=1, edge_raw=1, adaptive=ADAPTIVE_STORAGE):
+    """Replay virtual devices through the ingest pipeline and return a metrics report."""
+    workdir = tempfile.mkdtemp(prefix='motion_replay_')
+    timings = StageTimings()
+    storage = open_replay_storage(backend, workdir)
+    # Optionally expose the pipeline's own metrics while the replay runs
+    metrics = MetricsRegistry(enabled=metrics_port is not None)
+    writer = ReplayWriter(storage, timings, metrics=metrics)
+    hub = IngestHub(display_interval=5.0, metrics=metrics)
+    if metrics.enabled:
+        metrics_server = MetricsServer(metrics, metrics_port)
+        metrics_server.start()
+    
+    # Render every device's byte stream up front so encoding isn't timed
+    session_id = datetime.now().strftime("%Y%m%d%H%M%S")
+    feeders = []
+    for index in range(devices):
+        if recording:
+            millis, values = load_recording(recording)
+        else:
+            # Rotate the schedule so devices aren't all doing the same thing
+            steps = parse_schedule(schedule)
+            steps = steps[index % len(steps):] + steps[:index % len(steps)]
+            millis, values = generate_samples(steps, noise_scale, seed=seed + index)
+        if protocol == 'edge':
+            # One payload per feature frame, paced by the feature frames' millis
+            payloads, millis = encode_edge_frames(millis, values, WINDOW_SIZE, edge_decimation, edge_raw)
+        elif protocol == 'binary':
+            payloads = encode_frames(millis, values)
+        else:
+            payloads = encode_csv(millis, values)
+        feeders.append(StreamFeeder(f"dev{index}", payloads, millis, speed, source, workdir))
+    
+    # Live pattern segments, as read_and_recognize runs them
+    pattern_recognizer = MotionPatternRules()
+    
+    sessions = []
+    try:
+        writer.start()
+        for index, feeder in enumerate(feeders):
+            feeder.start()
+            session = ReplaySession(feeder.port, writer, f"replay-{session_id}-dev{index}", feeder,
+                                    protocol='binary' if protocol == 'edge' else protocol, metrics=metrics,
+                                    pattern_recognizer=pattern_recognizer, adaptive=adaptive)
+            session.edge = protocol == 'edge'
+            hub.add_device(session)
+            sessions.append(session)
+        
+        started = time.perf_counter()
+        for feeder in feeders:
+            feeder.start_event.set()
+        
+        try:
+            hub.run()
+        except KeyboardInterrupt:
+            print("\nReplay stopped by user.")
+    finally:
+        for feeder in feeders:
+            feeder.stop_event.set()
+        hub.close()
+        writer.close()
+        if metrics.enabled:
+            metrics_server.close()
+        for feeder in feeders:
+            feeder.join(timeout=1.0)
+            feeder.cleanup()
+        # Embedded stores are scratch data; MySQL rows stay (tagged replay-*)
+        shutil.rmtree(workdir, ignore_errors=True)
+    elapsed = time.perf_counter() - started if 'started' in locals() else 0.0
+    
+    samples_fed = sum(len(feeder.payloads) for feeder in feeders)
+    samples_handled = sum(session.samples_handled for session in sessions)
+    
+    # Committed rows, counting each hold record as the samples it stands for
+    hold_records = sum(session.stats['hold_records'] for session in sessions)
+    held_samples = sum(session.stats['held_samples'] for session in sessions)
+    samples_written = writer.stats['written'] + held_samples - hold_records
+    return {
+        'devices': devices,
+        'speed': speed,
+        'protocol': protocol,
+        'source': source,
+        'backend': backend,
+        'seconds': elapsed,
+        'samples_fed': samples_fed,
+        'samples_handled': samples_handled,
+        'rows_written': writer.stats['written'],
+        'samples_written': samples_written,
+        'samples_per_second': samples_written / elapsed if elapsed else 0.0,
+        'dropped': {
+            'unparsed': samples_fed - samples_handled,  # lost or corrupted on the link
+            'queue_full': writer.stats['dropped'],
+            'failed_writes': writer.stats['failed_rows']
+        },
+        'crc_errors': sum(session.decoder.stats['crc_errors'] for session in sessions),
+        'segments': sum(session.stats['segments'] for session in sessions),
+        'adaptive': {
+            'enabled': adaptive,
+            'hold_records': hold_records,
+            'held_samples': held_samples
+        },
+        'downlink': {
+            'sent': sum(session.stats['downlink_frames'] for session in sessions),
+            'received': sum(len(feeder.downlink.states) for feeder in feeders),
+            'crc_errors': sum(feeder.downlink.crc_errors for feeder in feeders),
+            'last': [feeder.downlink.states[-1] if feeder.downlink.states else None for feeder in feeders]
+        },
+        'latency': timings.summary(),
+        'writer': dict(writer.stats)
+    }
+
+def print_report(report):
+    """Print a replay report as a short table."""
+    print(f"\n===== REPLAY REPORT ({report['devices']} devices, "
+          f"{'max' if report['speed'] == 0 else str(report['speed']) + 'x'} speed, "
+          f"{report['protocol']} over {report['source']}, {report['backend']} storage) =====")
+    print(f"Samples fed: {report['samples_fed']}  handled: {report['samples_handled']}  "
+          f"written: {report['rows_written']}  in {report['seconds']:.2f}s")
+    print(f"End-to-end throughput: {report['samples_per_second']:,.0f} samples/s")
+    print("Dropped: " + ", ".join(f"{key}={value}" for key, value in report['dropped'].items()) +
+          f"  (crc_errors={report['crc_errors']})")
+    print(f"Live pattern segments: {report['segments']}")
+    if report['adaptive']['enabled']:
+        adaptive = report['adaptive']
+        print(f"Adaptive storage: {adaptive['held_samples']} samples held in {adaptive['hold_records']} hold records "
+              f"({report['samples_handled'] / max(report['rows_written'], 1):.1f} samples per stored row)")
+    if report['source'] == 'pty':
+        downlink = report['downlink']
+        print(f"Downlink state frames: sent={downlink['sent']} received={downlink['received']} "
+              f"crc_errors={downlink['crc_errors']}  last: " +
+              ", ".join('/'.join(str(part) for part in state) if state else '-' for state in downlink['last']))
+    print(f"{'stage':<16}{'count':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for stage, stats in report['latency'].items():
+        if stats['count'] == 0:
+            print(f"{stage:<16}{0:>10}")
+            continue
+        print(f"{stage:<16}{stats['count']:>10}{stats['p50_ms']:>10.3f}{stats['p90_ms']:>10.3f}"
+              f"{stats['p99_ms']:>10.3f}{stats['max_ms']:>10.3f}")
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Replay recorded or synthetic MPU6050 streams through the ingest pipeline.")
+    parser.add_argument('--devices', type=int, default=1, help="virtual devices read in parallel")
+    parser.add_argument('--speed', type=float, default=1.0, help="1 = real time, N = N x, 0 = maximum speed")
+    parser.add_argument('--schedule', default=DEFAULT_SCHEDULE, help="synthetic profile:seconds list")
+    parser.add_argument('--noise', type=float, default=1.0, help="scale the profiles' sensor noise")
+    parser.add_argument('--recording', help="replay a captured CSV serial stream instead of synthesizing one")
+    parser.add_argument('--protocol', choices=['csv', 'binary', 'edge'], default='csv',
+                        help="edge: emulated EDGE_FEATURES board (feature frames plus optional raw frames)")
+    parser.add_argument('--edge-decimation', type=int, default=1, help="edge: samples per feature frame")
+    parser.add_argument('--edge-raw', type=int, default=1, help="edge: samples per raw frame (0 = no raw frames)")
+    parser.add_argument('--full-rate', action='store_true', help="store every sample (turn adaptive storage off)")
+    parser.add_argument('--source', choices=['fifo', 'pty'], default='fifo',
+                        help="in-process named pipe, or a pty read through pyserial like a real port")
+    parser.add_argument('--backend', choices=['none', 'sqlite', 'parquet', 'mysql'], default='sqlite')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--metrics-port', type=int, help="serve the pipeline's /metrics on this port while replaying")
+    parser.add_argument('--save', help="write the synthetic stream as a CSV recording and exit")
+    parser.add_argument('--json', help="also write the report to this JSON file")
+    args = parser.parse_args()
+    
+    if args.save:
+        millis, values = generate_samples(parse_schedule(args.schedule), args.noise, seed=args.seed)
+        with open(args.save, 'wb') as f:
+            f.writelines(encode_csv(millis, values))
+        print(f"Wrote {len(millis)} samples to {args.save}")
+        return
+    
+    report = run_replay(args.devices, args.speed, args.schedule, args.noise, args.recording,
+                        args.protocol, args.source, args.backend, args.metrics_port, args.seed,
+                        args.edge_decimation, args.edge_raw, not args.full_rate)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
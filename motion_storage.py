@@ -0,0 +1,837 @@
+import os
+import sys
+import glob
+import json
+import math
+import time
+import sqlite3
+import tempfile
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+
+# MySQL is only needed for the MySQL backend (edge hosts can run on SQLite/Parquet)
+try:
+    import mysql.connector
+except ImportError:
+    mysql = None
+
+# Default backend and locations
+STORAGE_BACKEND = 'mysql'  # 'mysql', 'sqlite' or 'parquet'
+SQLITE_PATH = 'motion_data.sqlite3'
+PARQUET_DIR = 'motion_data_parquet'
+
+# Pooled connections per store (motion_pool.ConnectionPool)
+MYSQL_POOL_SIZE = 4
+SQLITE_POOL_SIZE = 4
+
+# Rows per multi-row INSERT prepared once per MySQL connection (the writer's
+# batch size, so a full batch is one execute of an already-prepared statement)
+MYSQL_PREPARED_INSERT_ROWS = 200
+
+# Parquet files are written once this many rows (or seconds) have accumulated;
+# until then each batch is only in the root's pending journal
+PARQUET_ROWS_PER_FILE = 50000
+PARQUET_MAX_FILE_SECONDS = 60.0
+PARQUET_JOURNAL_NAME = 'pending.journal'
+PARQUET_WRITER_LOCK_NAME = 'writer.lock'  # Held by the one process writing (and journaling) to a root
+
+# Rows pulled per chunk when streaming a range
+FETCH_CHUNK_ROWS = 50000
+
+# Columns read from sensor_data and the NumPy dtype each one is built as
+SENSOR_COLUMNS = {
+    'timestamp': 'datetime64[us]',
+    'motion_label': object,
+    'accel_x': np.float32,
+    'accel_y': np.float32,
+    'accel_z': np.float32,
+    'gyro_x': np.float32,
+    'gyro_y': np.float32,
+    'gyro_z': np.float32,
+    'sequence_id': object,
+    'hold_count': np.int32,
+    'hold_until': 'datetime64[us]'
+}
+
+# A hold record is one stored reading standing in for hold_count samples of the
+# same label, the last of them at hold_until (plain rows: 1 and NULL). Ingest
+# closes holds at every analysis window boundary, so expanding one never moves
+# a sample into a different window.
+
+# Exceptions any backend may raise for an unavailable or failing store
+STORAGE_ERRORS = (sqlite3.Error, OSError) + ((mysql.connector.Error,) if mysql else ())
+
+# The subset meaning the store is unreachable (worth retrying later); any other
+# storage error means it refused the request, and the same rows would fail again
+CONNECTION_ERRORS = (sqlite3.OperationalError, OSError) + (
+    (mysql.connector.OperationalError, mysql.connector.InterfaceError) if mysql else ())
+
+# MySQL client errors for a refused or lost connection (can't connect through the
+# socket / over TCP, server gone away, lost during a query, lost at handshake);
+# the C extension raises some of them as a plain DatabaseError
+MYSQL_CONNECTION_ERRNOS = (2002, 2003, 2006, 2013, 2055)
+
+def is_connection_error(error):
+    """Whether a storage error means the store is unreachable rather than that it refused the request."""
+    if isinstance(error, CONNECTION_ERRORS):
+        return True
+    return mysql is not None and isinstance(error, mysql.connector.Error) and error.errno in MYSQL_CONNECTION_ERRNOS
+
+INSERT_SAMPLE_QUERY = '''
+INSERT INTO sensor_data
+(timestamp, motion_label, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z, sequence_id, hold_count, hold_until)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+'''
+
+# Rollups maintained in the same transaction as the raw rows, so summary
+# queries never have to scan sensor_data
+UPSERT_MINUTE_ROLLUP_QUERY = '''
+INSERT INTO sensor_data_minute
+(minute_start, sequence_id, motion_label, sample_count, accel_mag_min, accel_mag_max, accel_mag_sum, last_timestamp)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    sample_count = sample_count + VALUES(sample_count),
+    accel_mag_min = LEAST(accel_mag_min, VALUES(accel_mag_min)),
+    accel_mag_max = GREATEST(accel_mag_max, VALUES(accel_mag_max)),
+    accel_mag_sum = accel_mag_sum + VALUES(accel_mag_sum),
+    last_timestamp = GREATEST(last_timestamp, VALUES(last_timestamp))
+'''
+
+UPSERT_SEQUENCE_ROLLUP_QUERY = '''
+INSERT INTO sensor_data_sequence
+(sequence_id, motion_label, sample_count, accel_mag_min, accel_mag_max, accel_mag_sum, first_timestamp, last_timestamp)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    sample_count = sample_count + VALUES(sample_count),
+    accel_mag_min = LEAST(accel_mag_min, VALUES(accel_mag_min)),
+    accel_mag_max = GREATEST(accel_mag_max, VALUES(accel_mag_max)),
+    accel_mag_sum = accel_mag_sum + VALUES(accel_mag_sum),
+    first_timestamp = LEAST(first_timestamp, VALUES(first_timestamp)),
+    last_timestamp = GREATEST(last_timestamp, VALUES(last_timestamp))
+'''
+
+# Columns sensor_data has in this database (checked on connect: the hold columns
+# come from "SQL Migration - Hold Records.sql" on databases created before them)
+SENSOR_DATA_COLUMNS_QUERY = """
+SELECT COLUMN_NAME FROM information_schema.COLUMNS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'sensor_data'
+"""
+
+SUMMARY_TOTALS_QUERY = "SELECT COALESCE(SUM(sample_count), 0), MAX(last_timestamp) FROM sensor_data_sequence"
+SUMMARY_LABELS_QUERY = "SELECT motion_label, SUM(sample_count) FROM sensor_data_sequence GROUP BY motion_label"
+
+def encode_row(row):
+    """JSON-ready list for one writer row (INSERT_SAMPLE_QUERY order)."""
+    timestamp, label, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z, sequence_id, hold_count, hold_until = row
+    return [timestamp.isoformat(), label, float(accel_x), float(accel_y), float(accel_z),
+            float(gyro_x), float(gyro_y), float(gyro_z), sequence_id, int(hold_count),
+            hold_until.isoformat() if hold_until else None]
+
+def decode_row(values):
+    """Writer row back from encode_row's list."""
+    return ((datetime.fromisoformat(values[0]),) + tuple(values[1:10]) +
+            (datetime.fromisoformat(values[10]) if values[10] else None,))
+
+def rollup_rows(rows):
+    """Aggregate sample rows into per-minute and per-sequence rollup rows."""
+    minutes = {}
+    sequences = {}
+    
+    for timestamp, label, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z, sequence_id, hold_count, hold_until in rows:
+        accel_mag = math.sqrt(accel_x**2 + accel_y**2 + accel_z**2)
+        minute = timestamp.replace(second=0, microsecond=0)
+        
+        # A hold record counts as the samples it stands for (holds never cross a minute)
+        last = hold_until or timestamp
+        
+        for groups, key in ((minutes, (minute, sequence_id, label)), (sequences, (sequence_id, label))):
+            group = groups.get(key)
+            if group is None:
+                # [count, min, max, sum, first timestamp, last timestamp]
+                groups[key] = [hold_count, accel_mag, accel_mag, accel_mag * hold_count, timestamp, last]
+            else:
+                group[0] += hold_count
+                group[1] = min(group[1], accel_mag)
+                group[2] = max(group[2], accel_mag)
+                group[3] += accel_mag * hold_count
+                group[4] = min(group[4], timestamp)
+                group[5] = max(group[5], last)
+    
+    minute_rows = [key + (count, low, high, total, last)
+                   for key, (count, low, high, total, first, last) in minutes.items()]
+    sequence_rows = [key + (count, low, high, total, first, last)
+                     for key, (count, low, high, total, first, last) in sequences.items()]
+    return minute_rows, sequence_rows
+
+def rows_to_frame(rows):
+    """Build a DataFrame straight from typed column arrays."""
+    columns = zip(*rows)
+    return pd.DataFrame({
+        name: np.array(values, dtype=dtype)
+        for (name, dtype), values in zip(SENSOR_COLUMNS.items(), columns)
+    })
+
+def expand_holds(chunk):
+    """Expand hold records back into one row per sample, for the analyzer.
+    
+    The held samples are spread evenly from the record's timestamp to its
+    hold_until; plain rows pass through unchanged.
+    """
+    counts = chunk['hold_count'].to_numpy(np.int64)
+    if len(chunk) == 0 or (counts <= 1).all():
+        return chunk
+    counts = np.maximum(counts, 1)
+    
+    rows = np.repeat(np.arange(len(chunk)), counts)
+    position = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    
+    start = chunk['timestamp'].to_numpy('datetime64[us]').view(np.int64)
+    until = chunk['hold_until'].to_numpy('datetime64[us]')
+    span = np.where(np.isnat(until), 0, until.view(np.int64) - start)
+    step = span // np.maximum(counts - 1, 1)
+    
+    expanded = chunk.iloc[rows].reset_index(drop=True)
+    expanded['timestamp'] = (start[rows] + position * step[rows]).view('datetime64[us]')
+    expanded['hold_count'] = np.int32(1)
+    expanded['hold_until'] = np.datetime64('NaT', 'us')
+    return expanded
+
+class StorageBackend:
+    """Interface shared by the ingest writer and the analyzer."""
+    
+    name = 'base'
+    
+    def connect(self):
+        """Open (or validate) the store; raises one of STORAGE_ERRORS on failure."""
+        raise NotImplementedError
+    
+    def write_samples(self, rows):
+        """Durably append sample rows (INSERT_SAMPLE_QUERY order, hold records included) and their rollups.
+        
+        Once this returns the rows must survive a crash: a backend that buffers
+        rows for larger writes journals them first and replays them on connect.
+        """
+        raise NotImplementedError
+    
+    def iter_range(self, start_time, end_time=None, chunk_rows=FETCH_CHUNK_ROWS):
+        """Yield typed DataFrame chunks with start_time <= timestamp < end_time, in time order."""
+        raise NotImplementedError
+    
+    def iter_new_rows(self, after_id, start_time, chunk_rows=FETCH_CHUNK_ROWS):
+        """Yield (ids, timestamps) arrays for rows with id > after_id and timestamp >= start_time."""
+        raise NotImplementedError
+    
+    def summary(self):
+        """Return (total_count, latest_timestamp, [(label, count), ...]) from the rollups."""
+        raise NotImplementedError
+    
+    def identity(self):
+        """Name the store the rows (and their ids) live in, without connecting."""
+        raise NotImplementedError
+    
+    def close(self):
+        """Flush anything buffered and release resources."""
+
+class MySQLStorage(StorageBackend):
+    """MySQL sensor_data table behind a health-checked connection pool."""
+    
+    name = 'mysql'
+    
+    def __init__(self, db_config, pool_size=MYSQL_POOL_SIZE):
+        self.db_config = db_config
+        self.pool_size = pool_size
+        self.pool = None
+        
+        # One INSERT with placeholders for a full group of rows
+        values = '(' + ', '.join(['%s'] * 11) + ')'
+        self.bulk_insert_query = (INSERT_SAMPLE_QUERY.split('VALUES')[0] + 'VALUES ' +
+                                  ', '.join([values] * MYSQL_PREPARED_INSERT_ROWS))
+    
+    def connect(self):
+        if mysql is None:
+            raise ImportError("The MySQL backend needs mysql-connector-python (pip install mysql-connector-python)")
+        from motion_pool import ConnectionPool
+        if self.pool is not None:
+            self.pool.close()
+        self.pool = ConnectionPool(lambda: mysql.connector.connect(**self.db_config),
+                                   ping=lambda conn: conn.ping(reconnect=False), size=self.pool_size)
+        # Open the first connection now so an unreachable server fails here
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(SENSOR_DATA_COLUMNS_QUERY)
+            # Some connector versions return information_schema names as bytearray
+            columns = {(name.decode() if isinstance(name, (bytes, bytearray)) else name).lower()
+                       for (name,) in cursor.fetchall()}
+            cursor.close()
+        
+        # Every insert and read names the hold columns; without them each write
+        # would be refused until someone noticed. A storage error (not a crash)
+        # so a writer that reconnects mid-run keeps spilling until the migration
+        missing = [name for name in ('hold_count', 'hold_until') if name not in columns]
+        if columns and missing:
+            raise mysql.connector.ProgrammingError(
+                msg=f"sensor_data has no {' or '.join(missing)} column: run "
+                    f"\"SQL Migration - Hold Records.sql\" against {self.db_config.get('database')} first",
+                errno=mysql.connector.errorcode.ER_BAD_FIELD_ERROR)
+    
+    def write_samples(self, rows):
+        minute_rows, sequence_rows = rollup_rows(rows)
+        # A connection that raises is discarded by the pool instead of returned
+        with self.pool.connection() as conn:
+            try:
+                # Full groups reuse the connection's prepared multi-row INSERT
+                group = MYSQL_PREPARED_INSERT_ROWS
+                full = len(rows) - len(rows) % group
+                if full:
+                    insert = self.pool.statement(conn, 'bulk_insert', lambda conn: conn.cursor(prepared=True))
+                    for start in range(0, full, group):
+                        insert.execute(self.bulk_insert_query, [value for row in rows[start:start + group] for value in row])
+                cursor = conn.cursor()
+                if full < len(rows):
+                    cursor.executemany(INSERT_SAMPLE_QUERY, rows[full:])
+                cursor.executemany(UPSERT_MINUTE_ROLLUP_QUERY, minute_rows)
+                cursor.executemany(UPSERT_SEQUENCE_ROLLUP_QUERY, sequence_rows)
+                conn.commit()
+                cursor.close()
+            except mysql.connector.Error:
+                conn.rollback()
+                raise
+    
+    def iter_range(self, start_time, end_time=None, chunk_rows=FETCH_CHUNK_ROWS):
+        query = f"""
+        SELECT {', '.join(SENSOR_COLUMNS)}
+        FROM sensor_data
+        WHERE timestamp >= %s {'AND timestamp < %s' if end_time is not None else ''}
+        ORDER BY timestamp ASC, id ASC
+        """
+        params = (start_time,) if end_time is None else (start_time, end_time)
+        for rows in self._stream(query, params, chunk_rows):
+            yield rows_to_frame(rows)
+    
+    def iter_new_rows(self, after_id, start_time, chunk_rows=FETCH_CHUNK_ROWS):
+        query = """
+        SELECT id, timestamp
+        FROM sensor_data
+        WHERE id > %s AND timestamp >= %s
+        """
+        for rows in self._stream(query, (after_id, start_time), chunk_rows):
+            ids, timestamps = zip(*rows)
+            yield np.array(ids, dtype=np.int64), np.array(timestamps, dtype='datetime64[us]')
+    
+    def _stream(self, query, params, chunk_rows):
+        """Run a query on the connection's prepared (unbuffered) statement and yield fetchmany() chunks."""
+        # A stream abandoned with rows left unread discards its connection
+        # (it can't be reused until they are read), so only finished ones go back
+        with self.pool.connection() as conn:
+            cursor = self.pool.statement(conn, query, lambda conn: conn.cursor(prepared=True))
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield rows
+    
+    def identity(self):
+        config = self.db_config or {}
+        return f"mysql://{config.get('host', 'localhost')}:{config.get('port', 3306)}/{config.get('database', '')}"
+    
+    def summary(self):
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(SUMMARY_TOTALS_QUERY)
+            total_count, latest = cursor.fetchone()
+            cursor.execute(SUMMARY_LABELS_QUERY)
+            distribution = cursor.fetchall()
+            cursor.close()
+            return int(total_count), latest, distribution
+    
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+
+# SQLite keeps timestamps as fixed-format text so string order is time order
+SQLITE_TIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+SQLITE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sensor_data (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    motion_label TEXT,
+    accel_x REAL,
+    accel_y REAL,
+    accel_z REAL,
+    gyro_x REAL,
+    gyro_y REAL,
+    gyro_z REAL,
+    sequence_id TEXT,
+    hold_count INTEGER NOT NULL DEFAULT 1,
+    hold_until TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_timestamp ON sensor_data (timestamp);
+CREATE INDEX IF NOT EXISTS idx_sequence_timestamp ON sensor_data (sequence_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_label_timestamp ON sensor_data (motion_label, timestamp);
+
+CREATE TABLE IF NOT EXISTS sensor_data_minute (
+    minute_start TEXT NOT NULL,
+    sequence_id TEXT NOT NULL,
+    motion_label TEXT NOT NULL,
+    sample_count INTEGER NOT NULL,
+    accel_mag_min REAL,
+    accel_mag_max REAL,
+    accel_mag_sum REAL,
+    last_timestamp TEXT,
+    PRIMARY KEY (minute_start, sequence_id, motion_label)
+);
+
+CREATE TABLE IF NOT EXISTS sensor_data_sequence (
+    sequence_id TEXT NOT NULL,
+    motion_label TEXT NOT NULL,
+    sample_count INTEGER NOT NULL,
+    accel_mag_min REAL,
+    accel_mag_max REAL,
+    accel_mag_sum REAL,
+    first_timestamp TEXT,
+    last_timestamp TEXT,
+    PRIMARY KEY (sequence_id, motion_label)
+);
+'''
+
+SQLITE_UPSERT_MINUTE_ROLLUP_QUERY = '''
+INSERT INTO sensor_data_minute
+(minute_start, sequence_id, motion_label, sample_count, accel_mag_min, accel_mag_max, accel_mag_sum, last_timestamp)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (minute_start, sequence_id, motion_label) DO UPDATE SET
+    sample_count = sample_count + excluded.sample_count,
+    accel_mag_min = min(accel_mag_min, excluded.accel_mag_min),
+    accel_mag_max = max(accel_mag_max, excluded.accel_mag_max),
+    accel_mag_sum = accel_mag_sum + excluded.accel_mag_sum,
+    last_timestamp = max(last_timestamp, excluded.last_timestamp)
+'''
+
+SQLITE_UPSERT_SEQUENCE_ROLLUP_QUERY = '''
+INSERT INTO sensor_data_sequence
+(sequence_id, motion_label, sample_count, accel_mag_min, accel_mag_max, accel_mag_sum, first_timestamp, last_timestamp)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (sequence_id, motion_label) DO UPDATE SET
+    sample_count = sample_count + excluded.sample_count,
+    accel_mag_min = min(accel_mag_min, excluded.accel_mag_min),
+    accel_mag_max = max(accel_mag_max, excluded.accel_mag_max),
+    accel_mag_sum = accel_mag_sum + excluded.accel_mag_sum,
+    first_timestamp = min(first_timestamp, excluded.first_timestamp),
+    last_timestamp = max(last_timestamp, excluded.last_timestamp)
+'''
+
+# Columns added after the first release; connect() adds them to older files
+SQLITE_ADDED_COLUMNS = {
+    'hold_count': 'INTEGER NOT NULL DEFAULT 1',
+    'hold_until': 'TEXT'
+}
+
+def _sqlite_time(value):
+    """Format a datetime-like value the way SQLite rows store it."""
+    return pd.Timestamp(value).strftime(SQLITE_TIME_FORMAT)
+
+class SQLiteStorage(StorageBackend):
+    """Embedded single-file store in WAL mode (readers never block the writer)."""
+    
+    name = 'sqlite'
+    
+    def __init__(self, path=SQLITE_PATH, pool_size=SQLITE_POOL_SIZE):
+        self.path = path
+        self.pool_size = pool_size
+        self.pool = None
+    
+    def _connect(self):
+        """Open a connection (pooled ones move between threads, one user at a time)."""
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    def connect(self):
+        from motion_pool import ConnectionPool
+        conn = self._connect()
+        conn.executescript(SQLITE_SCHEMA)
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(sensor_data)")}
+        for name, definition in SQLITE_ADDED_COLUMNS.items():
+            if name not in existing:
+                conn.execute(f"ALTER TABLE sensor_data ADD COLUMN {name} {definition}")
+        conn.close()
+        
+        # Pooled connections keep sqlite3's per-connection statement cache, so
+        # the INSERT and range SELECT are prepared once, not on every call
+        if self.pool is not None:
+            self.pool.close()
+        self.pool = ConnectionPool(self._connect, ping=lambda conn: conn.execute("SELECT 1"), size=self.pool_size)
+    
+    def write_samples(self, rows):
+        minute_rows, sequence_rows = rollup_rows(rows)
+        with self.pool.connection() as conn:
+            with conn:
+                conn.executemany(INSERT_SAMPLE_QUERY.replace('%s', '?'),
+                                 [(row[0].strftime(SQLITE_TIME_FORMAT),) + tuple(row[1:10]) +
+                                  (row[10].strftime(SQLITE_TIME_FORMAT) if row[10] else None,) for row in rows])
+                conn.executemany(SQLITE_UPSERT_MINUTE_ROLLUP_QUERY,
+                                 [(row[0].strftime(SQLITE_TIME_FORMAT),) + row[1:7] + (row[7].strftime(SQLITE_TIME_FORMAT),)
+                                  for row in minute_rows])
+                conn.executemany(SQLITE_UPSERT_SEQUENCE_ROLLUP_QUERY,
+                                 [row[:6] + (row[6].strftime(SQLITE_TIME_FORMAT), row[7].strftime(SQLITE_TIME_FORMAT))
+                                  for row in sequence_rows])
+    
+    def iter_range(self, start_time, end_time=None, chunk_rows=FETCH_CHUNK_ROWS):
+        query = f"""
+        SELECT {', '.join(SENSOR_COLUMNS)}
+        FROM sensor_data
+        WHERE timestamp >= ? {'AND timestamp < ?' if end_time is not None else ''}
+        ORDER BY timestamp ASC, id ASC
+        """
+        params = (_sqlite_time(start_time),) if end_time is None else (_sqlite_time(start_time), _sqlite_time(end_time))
+        for rows in self._stream(query, params, chunk_rows):
+            # NumPy parses the ISO text timestamps straight into datetime64
+            yield rows_to_frame(rows)
+    
+    def iter_new_rows(self, after_id, start_time, chunk_rows=FETCH_CHUNK_ROWS):
+        query = "SELECT id, timestamp FROM sensor_data WHERE id > ? AND timestamp >= ?"
+        for rows in self._stream(query, (after_id, _sqlite_time(start_time)), chunk_rows):
+            ids, timestamps = zip(*rows)
+            yield np.array(ids, dtype=np.int64), np.array(timestamps, dtype='datetime64[us]')
+    
+    def _stream(self, query, params, chunk_rows):
+        """Run a query and yield fetchmany() chunks."""
+        with self.pool.connection() as conn:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield rows
+    
+    def identity(self):
+        return f"sqlite:{os.path.abspath(self.path)}"
+    
+    def summary(self):
+        with self.pool.connection() as conn:
+            total_count, latest = conn.execute(SUMMARY_TOTALS_QUERY).fetchone()
+            distribution = conn.execute(SUMMARY_LABELS_QUERY).fetchall()
+        latest = datetime.strptime(latest, SQLITE_TIME_FORMAT) if latest else None
+        return int(total_count), latest, distribution
+    
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+
+class ParquetStorage(StorageBackend):
+    """Append-only columnar files partitioned by hour: root/date=YYYY-MM-DD/hour=HH/*.parquet.
+    
+    The first write_samples call takes the root's writer lock, so the pending
+    journal is only ever replayed, flushed and removed by the process that
+    owns it; opens that only read never touch it.
+    """
+    
+    name = 'parquet'
+    
+    def __init__(self, root=PARQUET_DIR, rows_per_file=PARQUET_ROWS_PER_FILE,
+                 max_file_seconds=PARQUET_MAX_FILE_SECONDS):
+        self.root = root
+        self.rows_per_file = rows_per_file
+        self.max_file_seconds = max_file_seconds
+        
+        # Rows waiting to be written as one file (ids assigned on arrival),
+        # journaled batch by batch until the file is written
+        self.pending = []
+        self.pending_since = None
+        self.next_id = 1
+        self.journal_path = os.path.join(root, PARQUET_JOURNAL_NAME)
+        self.lock_path = os.path.join(root, PARQUET_WRITER_LOCK_NAME)
+        self.writer_lock = None
+        
+        # Per-sequence rollups, persisted next to the data files along with the
+        # last id they include
+        self.rollup_path = os.path.join(root, 'sequence_rollup.json')
+        self.sequence_rollup = {}
+        self.rollup_through_id = 0
+    
+    def connect(self):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("The Parquet backend needs pyarrow (pip install pyarrow)")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        
+        # Read schema: files written before the hold columns existed read them as null
+        self.schema = pyarrow.schema([
+            (name, pyarrow.timestamp('us') if dtype == 'datetime64[us]' else
+                   pyarrow.string() if dtype is object else pyarrow.from_numpy_dtype(dtype))
+            for name, dtype in SENSOR_COLUMNS.items()
+        ])
+        
+        os.makedirs(self.root, exist_ok=True)
+        self._load_state()
+    
+    def _load_state(self):
+        """Next id and saved rollups, from what is on disk."""
+        # File names carry their id range, so the next id comes from a directory listing
+        self.next_id = 1
+        for path in self._files():
+            self.next_id = max(self.next_id, self._id_range(path)[1] + 1)
+        
+        self.sequence_rollup = {}
+        self.rollup_through_id = 0
+        if os.path.exists(self.rollup_path):
+            with open(self.rollup_path) as f:
+                saved = json.load(f)
+            # Rollups saved before the journal existed are a bare dict covering every file
+            if 'groups' in saved:
+                self.rollup_through_id = saved['through_id']
+                saved = saved['groups']
+            else:
+                self.rollup_through_id = self.next_id - 1
+            self.sequence_rollup = {tuple(json.loads(key)): value for key, value in saved.items()}
+    
+    def _claim_writer(self):
+        """Take the writer lock (held until close), then recover what a crashed writer left journaled."""
+        handle = open(self.lock_path, 'a+')
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            raise BlockingIOError(f"Another process is writing to {self.root}")
+        self.writer_lock = handle
+        
+        # Files written since connect() (by an earlier writer) move the next id
+        self._load_state()
+        if os.path.exists(self.journal_path):
+            self._replay_journal()
+    
+    def _replay_journal(self):
+        """Recover batches acknowledged before a crash but never written to a file."""
+        with open(self.journal_path) as f:
+            for line in f:
+                try:
+                    batch = json.loads(line)
+                except ValueError:
+                    break  # Torn last line: that write_samples call never returned
+                first_id = batch['first_id']
+                rows = [decode_row(values) for values in batch['rows']]
+                
+                # A crash between writing the files and clearing the journal leaves
+                # rows that are already on disk (and maybe in the saved rollup)
+                self._add_rollup(rows[max(self.rollup_through_id + 1 - first_id, 0):])
+                self._buffer(rows[max(self.next_id - first_id, 0):])
+        self.flush()
+    
+    def _files(self, hour_dirs=None):
+        """List data files (optionally only inside the given hour directories)."""
+        if hour_dirs is None:
+            return sorted(glob.glob(os.path.join(self.root, 'date=*', 'hour=*', 'part-*.parquet')))
+        return [path for hour_dir in hour_dirs for path in sorted(glob.glob(os.path.join(hour_dir, 'part-*.parquet')))]
+    
+    def _id_range(self, path):
+        """Return (first_id, last_id) encoded in a data file name."""
+        first_id, last_id = os.path.basename(path)[len('part-'):-len('.parquet')].split('-')
+        return int(first_id), int(last_id)
+    
+    def _hour_dir(self, hour):
+        return os.path.join(self.root, f"date={hour:%Y-%m-%d}", f"hour={hour:%H}")
+    
+    def write_samples(self, rows):
+        if self.writer_lock is None:
+            self._claim_writer()
+        
+        # Journal the batch before acknowledging it; the data file comes later
+        with open(self.journal_path, 'a') as f:
+            f.write(json.dumps({'first_id': self.next_id, 'rows': [encode_row(row) for row in rows]}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        
+        self._buffer(rows)
+        self._add_rollup(rows)
+        
+        if self.pending and (len(self.pending) >= self.rows_per_file or
+                time.monotonic() - self.pending_since >= self.max_file_seconds):
+            self.flush()
+    
+    def _buffer(self, rows):
+        """Queue rows for the next file, assigning their ids."""
+        if rows and self.pending_since is None:
+            self.pending_since = time.monotonic()
+        
+        for row in rows:
+            self.pending.append((self.next_id,) + tuple(row))
+            self.next_id += 1
+    
+    def _add_rollup(self, rows):
+        for sequence_id, label, count, low, high, total, first, last in rollup_rows(rows)[1]:
+            group = self.sequence_rollup.get((sequence_id, label))
+            if group is None:
+                self.sequence_rollup[(sequence_id, label)] = [count, low, high, total, first.isoformat(), last.isoformat()]
+            else:
+                group[0] += count
+                group[1] = min(group[1], low)
+                group[2] = max(group[2], high)
+                group[3] += total
+                group[4] = min(group[4], first.isoformat())
+                group[5] = max(group[5], last.isoformat())
+    
+    def flush(self):
+        """Write pending rows as one file per hour partition, then the rollups, then clear the journal."""
+        if self.writer_lock is None:
+            return  # Only the writer owns the journal
+        if self.pending:
+            self._write_files()
+        elif not os.path.exists(self.journal_path):
+            return
+        
+        with open(self.rollup_path + '.tmp', 'w') as f:
+            json.dump({'through_id': self.next_id - 1,
+                       'groups': {json.dumps(key): value for key, value in self.sequence_rollup.items()}}, f)
+        os.replace(self.rollup_path + '.tmp', self.rollup_path)
+        self.rollup_through_id = self.next_id - 1
+        
+        os.remove(self.journal_path)
+        self.pending = []
+        self.pending_since = None
+    
+    def _write_files(self):
+        columns = list(zip(*self.pending))
+        frame = pd.DataFrame({
+            'id': np.array(columns[0], dtype=np.int64),
+            **{name: np.array(values, dtype=dtype) for (name, dtype), values in zip(SENSOR_COLUMNS.items(), columns[1:])}
+        })
+        
+        for hour, part in frame.groupby(frame['timestamp'].dt.floor('h'), sort=True):
+            hour_dir = self._hour_dir(hour)
+            os.makedirs(hour_dir, exist_ok=True)
+            path = os.path.join(hour_dir, f"part-{part['id'].iloc[0]:012d}-{part['id'].iloc[-1]:012d}.parquet")
+            
+            # Write then rename so readers never see a half-written file
+            self.pq.write_table(self.pa.Table.from_pandas(part, preserve_index=False), path + '.tmp')
+            os.replace(path + '.tmp', path)
+    
+    def iter_range(self, start_time, end_time=None, chunk_rows=FETCH_CHUNK_ROWS):
+        start_time = pd.Timestamp(start_time)
+        end_time = pd.Timestamp(end_time) if end_time is not None else None
+        
+        # Only open the hour partitions that overlap the range
+        hour_dirs = sorted(glob.glob(os.path.join(self.root, 'date=*', 'hour=*')))
+        for hour_dir in hour_dirs:
+            hour = pd.Timestamp(f"{hour_dir[-18:-8]} {hour_dir[-2:]}:00")
+            if hour + timedelta(hours=1) <= start_time.floor('h') or (end_time is not None and hour >= end_time):
+                continue
+            
+            filters = [('timestamp', '>=', start_time.to_datetime64())]
+            if end_time is not None:
+                filters.append(('timestamp', '<', end_time.to_datetime64()))
+            table = self.pq.read_table(self._files([hour_dir]), columns=list(SENSOR_COLUMNS), filters=filters,
+                                       schema=self.schema)
+            frame = table.to_pandas()
+            if len(frame) == 0:
+                continue
+            frame['hold_count'] = frame['hold_count'].fillna(1).astype(np.int32)
+            
+            # Files are read in id order, so the stable sort keeps ties in insert order
+            frame = frame.sort_values('timestamp', kind='stable', ignore_index=True)
+            frame['timestamp'] = frame['timestamp'].astype('datetime64[us]')
+            for offset in range(0, len(frame), chunk_rows):
+                yield frame.iloc[offset:offset + chunk_rows].reset_index(drop=True)
+    
+    def iter_new_rows(self, after_id, start_time, chunk_rows=FETCH_CHUNK_ROWS):
+        start_time = pd.Timestamp(start_time).to_datetime64()
+        for path in self._files():
+            if self._id_range(path)[1] <= after_id:
+                continue
+            table = self.pq.read_table(path, columns=['id', 'timestamp'],
+                                       filters=[('id', '>', after_id), ('timestamp', '>=', start_time)])
+            if table.num_rows:
+                yield (table.column('id').to_numpy(),
+                       table.column('timestamp').to_numpy().astype('datetime64[us]'))
+    
+    def identity(self):
+        return f"parquet:{os.path.abspath(self.root)}"
+    
+    def summary(self):
+        total_count = sum(group[0] for group in self.sequence_rollup.values())
+        latest = max((group[5] for group in self.sequence_rollup.values()), default=None)
+        distribution = {}
+        for (sequence_id, label), group in self.sequence_rollup.items():
+            distribution[label] = distribution.get(label, 0) + group[0]
+        return total_count, datetime.fromisoformat(latest) if latest else None, list(distribution.items())
+    
+    def close(self):
+        self.flush()
+        if self.writer_lock is not None:
+            self.writer_lock.close()  # Closing the handle releases the lock
+            self.writer_lock = None
+
+def create_storage(backend=STORAGE_BACKEND, db_config=None):
+    """Create the configured storage backend without connecting it."""
+    if backend == 'mysql':
+        return MySQLStorage(db_config)
+    if backend == 'sqlite':
+        return SQLiteStorage()
+    if backend == 'parquet':
+        return ParquetStorage()
+    if backend == 'standin':
+        # Local killable stand-in server (python motion_pool.py standin)
+        from motion_pool import StandinStorage
+        return StandinStorage()
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+def open_storage(backend=STORAGE_BACKEND, db_config=None):
+    """Create and connect the configured storage backend."""
+    storage = create_storage(backend, db_config)
+    storage.connect()
+    return storage
+
+def benchmark_backends(backends, total_rows=200000, batch_size=200):
+    """Compare ingest rate and range-scan latency across connected backends."""
+    rng = np.random.default_rng(0)
+    start = datetime(2025, 1, 1)
+    labels = ['resting', 'idle', 'walking', 'running']
+    values = rng.normal(0, 1, (total_rows, 6)).astype(np.float32).tolist()
+    rows = [(start + timedelta(seconds=i // 10), labels[(i // 500) % 4], *values[i], 'bench', 1, None)
+            for i in range(total_rows)]
+    span = timedelta(seconds=total_rows // 10)
+    
+    print(f"{'backend':<10}{'ingest rows/s':>16}{'scan 1% (ms)':>16}{'scan 10% (ms)':>16}{'scan all (ms)':>16}"
+          f"{'rows read':>12}")
+    for storage in backends:
+        started = time.perf_counter()
+        for offset in range(0, total_rows, batch_size):
+            storage.write_samples(rows[offset:offset + batch_size])
+        if isinstance(storage, ParquetStorage):
+            storage.flush()
+        ingest_rate = total_rows / (time.perf_counter() - started)
+        
+        scans = []
+        for fraction in (0.01, 0.1, 1.0):
+            range_start = start + span * (1 - fraction)
+            started = time.perf_counter()
+            scanned = sum(len(chunk) for chunk in storage.iter_range(range_start))
+            scans.append((time.perf_counter() - started) * 1000)
+        
+        # The full scan must return every row written (a lost or doubled batch shows here)
+        check = '' if scanned == total_rows else f"  (wrote {total_rows:,})"
+        print(f"{storage.name:<10}{ingest_rate:>16,.0f}{scans[0]:>16.1f}{scans[1]:>16.1f}{scans[2]:>16.1f}"
+              f"{scanned:>12,}{check}")
+
+if __name__ == "__main__":
+    # Benchmark the embedded backends in a scratch directory (add 'mysql' to include MySQL)
+    workdir = tempfile.mkdtemp(prefix='motion_storage_bench_')
+    backends = [SQLiteStorage(os.path.join(workdir, 'bench.sqlite3')),
+                ParquetStorage(os.path.join(workdir, 'parquet'))]
+    if 'mysql' in sys.argv[1:]:
+        from test_db_connection import DB_CONFIG
+        backends.insert(0, MySQLStorage(DB_CONFIG))
+    for storage in backends:
+        storage.connect()
+    benchmark_backends(backends)
@@ -1,245 +1,1371 @@
-import serial
-import time
-import mysql.connector
-import numpy as np
-from datetime import datetime
-from collections import deque
-
-# MySQL Database Configuration
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'motion_app',
-    'password': 'motion123',
-    'database': 'motion_data'
-}
-
-# Serial port configuration
-SERIAL_PORT = 'COM4'  # Update this to match your Arduino port
-BAUD_RATE = 115200
-
-# Motion recognition parameters
-WINDOW_SIZE = 20  # Number of samples to consider for pattern recognition
-SAMPLING_RATE = 10  # Hz (matches Arduino's 100ms interval)
-
-class SimpleMotionRecognizer:
-    """Simplified motion recognizer focusing on idle, walking, and running."""
-    
-    def __init__(self):
-        """Initialize with calibrated thresholds for the reliable motion types."""
-        # Baseline values for your specific sensor
-        self.baseline_accel = 9.82  # Your sensor's gravity baseline
-        
-        # Idle thresholds - keeping these exact since they work perfectly
-        self.idle_accel_range = 0.05  # Maximum deviation from baseline to be considered idle
-        self.idle_std_max = 0.03     # Maximum standard deviation for idle
-        self.idle_gyro_max = 0.05    # Maximum gyro reading for idle
-        
-        # Movement thresholds - these work well according to feedback
-        self.walk_threshold_min = 10.3  # Minimum for walking
-        self.walk_threshold_max = 14.0  # Maximum for walking
-        self.run_threshold = 14.0       # Above this is running
-        
-        # Buffer for recent samples
-        self.buffer = deque(maxlen=WINDOW_SIZE)
-        
-        # Debug mode
-        self.debug = True
-        
-        # Output throttling
-        self.output_counter = 0
-        self.output_frequency = 5  # Only print every X readings
-    
-    def add_sample(self, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z):
-        """Add a new motion sample to the buffer."""
-        self.buffer.append({
-            'accel_x': accel_x,
-            'accel_y': accel_y,
-            'accel_z': accel_z,
-            'gyro_x': gyro_x,
-            'gyro_y': gyro_y,
-            'gyro_z': gyro_z
-        })
-    
-    def recognize_pattern(self):
-        """Analyze buffer and determine the motion state."""
-        self.output_counter += 1
-        print_output = (self.output_counter % self.output_frequency == 0)
-        
-        if len(self.buffer) < WINDOW_SIZE // 2:
-            return "collecting_data"  # Not enough data yet
-            
-        # Extract features from buffer
-        accel_magnitudes = []
-        gyro_magnitudes = []
-        
-        for sample in self.buffer:
-            # Calculate acceleration and gyroscope magnitudes
-            accel_mag = np.sqrt(sample['accel_x']**2 + sample['accel_y']**2 + sample['accel_z']**2)
-            gyro_mag = np.sqrt(sample['gyro_x']**2 + sample['gyro_y']**2 + sample['gyro_z']**2)
-            
-            accel_magnitudes.append(accel_mag)
-            gyro_magnitudes.append(gyro_mag)
-            
-        # Statistical features
-        accel_mean = np.mean(accel_magnitudes)
-        accel_std = np.std(accel_magnitudes)
-        accel_max = np.max(accel_magnitudes)
-        
-        gyro_mean = np.mean(gyro_magnitudes)
-        
-        # Calculate acceleration change over time (first derivative)
-        accel_changes = [abs(accel_magnitudes[i] - accel_magnitudes[i-1]) 
-                         for i in range(1, len(accel_magnitudes))]
-        mean_accel_change = np.mean(accel_changes) if accel_changes else 0
-        
-        # Debug print features if enabled (throttled)
-        if self.debug and print_output:
-            print(f"\nFEATURES: accel_mean={accel_mean:.2f}, accel_std={accel_std:.2f}, " +
-                  f"accel_max={accel_max:.2f}, gyro_mean={gyro_mean:.2f}, change={mean_accel_change:.2f}")
-        
-        # ----- MOTION DETECTION LOGIC -----
-        
-        # FIRST CHECK: Is it idle? (very specific criteria that worked well)
-        if (abs(accel_mean - self.baseline_accel) < self.idle_accel_range and
-            accel_std < self.idle_std_max and
-            gyro_mean < self.idle_gyro_max):
-            return "resting"
-        
-        # Detect running (high consistent acceleration)
-        if accel_mean > self.run_threshold:
-            return "running"
-            
-        # Detect walking (moderate consistent acceleration)
-        if self.walk_threshold_min < accel_mean < self.walk_threshold_max:
-            return "walking"
-            
-        # Any other motion that's not idle, walking, or running is "moving"
-        return "idle"
-
-def read_and_recognize():
-    """Read sensor data and perform motion recognition."""
-    try:
-        # Connect to database
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        
-        # Open serial connection
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
-        print(f"Connected to {SERIAL_PORT} at {BAUD_RATE} baud")
-        
-        # Generate a sequence ID based on timestamp
-        sequence_id = datetime.now().strftime("%Y%m%d%H%M%S")
-        print(f"Starting motion recognition session: {sequence_id}")
-        
-        # Initialize motion recognizer
-        recognizer = SimpleMotionRecognizer()
-        
-        # Wait for serial connection to stabilize
-        time.sleep(2)
-        
-        # Add minimal debouncing for stability
-        current_motion = "idle"
-        motion_count = 0
-        
-        # Print setup instructions
-        print("\n*** SIMPLIFIED MOTION RECOGNITION SYSTEM ***")
-        print("MOTION TYPES:")
-        print("- IDLE: No significant movement")
-        print("- WALKING: Walking pace movement")
-        print("- RUNNING: Running or jogging movement")
-        print("- MOVING: Other unclassified movements")
-        print("\nPress Ctrl+C to stop\n")
-        
-        try:
-            last_display_time = time.time()
-            display_interval = 0.5  # seconds
-            
-            while True:
-                if ser.in_waiting > 0:
-                    # Read line from serial port
-                    line = ser.readline().decode('utf-8').strip()
-                    
-                    try:
-                        # Parse CSV formatted data
-                        parts = line.split(',')
-                        if len(parts) == 8:  # Ensure we have all expected values
-                            arduino_timestamp = int(parts[0])
-                            accel_x = float(parts[1])
-                            accel_y = float(parts[2])
-                            accel_z = float(parts[3])
-                            gyro_x = float(parts[4])
-                            gyro_y = float(parts[5])
-                            gyro_z = float(parts[6])
-                            temperature = float(parts[7])
-                            
-                            # Add sample to motion recognizer
-                            recognizer.add_sample(accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z)
-                            
-                            # Perform motion recognition
-                            detected_motion = recognizer.recognize_pattern()
-                            
-                            # Light debouncing for stability
-                            if detected_motion == current_motion:
-                                motion_count += 1
-                            else:
-                                motion_count -= 1
-                                
-                            # Change motion with minimal debouncing
-                            if motion_count >= 3:  # Need 3 consistent readings
-                                motion_count = 3
-                            elif motion_count <= -3:  # Need 3 consistent different readings to change
-                                if current_motion != detected_motion and detected_motion != "collecting_data":
-                                    print(f"\n>>> MOTION CHANGED: {current_motion.upper()} -> {detected_motion.upper()}")
-                                current_motion = detected_motion
-                                motion_count = 0
-                                
-                            # Store data with recognized motion label
-                            if current_motion != "collecting_data":
-                                cursor.execute('''
-                                INSERT INTO sensor_data 
-                                (motion_label, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z, sequence_id)
-                                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                                ''', (
-                                    current_motion,
-                                    accel_x, accel_y, accel_z,
-                                    gyro_x, gyro_y, gyro_z,
-                                    sequence_id
-                                ))
-                                
-                                # Commit every 10 records
-                                if cursor.rowcount % 10 == 0:
-                                    conn.commit()
-                            
-                            # Print current motion status (throttled by time)
-                            current_time = time.time()
-                            if current_time - last_display_time >= display_interval:
-                                print(f"Current motion: {current_motion.upper()}")
-                                last_display_time = current_time
-                            
-                    except ValueError as e:
-                        print(f"Error parsing data: {e} | Raw data: {line}")
-                    except Exception as e:
-                        print(f"Unexpected error: {e}")
-                        
-                time.sleep(0.01)  # Small delay to prevent CPU overload
-                
-        except KeyboardInterrupt:
-            print("\nMotion recognition stopped by user.")
-        finally:
-            # Ensure final commit and cleanup
-            conn.commit()
-            ser.close()
-            
-    except mysql.connector.Error as e:
-        print(f"Database error: {e}")
-    except serial.SerialException as e:
-        print(f"Serial port error: {e}")
-    except Exception as e:
-        print(f"Unexpected error: {e}")
-    finally:
-        if 'conn' in locals() and conn.is_connected():
-            conn.close()
-            print("Database connection closed.")
-
-if __name__ == "__main__":
-    read_and_recognize()
\ No newline at end of file
+import os
+import sys
+import stat
+import serial
+import time
+import math
+import queue
+import binascii
+import signal
+import select
+import selectors
+import threading
+import numpy as np
+from datetime import datetime, timedelta
+from collections import deque
+from motion_storage import STORAGE_ERRORS
+from motion_pool import SPILL_JOURNAL_PATH, open_resilient_storage
+from motion_metrics import MetricsRegistry, MetricsServer
+from motion_model import window_features, load_model
+from motion_cadence import CADENCE_WINDOW, SlidingSpectrum, sliding_cadence_features
+from motion_patterns import WINDOW_EPOCH, MotionPatternRules, OnlineSegmentAggregator
+
+# MySQL Database Configuration
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'motion_app',
+    'password': 'motion123',
+    'database': 'motion_data'
+}
+
+# Where samples are stored: 'mysql', 'sqlite' (embedded, WAL), 'parquet' (columnar files)
+# or 'standin' (local killable server: python motion_pool.py standin)
+STORAGE_BACKEND = 'mysql'
+
+# Serial port configuration
+SERIAL_PORT = 'COM4'  # Update this to match your Arduino port
+SERIAL_PORTS = [SERIAL_PORT]  # List every board here to read several at once
+BAUD_RATE = 115200
+READ_CHUNK_SIZE = 4096  # Bytes read per readiness event
+POLL_INTERVAL = 0.002   # Seconds between polls of sources that can't be selected
+
+# Binary frame protocol (must match SampleFrame in MPUMotion.ino)
+# sync(2) | type(1) | millis(4) | ax ay az gx gy gz temp (7 x float32) | crc16(2)
+SERIAL_PROTOCOL = 'auto'  # 'csv', 'binary', or 'auto' (switch on first sync word)
+FRAME_SYNC = b'\xa5\x5a'
+FRAME_TYPE_SAMPLE = 0x01
+FRAME_TYPE_FEATURES = 0x03  # Edge mode: same layout, values = FEATURE_FRAME_VALUES
+FRAME_TYPES = (FRAME_TYPE_SAMPLE, FRAME_TYPE_FEATURES)
+FRAME_DTYPE = np.dtype([
+    ('sync', '<u2'),
+    ('type', 'u1'),
+    ('millis', '<u4'),
+    ('values', '<f4', (7,)),
+    ('crc', '<u2')
+])
+FRAME_SIZE = FRAME_DTYPE.itemsize
+FRAME_CRC_INIT = 0xFFFF  # CRC-16/CCITT-FALSE, computed over type..values
+
+# Feature frames (EDGE_FEATURES in MPUMotion.ino) carry the board's own window
+# statistics; millis is the newest sample's, the counts are sent as floats
+FEATURE_FRAME_VALUES = ('accel_mean', 'accel_std', 'accel_max', 'gyro_mean', 'accel_change',
+                        'window_count', 'window_size')
+
+# Downlink: host -> device state frames (must match StateFrame in MPUMotion.ino)
+# sync(2) | type(1) | motion(1, index in MOTION_CODES) | pattern(1, index in DOWNLINK_PATTERNS) | crc16(2)
+DOWNLINK_ENABLED = True
+FRAME_TYPE_STATE = 0x02
+STATE_FRAME_DTYPE = np.dtype([
+    ('sync', '<u2'),
+    ('type', 'u1'),
+    ('motion', 'u1'),
+    ('pattern', 'u1'),
+    ('crc', '<u2')
+])
+STATE_FRAME_SIZE = STATE_FRAME_DTYPE.itemsize
+DOWNLINK_PATTERNS = ('none', 'active', 'stationary', 'mixed', 'unknown')  # Other names are sent as 'unknown'
+DOWNLINK_REFRESH_INTERVAL = 5.0  # Seconds between repeats of an unchanged state (a reset board catches up)
+
+# Database writer configuration
+WRITE_BATCH_SIZE = 200       # Flush once this many samples are queued...
+WRITE_FLUSH_INTERVAL = 1.0   # ...or once this many seconds have passed
+WRITE_QUEUE_SIZE = 10000     # Bounded queue between serial parsing and the writer
+WRITE_PUT_TIMEOUT = 0.1      # Seconds to wait on a full queue before dropping a sample
+
+# Instrumentation (off by default: the hot path then only checks one attribute)
+METRICS_ENABLED = False
+METRICS_PORT = 9108           # Prometheus scrape endpoint: http://127.0.0.1:9108/metrics
+METRICS_LOG_INTERVAL = 10.0   # Seconds between structured (JSON) metrics log lines
+
+# Live pattern recognition: active/stationary/mixed per 15 s window, computed
+# from the stored labels as they are queued (same rules as machine_learned_results)
+LIVE_PATTERNS = True
+
+# Adaptive storage: while the window meets the idle thresholds, a stationary
+# stretch is stored as one hold record (a real reading plus how many samples it
+# stands for) per heartbeat instead of a row every 100 ms; motion onset goes
+# straight back to full rate
+ADAPTIVE_STORAGE = True
+HOLD_MOTIONS = ('resting', 'idle')
+HOLD_HEARTBEAT_SECONDS = 15  # Must divide the analyzer's 15 s window so no hold spans two windows
+
+# Motion recognition parameters
+WINDOW_SIZE = 20  # Number of samples to consider for pattern recognition
+SAMPLING_RATE = 10  # Hz (matches Arduino's 100ms interval)
+THRESHOLD_TOLERANCE = 1e-9  # Running-sum features this close to a threshold are recomputed exactly
+
+# Step cadence (motion_cadence.py): a clear step rhythm in the last CADENCE_WINDOW
+# samples decides walking vs running, however hard the steps land; False keeps
+# the accel magnitude thresholds alone
+CADENCE_RULES = True
+
+# Trained classifier (python motion_model.py train); None keeps the hand-tuned thresholds.
+# Edge-mode boards don't send the spectral features, so they always use the thresholds.
+MOTION_MODEL_FILE = None  # e.g. 'motion_model.npz'
+
+# Column order used by the sample store and everything reading from it
+SAMPLE_COLUMNS = ('accel_x', 'accel_y', 'accel_z', 'gyro_x', 'gyro_y', 'gyro_z')
+
+class SampleRingBuffer:
+    """Preallocated columnar circular buffer of raw sensor samples."""
+    
+    def __init__(self, capacity=WINDOW_SIZE, columns=SAMPLE_COLUMNS, dtype=np.float32):
+        """Allocate one `dtype` column per axis up front."""
+        self.capacity = capacity
+        self.columns = columns
+        self.column_index = {name: i for i, name in enumerate(columns)}
+        
+        # Every sample is written twice (at i and i + capacity) so the latest
+        # window is always a single contiguous slice and never needs a copy
+        self.data = np.zeros((len(columns), 2 * capacity), dtype=dtype)
+        
+        # Next write position and number of valid samples
+        self.index = 0
+        self.count = 0
+    
+    def append(self, *values):
+        """Store one sample (one value per column), overwriting the oldest."""
+        i = self.index
+        self.data[:, i] = values
+        self.data[:, i + self.capacity] = values
+        
+        self.index = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+    
+    def __len__(self):
+        return self.count
+    
+    def window(self):
+        """Return a zero-copy (columns x samples) view, oldest sample first."""
+        if self.count < self.capacity:
+            return self.data[:, :self.count]
+        return self.data[:, self.index:self.index + self.capacity]
+    
+    def column(self, name):
+        """Return a zero-copy contiguous view of one column's window."""
+        return self.window()[self.column_index[name]]
+    
+    def clear(self):
+        """Forget all samples without releasing the storage."""
+        self.index = 0
+        self.count = 0
+
+class RollingFeatures:
+    """Constant-time rolling statistics over accel/gyro magnitudes."""
+    
+    def __init__(self, window_size=WINDOW_SIZE, shift=0.0, resync_interval=1000):
+        """Set up empty running sums for a window of `window_size` samples."""
+        self.window_size = window_size
+        
+        # Accel sums are kept relative to `shift` (the gravity baseline) so the
+        # sum-of-squares variance doesn't cancel catastrophically around 9.8
+        self.shift = shift
+        
+        # Recompute the sums from scratch every N samples to bound float drift
+        self.resync_interval = resync_interval
+        
+        # Magnitudes currently inside the window (oldest first)
+        self.accel_magnitudes = deque()
+        self.gyro_magnitudes = deque()
+        
+        # Running totals
+        self.accel_sum = 0.0
+        self.accel_sq_sum = 0.0
+        self.gyro_sum = 0.0
+        self.change_sum = 0.0
+        
+        # Monotonic (index, value) deque - the front is always the window max
+        self.max_candidates = deque()
+        self.samples_seen = 0
+        
+        # Samples in the window with a NaN/inf magnitude: they are kept out of
+        # the sums (which could never subtract them again) and, while any is
+        # in the window, features() falls back to exact_features()
+        self.nonfinite = 0
+    
+    def push(self, accel_mag, gyro_mag):
+        """Slide the window forward by one sample."""
+        if len(self.accel_magnitudes) == self.window_size:
+            # Evict the oldest sample and the change it contributed
+            old_accel = self.accel_magnitudes.popleft()
+            old_gyro = self.gyro_magnitudes.popleft()
+            if math.isfinite(old_accel) and math.isfinite(old_gyro):
+                old_shifted = old_accel - self.shift
+                self.accel_sum -= old_shifted
+                self.accel_sq_sum -= old_shifted * old_shifted
+                self.gyro_sum -= old_gyro
+            else:
+                self.nonfinite -= 1
+            if self.accel_magnitudes:
+                change = abs(self.accel_magnitudes[0] - old_accel)
+                if math.isfinite(change):
+                    self.change_sum -= change
+        
+        if self.accel_magnitudes:
+            change = abs(accel_mag - self.accel_magnitudes[-1])
+            if math.isfinite(change):
+                self.change_sum += change
+        
+        self.accel_magnitudes.append(accel_mag)
+        self.gyro_magnitudes.append(gyro_mag)
+        finite = math.isfinite(accel_mag)
+        if finite and math.isfinite(gyro_mag):
+            shifted = accel_mag - self.shift
+            self.accel_sum += shifted
+            self.accel_sq_sum += shifted * shifted
+            self.gyro_sum += gyro_mag
+        else:
+            self.nonfinite += 1
+        
+        # Maintain the max deque: drop smaller values and expired indices
+        index = self.samples_seen
+        if finite:
+            while self.max_candidates and self.max_candidates[-1][1] <= accel_mag:
+                self.max_candidates.pop()
+            self.max_candidates.append((index, accel_mag))
+        if self.max_candidates and self.max_candidates[0][0] <= index - self.window_size:
+            self.max_candidates.popleft()
+        
+        self.samples_seen += 1
+        if self.samples_seen % self.resync_interval == 0:
+            self.resync()
+    
+    def resync(self):
+        """Recompute the running sums exactly from the window contents."""
+        finite = [(a, g) for a, g in zip(self.accel_magnitudes, self.gyro_magnitudes)
+                  if math.isfinite(a) and math.isfinite(g)]
+        shifted = [a - self.shift for a, g in finite]
+        self.accel_sum = math.fsum(shifted)
+        self.accel_sq_sum = math.fsum(a * a for a in shifted)
+        self.gyro_sum = math.fsum(g for a, g in finite)
+        accel = self.accel_magnitudes
+        changes = (abs(accel[i] - accel[i-1]) for i in range(1, len(accel)))
+        self.change_sum = math.fsum(change for change in changes if math.isfinite(change))
+    
+    def __len__(self):
+        return len(self.accel_magnitudes)
+    
+    def features(self):
+        """Return (accel_mean, accel_std, accel_max, gyro_mean, mean_accel_change)."""
+        n = len(self.accel_magnitudes)
+        if n == 0:
+            return 0.0, 0.0, 0.0, 0.0, 0.0
+        if self.nonfinite:
+            return self.exact_features()
+        
+        shifted_mean = self.accel_sum / n
+        variance = max(self.accel_sq_sum / n - shifted_mean * shifted_mean, 0.0)
+        mean_accel_change = self.change_sum / (n - 1) if n > 1 else 0
+        
+        return (self.shift + shifted_mean, math.sqrt(variance), self.max_candidates[0][1],
+                self.gyro_sum / n, mean_accel_change)
+    
+    def exact_features(self):
+        """features() recomputed from the window with NumPy, as the per-sample recognizer did."""
+        accel = list(self.accel_magnitudes)
+        if not accel:
+            return 0.0, 0.0, 0.0, 0.0, 0.0
+        changes = [abs(accel[i] - accel[i-1]) for i in range(1, len(accel))]
+        with np.errstate(invalid='ignore'):
+            return (float(np.mean(accel)), float(np.std(accel)), float(np.max(accel)),
+                    float(np.mean(list(self.gyro_magnitudes))), float(np.mean(changes)) if changes else 0)
+
+class SimpleMotionRecognizer:
+    """Simplified motion recognizer focusing on idle, walking, and running."""
+    
+    def __init__(self, classifier=None):
+        """Initialize with calibrated thresholds for the reliable motion types (or a trained classifier)."""
+        # Baseline values for your specific sensor
+        self.baseline_accel = 9.82  # Your sensor's gravity baseline
+        
+        # Idle thresholds - keeping these exact since they work perfectly
+        self.idle_accel_range = 0.05  # Maximum deviation from baseline to be considered idle
+        self.idle_std_max = 0.03     # Maximum standard deviation for idle
+        self.idle_gyro_max = 0.05    # Maximum gyro reading for idle
+        
+        # Movement thresholds - these work well according to feedback
+        self.walk_threshold_min = 10.3  # Minimum for walking
+        self.walk_threshold_max = 14.0  # Maximum for walking
+        self.run_threshold = 14.0       # Above this is running
+        
+        # Cadence thresholds: only a strong rhythm inside the gait range is trusted
+        self.cadence_min_strength = 0.6  # Share of the spectrum at the step frequency
+        self.cadence_min_std = 1.0       # Accel std below this isn't stepping
+        self.gait_min_hz = 1.0
+        self.gait_max_hz = 4.0
+        self.run_cadence_hz = 2.3        # Steps at this rate and above are running
+        
+        # Buffer for recent samples (columnar ring, no per-sample allocation)
+        self.buffer = SampleRingBuffer(WINDOW_SIZE)
+        
+        # Incremental window statistics (updated once per sample in add_sample)
+        self.rolling = RollingFeatures(WINDOW_SIZE, shift=self.baseline_accel)
+        
+        # Sliding spectrum of the accel magnitude (same resync points as the rolling sums)
+        self.cadence = SlidingSpectrum(CADENCE_WINDOW, resync_interval=self.rolling.resync_interval) if CADENCE_RULES else None
+        
+        # Features behind the latest decision (exported as gauges by the metrics layer);
+        # cadence features are only computed when a decision needs them
+        self.last_features = None
+        self.last_cadence = None
+        
+        # Optional motion_model.MotionClassifier that replaces the thresholds below
+        if classifier is not None and classifier.window_size != WINDOW_SIZE:
+            raise ValueError(f"Classifier window is {classifier.window_size} samples, the buffer holds {WINDOW_SIZE}")
+        self.classifier = classifier
+    
+    def add_sample(self, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z):
+        """Add a new motion sample to the buffer."""
+        self.buffer.append(accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z)
+        
+        # Magnitudes are computed once here instead of on every recognize call
+        accel_mag = math.sqrt(accel_x**2 + accel_y**2 + accel_z**2)
+        gyro_mag = math.sqrt(gyro_x**2 + gyro_y**2 + gyro_z**2)
+        self.rolling.push(accel_mag, gyro_mag)
+        if self.cadence is not None:
+            self.cadence.push(accel_mag)
+    
+    def recognize_pattern(self):
+        """Analyze buffer and determine the motion state."""
+        if len(self.buffer) < WINDOW_SIZE // 2:
+            return "collecting_data"  # Not enough data yet
+            
+        # Statistical features (maintained incrementally by RollingFeatures)
+        self.last_features = self.settled_features(self.rolling)
+        if self.classifier is not None:
+            # The model needs a full window of raw samples
+            if len(self.buffer) < WINDOW_SIZE:
+                return "collecting_data"
+            return self.classifier.classify_window(self.buffer.window().T)
+        
+        accel_mean, accel_std, accel_max, gyro_mean, mean_accel_change = self.last_features
+        return self.classify_features(accel_mean, accel_std, gyro_mean, self.cadence)
+    
+    def settled_features(self, rolling):
+        """rolling.features(), recomputed exactly where float noise in the sums could flip a threshold."""
+        features = rolling.features()
+        accel_mean, accel_std, accel_max, gyro_mean, mean_accel_change = features
+        tol = THRESHOLD_TOLERANCE
+        if (abs(abs(accel_mean - self.baseline_accel) - self.idle_accel_range) <= tol or
+                abs(accel_std - self.idle_std_max) <= tol or
+                abs(gyro_mean - self.idle_gyro_max) <= tol or
+                abs(accel_mean - self.run_threshold) <= tol or
+                abs(accel_mean - self.walk_threshold_min) <= tol or
+                abs(accel_mean - self.walk_threshold_max) <= tol or
+                abs(accel_std - self.cadence_min_std) <= tol):
+            # Same values the per-sample NumPy recognizer computed, so ties break the same way
+            return rolling.exact_features()
+        return features
+    
+    def recognize_features(self, features, window_count, window_size):
+        """Decide the motion from window statistics computed elsewhere (an edge-mode board)."""
+        if window_count < window_size // 2:
+            return "collecting_data"  # The board's window isn't half full yet
+        
+        self.last_features = features
+        accel_mean, accel_std, accel_max, gyro_mean, mean_accel_change = features
+        return self.classify_features(accel_mean, accel_std, gyro_mean)
+    
+    def is_still(self, accel_mean, accel_std, gyro_mean):
+        """Whether a window meets the idle thresholds (no motion at all)."""
+        return (abs(accel_mean - self.baseline_accel) < self.idle_accel_range and
+                accel_std < self.idle_std_max and
+                gyro_mean < self.idle_gyro_max)
+    
+    def classify_features(self, accel_mean, accel_std, gyro_mean, spectrum=None):
+        """Apply the motion thresholds to one window's features (and cadence, given a SlidingSpectrum)."""
+        # ----- MOTION DETECTION LOGIC -----
+        
+        # FIRST CHECK: Is it idle? (very specific criteria that worked well)
+        if self.is_still(accel_mean, accel_std, gyro_mean):
+            return "resting"
+        
+        # A clear step rhythm separates walking from running better than how
+        # hard the steps land (which depends on the person and the mounting)
+        if spectrum is not None and accel_std >= self.cadence_min_std:
+            cadence = spectrum.features()
+            if cadence is not None:
+                self.last_cadence = cadence
+                cadence_hz, strength = cadence[0], cadence[1]
+                if strength >= self.cadence_min_strength and self.gait_min_hz <= cadence_hz <= self.gait_max_hz:
+                    return "running" if cadence_hz >= self.run_cadence_hz else "walking"
+        
+        # Detect running (high consistent acceleration)
+        if accel_mean > self.run_threshold:
+            return "running"
+            
+        # Detect walking (moderate consistent acceleration)
+        if self.walk_threshold_min < accel_mean < self.walk_threshold_max:
+            return "walking"
+            
+        # Any other motion that's not idle, walking, or running is "moving"
+        return "idle"
+
+# Label codes used by the batch classifier (index into this tuple)
+MOTION_CODES = ('collecting_data', 'resting', 'running', 'walking', 'idle')
+BATCH_CHUNK_SIZE = 1000000   # Samples per vectorized pass (bounds temporary memory)
+BATCH_TOLERANCE = 1e-7       # Features this close to a threshold are recomputed exactly
+
+def encode_state_frame(motion, pattern=None):
+    """Build one downlink frame carrying the debounced motion and the current pattern."""
+    pattern_code = DOWNLINK_PATTERNS.index(pattern if pattern in DOWNLINK_PATTERNS else 'unknown') if pattern else 0
+    body = bytes((FRAME_TYPE_STATE, MOTION_CODES.index(motion), pattern_code))
+    return FRAME_SYNC + body + binascii.crc_hqx(body, FRAME_CRC_INIT).to_bytes(2, 'little')
+
+def debounce_motion_codes(detected, current, count):
+    """Run the live +/-3 debounce over detected codes; returns (motions, current, count)."""
+    # Plain loop over ints: the state machine is sequential, and this is the
+    # form a JIT (or a C port) would take unchanged
+    motions = [0] * len(detected)
+    for i, code in enumerate(detected):
+        if code == current:
+            count += 1
+        else:
+            count -= 1
+        if count >= 3:
+            count = 3
+        elif count <= -3:
+            current = code
+            count = 0
+        motions[i] = current
+    return motions, current, count
+
+class BatchMotionClassifier:
+    """Vectorized SimpleMotionRecognizer plus DeviceSession debounce for whole sample arrays.
+    
+    Feed one device's samples in order (any block size); labels match what the
+    live path would have stored, with 'collecting_data' for rows it wouldn't store.
+    """
+    
+    def __init__(self, recognizer=None, initial_motion="idle", tolerance=BATCH_TOLERANCE):
+        # Thresholds (and the exact fallback) come from a regular recognizer
+        self.recognizer = recognizer or SimpleMotionRecognizer()
+        self.window_size = WINDOW_SIZE
+        self.tolerance = tolerance
+        
+        # Debounce state, as in DeviceSession
+        self.current_code = MOTION_CODES.index(initial_motion)
+        self.motion_count = 0
+        
+        # Magnitudes of recent samples: enough for the next window (and cadence
+        # window) and for an exact RollingFeatures replay from its last resync point
+        self.resync_interval = self.recognizer.rolling.resync_interval
+        spectrum = self.recognizer.cadence
+        self.lookback = max(self.window_size, spectrum.window_size if spectrum is not None else 0)
+        self.history = np.empty((0, 2))
+        self.samples_seen = 0
+        
+        # Trained classifier: its classes as MOTION_CODES, and the raw tail of the last block
+        classifier = self.recognizer.classifier
+        if classifier is not None:
+            unknown = [label for label in classifier.classes if label not in MOTION_CODES]
+            if unknown:
+                raise ValueError(f"Classifier labels {unknown} are not motion labels ({', '.join(MOTION_CODES)})")
+            self.class_codes = np.array([MOTION_CODES.index(label) for label in classifier.classes], dtype=np.int8)
+            self.raw_tail = np.empty((0, 6))
+    
+    def classify(self, values):
+        """Return debounced labels (object array) for an (n, 6+) block of ax ay az gx gy gz."""
+        values = np.asarray(values, dtype=np.float64)
+        detected = np.concatenate([self.detect(values[start:start + BATCH_CHUNK_SIZE])
+                                   for start in range(0, len(values), BATCH_CHUNK_SIZE)] or [np.empty(0, np.int8)])
+        motions, self.current_code, self.motion_count = debounce_motion_codes(
+            detected.tolist(), self.current_code, self.motion_count)
+        return np.array(MOTION_CODES, dtype=object)[np.array(motions, dtype=np.int8)]
+    
+    def detect(self, values):
+        """Return recognize_pattern() codes (before debouncing) for the next block of samples."""
+        if self.recognizer.classifier is not None:
+            return self.detect_classifier(values)
+        recognizer = self.recognizer
+        window = self.window_size
+        shift = recognizer.baseline_accel
+        
+        # Same arithmetic as add_sample (x*x == x**2 for floats)
+        accel = np.sqrt(values[:, 0] * values[:, 0] + values[:, 1] * values[:, 1] + values[:, 2] * values[:, 2])
+        gyro = np.sqrt(values[:, 3] * values[:, 3] + values[:, 4] * values[:, 4] + values[:, 5] * values[:, 5])
+        first = self.samples_seen
+        
+        # Window sums via a strided (n, window) view; the tail of the previous
+        # block, or zero padding at the very start, fills the first windows
+        tail = self.history[-(window - 1):] if window > 1 else self.history[:0]
+        padding = window - 1 - len(tail)
+        shifted = np.concatenate([np.zeros(padding), tail[:, 0] - shift, accel - shift])
+        gyro_ext = np.concatenate([np.zeros(padding), tail[:, 1], gyro])
+        
+        windows = np.lib.stride_tricks.sliding_window_view(shifted, window)
+        accel_sum = windows.sum(axis=1)
+        accel_sq_sum = (windows * windows).sum(axis=1)
+        gyro_sum = np.lib.stride_tricks.sliding_window_view(gyro_ext, window).sum(axis=1)
+        
+        n = np.minimum(np.arange(first + 1, first + len(values) + 1), window)
+        shifted_mean = accel_sum / n
+        accel_std = np.sqrt(np.maximum(accel_sq_sum / n - shifted_mean * shifted_mean, 0.0))
+        accel_mean = shift + shifted_mean
+        gyro_mean = gyro_sum / n
+        
+        # Step cadence (NaN until the cadence window is full), with the same
+        # stream phases as the live SlidingSpectrum
+        cadence_hz = np.full(len(values), np.nan)
+        strength = np.full(len(values), np.nan)
+        spectrum = recognizer.cadence
+        if spectrum is not None:
+            cadence_tail = self.history[len(self.history) - (spectrum.window_size - 1):, 0]
+            cadence = sliding_cadence_features(np.concatenate([cadence_tail, accel]), first - len(cadence_tail),
+                                               spectrum.window_size, spectrum.sampling_rate)
+            cadence_hz[len(values) - len(cadence):] = cadence[:, 0]
+            strength[len(values) - len(cadence):] = cadence[:, 1]
+        stepping = ((accel_std >= recognizer.cadence_min_std) & (strength >= recognizer.cadence_min_strength) &
+                    (cadence_hz >= recognizer.gait_min_hz) & (cadence_hz <= recognizer.gait_max_hz))
+        
+        # Same rule order as classify_features
+        resting = ((np.abs(accel_mean - shift) < recognizer.idle_accel_range) &
+                   (accel_std < recognizer.idle_std_max) &
+                   (gyro_mean < recognizer.idle_gyro_max))
+        running = accel_mean > recognizer.run_threshold
+        walking = (accel_mean > recognizer.walk_threshold_min) & (accel_mean < recognizer.walk_threshold_max)
+        detected = np.select([n < window // 2, resting, stepping & (cadence_hz >= recognizer.run_cadence_hz), stepping,
+                              running, walking], [0, 1, 2, 3, 2, 3], default=4).astype(np.int8)
+        
+        # Features within float noise of a threshold: recompute with the live
+        # incremental arithmetic so ties break exactly as they do online
+        tol = self.tolerance
+        near = ((np.abs(np.abs(accel_mean - shift) - recognizer.idle_accel_range) <= tol) |
+                (np.abs(accel_std - recognizer.idle_std_max) <= tol) |
+                (np.abs(gyro_mean - recognizer.idle_gyro_max) <= tol) |
+                (np.abs(accel_mean - recognizer.run_threshold) <= tol) |
+                (np.abs(accel_mean - recognizer.walk_threshold_min) <= tol) |
+                (np.abs(accel_mean - recognizer.walk_threshold_max) <= tol) |
+                (np.abs(accel_std - recognizer.cadence_min_std) <= tol) |
+                (np.abs(strength - recognizer.cadence_min_strength) <= tol) |
+                (np.abs(cadence_hz - recognizer.gait_min_hz) <= tol) |
+                (np.abs(cadence_hz - recognizer.gait_max_hz) <= tol) |
+                (np.abs(cadence_hz - recognizer.run_cadence_hz) <= tol)) & (n >= window // 2)
+        
+        history_first = first - len(self.history)
+        self.history = np.concatenate([self.history, np.column_stack([accel, gyro])])
+        exact = self.exact_detect([first + index for index in np.flatnonzero(near).tolist()], history_first)
+        for sample_index, motion in exact.items():
+            detected[sample_index - first] = MOTION_CODES.index(motion)
+        
+        self.samples_seen += len(values)
+        self.history = self.history[-(self.resync_interval + self.lookback):]
+        return detected
+    
+    def detect_classifier(self, values):
+        """detect() for a trained classifier: the same window features as the live path, in bulk."""
+        classifier = self.recognizer.classifier
+        block = np.concatenate([self.raw_tail, values[:, :6]])
+        self.raw_tail = block[-(WINDOW_SIZE - 1):]
+        self.samples_seen += len(values)
+        
+        # Samples before the first full window are still collecting data
+        detected = np.zeros(len(values), dtype=np.int8)
+        predicted = classifier.predict(window_features(block, WINDOW_SIZE))
+        if len(predicted):
+            detected[len(values) - len(predicted):] = self.class_codes[predicted]
+        return detected
+    
+    def exact_detect(self, sample_indices, history_first):
+        """Recompute decisions by replaying RollingFeatures from each sample's last resync point."""
+        window = self.window_size
+        decisions = {}
+        rolling = None
+        spectrum = None
+        
+        for sample_index in sample_indices:
+            # State after a resync depends only on the window, so one replay
+            # serves every flagged sample up to the next resync
+            resynced_at = (sample_index + 1) // self.resync_interval * self.resync_interval
+            if rolling is None or resynced_at != segment:
+                segment = resynced_at
+                rolling = RollingFeatures(window, shift=self.recognizer.baseline_accel,
+                                          resync_interval=self.resync_interval)
+                rolling.samples_seen = position = max(resynced_at - self.lookback, 0)
+                if self.recognizer.cadence is not None:
+                    spectrum = SlidingSpectrum(self.recognizer.cadence.window_size, self.recognizer.cadence.sampling_rate,
+                                               self.resync_interval)
+                    spectrum.samples_seen = position
+            
+            for accel_mag, gyro_mag in self.history[position - history_first:sample_index + 1 - history_first].tolist():
+                rolling.push(accel_mag, gyro_mag)
+                if spectrum is not None:
+                    spectrum.push(accel_mag)
+            position = sample_index + 1
+            
+            accel_mean, accel_std, accel_max, gyro_mean, mean_accel_change = self.recognizer.settled_features(rolling)
+            decisions[sample_index] = self.recognizer.classify_features(accel_mean, accel_std, gyro_mean, spectrum)
+        return decisions
+
+class FrameDecoder:
+    """Bulk decoder for binary sample frames with resync on corruption."""
+    
+    def __init__(self):
+        # Bytes carried over between reads (partial frame or unsynced tail)
+        self.buffer = b''
+        
+        self.sync_word = int.from_bytes(FRAME_SYNC, 'little')
+        
+        # Link quality counters
+        self.stats = {
+            'frames': 0,
+            'crc_errors': 0,
+            'resyncs': 0,
+            'bytes_skipped': 0
+        }
+    
+    def decode(self, data):
+        """Feed raw bytes; return a structured array of every valid frame."""
+        buffer = self.buffer + data
+        decoded = []
+        pos = 0
+        
+        while len(buffer) - pos >= FRAME_SIZE:
+            # Optimistically view everything from pos as back-to-back frames
+            count = (len(buffer) - pos) // FRAME_SIZE
+            block = np.frombuffer(buffer, FRAME_DTYPE, count=count, offset=pos)
+            
+            # Length of the leading run with a valid header...
+            bad = np.flatnonzero((block['sync'] != self.sync_word) | ~np.isin(block['type'], FRAME_TYPES))
+            good = int(bad[0]) if bad.size else count
+            
+            # ...and of the part of that run that also passes its CRC
+            crcs = block['crc'][:good].tolist()
+            valid = 0
+            while valid < good:
+                start = pos + valid * FRAME_SIZE
+                if binascii.crc_hqx(buffer[start + 2:start + FRAME_SIZE - 2], FRAME_CRC_INIT) != crcs[valid]:
+                    self.stats['crc_errors'] += 1
+                    break
+                valid += 1
+            
+            if valid:
+                decoded.append(block[:valid])
+                pos += valid * FRAME_SIZE
+            if valid == count:
+                break
+            
+            # Corruption or misalignment: skip to the next sync word
+            next_sync = buffer.find(FRAME_SYNC, pos + 1)
+            self.stats['resyncs'] += 1
+            if next_sync < 0:
+                # Keep a trailing byte in case it's the start of a sync word
+                next_sync = len(buffer) - 1
+            self.stats['bytes_skipped'] += next_sync - pos
+            pos = next_sync
+        
+        self.buffer = buffer[pos:]
+        
+        if not decoded:
+            return np.empty(0, dtype=FRAME_DTYPE)
+        frames = decoded[0] if len(decoded) == 1 else np.concatenate(decoded)
+        self.stats['frames'] += len(frames)
+        return frames
+
+class BatchedSampleWriter:
+    """Background stage that drains a bounded queue into the storage backend in batches."""
+    
+    def __init__(self, storage, batch_size=WRITE_BATCH_SIZE,
+                 flush_interval=WRITE_FLUSH_INTERVAL, queue_size=WRITE_QUEUE_SIZE,
+                 put_timeout=WRITE_PUT_TIMEOUT, metrics=None):
+        """Configure the writer over a connected storage backend; call start() to begin flushing."""
+        self.storage = storage
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        
+        # Samples waiting to be written (timestamp, label, 6 axes, sequence_id, hold_count, hold_until)
+        self.queue = queue.Queue(maxsize=queue_size)
+        
+        # Backpressure / throughput metrics
+        self.stats = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,          # queue stayed full for put_timeout
+            'blocked_puts': 0,     # producer had to wait for queue space
+            'failed_rows': 0,      # rows lost to a failed flush
+            'flushes': 0,
+            'max_queue_depth': 0,
+            'last_flush_seconds': 0.0
+        }
+        
+        # Flush latency histogram; the counters above are exported at scrape time
+        self.write_seconds = None
+        if metrics is not None and metrics.enabled:
+            self.write_seconds = metrics.histogram('motion_db_write_seconds', 'Duration of one batch write (rows plus rollups)')
+            metrics.add_collector(self.collect_metrics)
+        
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="sensor-db-writer", daemon=True)
+    
+    def start(self):
+        """Start the flush thread."""
+        self.thread.start()
+    
+    def put(self, row):
+        """Queue one sample row; returns False if it had to be dropped."""
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            self.stats['blocked_puts'] += 1
+            try:
+                self.queue.put(row, timeout=self.put_timeout)
+            except queue.Full:
+                self.stats['dropped'] += 1
+                return False
+        
+        self.stats['enqueued'] += 1
+        depth = self.queue.qsize()
+        if depth > self.stats['max_queue_depth']:
+            self.stats['max_queue_depth'] = depth
+        return True
+    
+    def _run(self):
+        """Collect rows until the size or time threshold is hit, then flush."""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        
+        while not (self.stop_event.is_set() and self.queue.empty()):
+            try:
+                batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0.001)))
+                # Drain whatever else is already waiting without blocking
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                if batch:
+                    self._flush(batch)
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval
+        
+        # Final flush on shutdown
+        if batch:
+            self._flush(batch)
+    
+    def _flush(self, batch):
+        """Write one batch (raw rows plus rollups) in a single transaction."""
+        started = time.perf_counter()
+        try:
+            # The backend writes raw rows and rollups atomically (rolled back on error)
+            self.storage.write_samples(batch)
+            self.stats['written'] += len(batch)
+        except STORAGE_ERRORS as e:
+            self.stats['failed_rows'] += len(batch)
+            print(f"Database error while writing {len(batch)} samples: {e}")
+        except Exception as e:
+            # Never let a bad row kill the writer thread
+            self.stats['failed_rows'] += len(batch)
+            print(f"Unexpected error while writing {len(batch)} samples: {e}")
+        
+        self.stats['flushes'] += 1
+        self.stats['last_flush_seconds'] = time.perf_counter() - started
+        if self.write_seconds is not None:
+            self.write_seconds.observe(self.stats['last_flush_seconds'])
+    
+    def collect_metrics(self):
+        """Queue depth and writer counters for the metrics registry."""
+        yield ('motion_write_queue_depth', 'gauge', 'Samples waiting for the database writer', {}, self.queue.qsize())
+        yield ('motion_write_queue_max_depth', 'gauge', 'Deepest the writer queue has been', {}, self.stats['max_queue_depth'])
+        for key, help_text in (('enqueued', 'Samples queued for writing'),
+                               ('written', 'Samples committed to storage'),
+                               ('dropped', 'Samples dropped because the writer queue stayed full'),
+                               ('blocked_puts', 'Enqueues that had to wait for queue space'),
+                               ('failed_rows', 'Samples lost to failed batch writes'),
+                               ('flushes', 'Batch writes attempted')):
+            yield (f'motion_write_{key}_total', 'counter', help_text, {}, self.stats[key])
+    
+    def close(self):
+        """Flush everything still queued, stop the thread and close the store."""
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        
+        self.storage.close()
+        print("Database connection closed.")
+    
+    def summary(self):
+        """Return a one-line summary of the writer metrics."""
+        return ("Writer stats: " +
+                ", ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                          for key, value in self.stats.items()))
+
+def _raise_keyboard_interrupt(signum, frame):
+    """Turn SIGTERM into the same clean shutdown path as Ctrl+C."""
+    raise KeyboardInterrupt
+
+class DeviceSession:
+    """One sensor board: its source, recognizer, debounce state and sequence ID."""
+    
+    def __init__(self, port, writer, sequence_id, baud_rate=BAUD_RATE, protocol=SERIAL_PROTOCOL, metrics=None,
+                 pattern_recognizer=None, downlink=DOWNLINK_ENABLED, adaptive=ADAPTIVE_STORAGE, classifier=None):
+        """Prepare the session; call open() before reading."""
+        self.port = port
+        self.writer = writer
+        self.sequence_id = sequence_id
+        self.baud_rate = baud_rate
+        
+        # Wire format: 'auto' reads CSV until the first binary sync word appears
+        self.protocol = protocol
+        self.decoder = FrameDecoder()
+        
+        # Each device gets its own recognizer and debounce state (a trained classifier is shared)
+        self.recognizer = SimpleMotionRecognizer(classifier)
+        self.current_motion = "idle"
+        self.motion_count = 0
+        
+        # Set by the first feature frame: the board does the windowing from then on
+        # and raw frames are only stored
+        self.edge = False
+        
+        # Online segment analysis of the labels this session stores (optional)
+        self.segments = OnlineSegmentAggregator(pattern_recognizer) if pattern_recognizer is not None else None
+        self.current_pattern = None
+        self.last_segment = None
+        
+        # Adaptive storage: the open hold record (first row, samples, last timestamp, heartbeat)
+        self.adaptive = adaptive
+        self.hold = None
+        self.heartbeat = timedelta(seconds=HOLD_HEARTBEAT_SECONDS)
+        
+        # State frames for the board's display; only real (or pty) ports are written to
+        self.downlink = downlink
+        self.downlink_enabled = False
+        self.downlink_out = b''  # Frame bytes the OS hasn't accepted yet
+        self.last_state_sent = 0.0
+        
+        # Bytes received after the last complete line
+        self.pending = b''
+        
+        # Link / parser counters (always kept; exported by IngestHub.collect_metrics)
+        self.stats = {'bytes_read': 0, 'samples': 0, 'feature_frames': 0, 'parse_errors': 0, 'motion_changes': 0,
+                      'segments': 0, 'downlink_frames': 0, 'hold_records': 0, 'held_samples': 0}
+        
+        # Per-stage latency histograms, only while metrics are enabled
+        self.timed = metrics is not None and metrics.enabled
+        if self.timed:
+            self.read_seconds = metrics.histogram('motion_serial_read_seconds', 'Duration of one serial read() call', device=port)
+            self.parse_seconds = metrics.histogram('motion_parse_seconds', 'Time to parse one CSV line or decode one read of binary frames', device=port)
+            self.recognize_seconds = metrics.histogram('motion_recognize_seconds', 'add_sample plus recognize_pattern duration', device=port)
+            self.debounce_seconds = metrics.histogram('motion_debounce_seconds', 'Debounce and writer enqueue duration', device=port)
+            self.input_buffer = metrics.gauge('motion_serial_input_buffer_bytes', 'Bytes left in the OS serial buffer after a read', device=port)
+        
+        self.source = None
+        self.is_file = False
+        self.closed = False
+    
+    def open(self):
+        """Open the serial port, or a recorded file / pty standing in for one."""
+        if os.path.isfile(self.port) or (os.path.exists(self.port) and stat.S_ISFIFO(os.stat(self.port).st_mode)):
+            # Recorded stream or named pipe stand-in: read until it hits end-of-stream
+            self.source = open(self.port, 'rb', buffering=0)
+            self.is_file = True
+        else:
+            # timeout=0 makes read() return immediately with whatever is buffered,
+            # write_timeout=0 makes write() take only what the OS buffer has room for
+            self.source = serial.Serial(self.port, self.baud_rate, timeout=0, write_timeout=0)
+            self.downlink_enabled = self.downlink
+        print(f"Connected to {self.port} at {self.baud_rate} baud")
+    
+    def read_available(self):
+        """Read whatever bytes are ready and process every complete sample."""
+        if self.timed:
+            started = time.perf_counter()
+        try:
+            data = self.source.read(READ_CHUNK_SIZE)
+            if self.timed:
+                self.read_seconds.observe(time.perf_counter() - started)
+                if not self.is_file:
+                    # Input backlog: a growing value means the loop is falling behind
+                    self.input_buffer.set(self.source.in_waiting)
+        except serial.SerialException as e:
+            print(f"Serial port error on {self.port}: {e}")
+            self.close()
+            return
+        
+        if not data:
+            # An empty read only means end-of-stream for file stand-ins
+            if self.is_file:
+                self.close()
+            return
+        self.stats['bytes_read'] += len(data)
+        
+        if self.protocol == 'auto':
+            data = self.detect_protocol(data)
+        
+        if self.protocol == 'binary':
+            if self.timed:
+                started = time.perf_counter()
+                frames = self.decoder.decode(data)
+                self.parse_seconds.observe(time.perf_counter() - started)
+            else:
+                frames = self.decoder.decode(data)
+            self.handle_frames(frames)
+            return
+        
+        lines = (self.pending + data).split(b'\n')
+        self.pending = lines.pop()
+        for raw_line in lines:
+            self.handle_line(raw_line)
+    
+    def detect_protocol(self, data):
+        """Switch to binary once a sync word shows up; return the CSV part."""
+        data = self.pending + data
+        self.pending = b''
+        sync_at = data.find(FRAME_SYNC)
+        if sync_at < 0:
+            return data
+        
+        # Text before the first frame (boot messages) still goes to the CSV parser
+        for raw_line in data[:sync_at].split(b'\n'):
+            self.handle_line(raw_line)
+        self.protocol = 'binary'
+        return data[sync_at:]
+    
+    def handle_frames(self, frames):
+        """Run every decoded binary frame through recognition and storage."""
+        # One bulk float32 -> float conversion for the whole read
+        values = frames['values'].tolist()
+        if not self.edge and not (frames['type'] == FRAME_TYPE_FEATURES).any():
+            for accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z, temperature in values:
+                self.handle_sample(accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z)
+            return
+        
+        # Edge mode: raw and feature frames interleaved, handled in arrival order
+        for frame_type, frame_values in zip(frames['type'].tolist(), values):
+            if frame_type == FRAME_TYPE_FEATURES:
+                self.handle_features(frame_values)
+            else:
+                self.handle_sample(*frame_values[:6])
+    
+    def handle_features(self, frame_values):
+        """Recognize and debounce one feature frame from an edge-mode board."""
+        self.stats['feature_frames'] += 1
+        self.edge = True
+        if self.timed:
+            started = time.perf_counter()
+        
+        features = tuple(frame_values[:5])
+        detected_motion = self.recognizer.recognize_features(features, frame_values[5], frame_values[6])
+        if self.timed:
+            self.recognize_seconds.observe(time.perf_counter() - started)
+        self.debounce(detected_motion)
+    
+    def handle_line(self, raw_line):
+        """Parse one CSV line and run it through recognition and storage."""
+        line = raw_line
+        if self.timed:
+            started = time.perf_counter()
+        try:
+            line = raw_line.decode('utf-8').strip()
+            
+            # Parse CSV formatted data
+            parts = line.split(',')
+            if len(parts) == 8:  # Ensure we have all expected values
+                arduino_timestamp = int(parts[0])
+                accel_x = float(parts[1])
+                accel_y = float(parts[2])
+                accel_z = float(parts[3])
+                gyro_x = float(parts[4])
+                gyro_y = float(parts[5])
+                gyro_z = float(parts[6])
+                temperature = float(parts[7])
+                if self.timed:
+                    self.parse_seconds.observe(time.perf_counter() - started)
+                
+                self.handle_sample(accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z)
+                
+        except ValueError as e:
+            self.stats['parse_errors'] += 1
+            print(f"Error parsing data: {e} | Raw data: {line}")
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+    
+    def handle_sample(self, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z):
+        """Recognize, debounce and queue one parsed sample."""
+        self.stats['samples'] += 1
+        if self.edge:
+            # Feature frames drive recognition; raw frames are only stored
+            self.store_sample(accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z)
+            return
+        if self.timed:
+            started = time.perf_counter()
+        
+        # Add sample to motion recognizer
+        self.recognizer.add_sample(accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z)
+        
+        # Perform motion recognition
+        detected_motion = self.recognizer.recognize_pattern()
+        if self.timed:
+            recognized = time.perf_counter()
+            self.recognize_seconds.observe(recognized - started)
+        
+        self.debounce(detected_motion)
+        self.store_sample(accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z)
+        if self.timed:
+            self.debounce_seconds.observe(time.perf_counter() - recognized)
+    
+    def debounce(self, detected_motion):
+        """Fold one recognized motion into the debounced current_motion."""
+        # Light debouncing for stability
+        if detected_motion == self.current_motion:
+            self.motion_count += 1
+        else:
+            self.motion_count -= 1
+            
+        # Change motion with minimal debouncing
+        if self.motion_count >= 3:  # Need 3 consistent readings
+            self.motion_count = 3
+        elif self.motion_count <= -3:  # Need 3 consistent different readings to change
+            if self.current_motion != detected_motion and detected_motion != "collecting_data":
+                self.stats['motion_changes'] += 1
+                print(f"\n>>> {self.port} MOTION CHANGED: {self.current_motion.upper()} -> {detected_motion.upper()}")
+            changed = self.current_motion != detected_motion
+            self.current_motion = detected_motion
+            self.motion_count = 0
+            if changed and self.downlink_enabled:
+                self.send_state()
+    
+    def store_sample(self, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z):
+        """Queue one raw sample with the current motion label (or fold it into the open hold)."""
+        # Queue data with recognized motion label for the writer
+        # (the row is timestamped here since the writer inserts it later;
+        # whole seconds to match the DATETIME column the rollups are keyed on)
+        if self.current_motion != "collecting_data":
+            timestamp = datetime.now().replace(microsecond=0)
+            row = (
+                timestamp, self.current_motion,
+                accel_x, accel_y, accel_z,
+                gyro_x, gyro_y, gyro_z,
+                self.sequence_id
+            )
+            if self.adaptive and self.is_still():
+                self.hold_sample(timestamp, row)
+            else:
+                # Motion onset: end any hold and store at full rate
+                self.close_hold()
+                self.writer.put(row + (1, None))
+            
+            # The same row feeds the live segment; a finished window comes back
+            if self.segments is not None:
+                segment = self.segments.add(timestamp, self.current_motion)
+                if segment is not None:
+                    self.handle_segment(segment)
+    
+    def is_still(self):
+        """Whether the current motion may be held: a stationary label and a window within the idle thresholds."""
+        features = self.recognizer.last_features
+        return (self.current_motion in HOLD_MOTIONS and features is not None and
+                self.recognizer.is_still(features[0], features[1], features[3]))
+    
+    def hold_sample(self, timestamp, row):
+        """Count one stationary sample into the open hold, starting a new one per label and heartbeat."""
+        heartbeat = (timestamp - WINDOW_EPOCH) // self.heartbeat
+        if self.hold is not None and (self.hold['row'][1] != row[1] or self.hold['heartbeat'] != heartbeat):
+            self.close_hold()
+        if self.hold is None:
+            # The first sample's reading is the one stored
+            self.hold = {'row': row, 'count': 0, 'until': timestamp, 'heartbeat': heartbeat}
+        self.hold['count'] += 1
+        self.hold['until'] = timestamp
+    
+    def close_hold(self, now=None):
+        """Queue the open hold record (when now is given, only once its heartbeat has passed)."""
+        if self.hold is None or (now is not None and (now - WINDOW_EPOCH) // self.heartbeat == self.hold['heartbeat']):
+            return
+        hold, self.hold = self.hold, None
+        count = hold['count']
+        if count > 1:
+            self.writer.put(hold['row'] + (count, hold['until']))
+            self.stats['hold_records'] += 1
+            self.stats['held_samples'] += count
+        else:
+            self.writer.put(hold['row'] + (1, None))
+    
+    def handle_segment(self, segment):
+        """Report a finished window's pattern."""
+        self.stats['segments'] += 1
+        self.last_segment = segment
+        changed = self.current_pattern != segment['pattern']
+        self.current_pattern = segment['pattern']
+        if changed and self.downlink_enabled:
+            self.send_state()
+        print(f"\n>>> {self.port} PATTERN {segment['start_time']:%H:%M:%S}-{segment['end_time']:%H:%M:%S}: "
+              f"{segment['pattern'].upper()} ({segment['samples']} samples, {segment['transitions']} transitions)")
+    
+    def send_state(self):
+        """Queue the current motion and pattern for the board and write what the port takes."""
+        # An older frame nobody has started writing is stale; a half-written one must finish
+        keep = len(self.downlink_out) % STATE_FRAME_SIZE
+        self.downlink_out = self.downlink_out[:keep] + encode_state_frame(self.current_motion, self.current_pattern)
+        self.last_state_sent = time.monotonic()
+        self.stats['downlink_frames'] += 1
+        self.flush_downlink()
+    
+    def flush_downlink(self):
+        """Write pending downlink bytes without blocking the ingest loop."""
+        if not self.downlink_out or self.closed:
+            return
+        try:
+            fd = self.downlink_fd()
+            if fd is not None:
+                # Posix pyserial retries a full buffer in a loop, so ask select first
+                if not select.select([], [fd], [], 0)[1]:
+                    return
+            elif getattr(self.source, 'out_waiting', 0):
+                # Elsewhere write_timeout=0 queues without blocking; let the last write drain
+                return
+            written = self.source.write(self.downlink_out)
+            self.downlink_out = self.downlink_out[written or 0:]
+        except (serial.SerialException, OSError, ValueError) as e:
+            # The board keeps streaming without a display update; stop trying
+            print(f"Downlink error on {self.port}: {e}")
+            self.downlink_enabled = False
+            self.downlink_out = b''
+    
+    def downlink_fd(self):
+        """The source's descriptor if select() can check it for room (posix only), else None."""
+        if os.name != 'posix':
+            return None
+        try:
+            fd = self.source.fileno()
+        except (AttributeError, OSError, ValueError):
+            # io.UnsupportedOperation (no real descriptor) is both an OSError and a ValueError
+            return None
+        return fd if isinstance(fd, int) and fd >= 0 else None
+    
+    def refresh_downlink(self):
+        """Repeat the current state every DOWNLINK_REFRESH_INTERVAL; otherwise retry pending bytes."""
+        if not self.downlink_enabled or self.closed:
+            return
+        if time.monotonic() - self.last_state_sent >= DOWNLINK_REFRESH_INTERVAL:
+            self.send_state()
+        else:
+            self.flush_downlink()
+    
+    def close_window(self, now):
+        """Emit the open window's segment once the clock has passed its end."""
+        if self.segments is not None:
+            segment = self.segments.flush(now)
+            if segment is not None:
+                self.handle_segment(segment)
+    
+    def close(self):
+        """Close the underlying source."""
+        if not self.closed and self.source is not None:
+            self.source.close()
+        self.downlink_enabled = False
+        if not self.closed:
+            # The last (possibly partial) window, as the batch analysis would report it
+            self.close_window(None)
+            self.close_hold()
+        self.closed = True
+
+class IngestHub:
+    """Reads many devices from one thread using selector-based readiness."""
+    
+    def __init__(self, display_interval=0.5, metrics=None, log_interval=METRICS_LOG_INTERVAL):
+        self.selector = selectors.DefaultSelector()
+        self.devices = []
+        
+        # Sources the OS can't watch (Windows COM ports, regular files) are polled
+        self.polled = []
+        
+        self.display_interval = display_interval  # seconds
+        
+        # Structured metrics log lines (only while metrics are enabled)
+        self.metrics = metrics if metrics is not None and metrics.enabled else None
+        self.log_interval = log_interval  # seconds
+        if self.metrics is not None:
+            self.metrics.add_collector(self.collect_metrics)
+    
+    def add_device(self, device):
+        """Open a device and register it for readiness notifications."""
+        device.open()
+        self.devices.append(device)
+        try:
+            # Register the raw descriptor so it can be unregistered after close
+            self.selector.register(device.source.fileno(), selectors.EVENT_READ, device)
+        except (AttributeError, OSError, ValueError):
+            self.polled.append(device)
+    
+    def run(self):
+        """Dispatch ready devices until every source has closed."""
+        last_display_time = time.time()
+        last_log_time = last_display_time
+        
+        while any(not device.closed for device in self.devices):
+            # Block until a device has data; only spin briefly if some are polled
+            timeout = POLL_INTERVAL if self.polled else self.display_interval
+            if self.selector.get_map():
+                for key, _ in self.selector.select(timeout):
+                    key.data.read_available()
+            else:
+                # Only polled sources (e.g. Windows COM ports): select() with no
+                # descriptors is an error on Windows, so just wait out the interval
+                time.sleep(timeout)
+            for device in self.polled:
+                if not device.closed:
+                    device.read_available()
+            
+            # Drop closed devices from the selector
+            for key in list(self.selector.get_map().values()):
+                if key.data.closed:
+                    self.selector.unregister(key.fd)
+            self.polled = [device for device in self.polled if not device.closed]
+            
+            # Print current motion status (throttled by time)
+            current_time = time.time()
+            if current_time - last_display_time >= self.display_interval:
+                # Windows and holds of quiet devices close on the clock, not on their next sample
+                now = datetime.now()
+                for device in self.devices:
+                    device.close_window(now)
+                    device.close_hold(now)
+                    device.refresh_downlink()
+                    prefix = f"[{device.port}] " if len(self.devices) > 1 else ""
+                    pattern = f" (pattern: {device.current_pattern.upper()})" if device.current_pattern else ""
+                    print(f"{prefix}Current motion: {device.current_motion.upper()}{pattern}")
+                last_display_time = current_time
+            
+            if self.metrics is not None and current_time - last_log_time >= self.log_interval:
+                self.metrics.log_line()
+                last_log_time = current_time
+    
+    def collect_metrics(self):
+        """Per-device counters, link quality and latest features for the metrics registry."""
+        for device in self.devices:
+            labels = {'device': device.port}
+            for key, help_text in (('bytes_read', 'Bytes read from the device'),
+                                   ('samples', 'Samples parsed from the device'),
+                                   ('feature_frames', 'Feature frames from an edge-mode device'),
+                                   ('parse_errors', 'CSV lines that failed to parse'),
+                                   ('motion_changes', 'Debounced motion changes'),
+                                   ('segments', 'Live pattern segments emitted'),
+                                   ('hold_records', 'Hold records stored for stationary stretches'),
+                                   ('held_samples', 'Samples stored inside hold records instead of as rows'),
+                                   ('downlink_frames', 'State frames queued for the device')):
+                yield (f'motion_{key}_total', 'counter', help_text, labels, device.stats[key])
+            for key, help_text in (('crc_errors', 'Binary frames rejected by CRC'),
+                                   ('resyncs', 'Binary stream resynchronisations'),
+                                   ('bytes_skipped', 'Bytes skipped while resynchronising')):
+                yield (f'motion_frame_{key}_total', 'counter', help_text, labels, device.decoder.stats[key])
+            
+            yield ('motion_device_open', 'gauge', 'Whether the device source is still open', labels, int(not device.closed))
+            yield ('motion_current', 'gauge', 'Current debounced motion (1 for the active label)',
+                   {**labels, 'motion': device.current_motion}, 1)
+            if device.current_pattern is not None:
+                yield ('motion_pattern_current', 'gauge', 'Pattern of the last closed window (1 for the active pattern)',
+                       {**labels, 'pattern': device.current_pattern}, 1)
+            
+            features = device.recognizer.last_features
+            if features is not None:
+                for name, value in zip(('accel_mean', 'accel_std', 'accel_max', 'gyro_mean', 'accel_change'), features):
+                    yield (f'motion_feature_{name}', 'gauge', f'Latest window {name.replace("_", " ")}', labels, value)
+            cadence = device.recognizer.last_cadence
+            if cadence is not None:
+                for name, value in zip(('cadence_hz', 'cadence_strength'), cadence):
+                    yield (f'motion_feature_{name}', 'gauge', f'Latest moving window {name.replace("_", " ")}', labels, value)
+    
+    def close(self):
+        """Close every device and the selector."""
+        for device in self.devices:
+            device.close()
+        self.selector.close()
+
+def read_and_recognize(ports=None):
+    """Read sensor data from one or more devices and perform motion recognition."""
+    ports = ports or SERIAL_PORTS
+    try:
+        # Connect on this thread, then start the database writer (its own thread);
+        # while the store is unreachable samples spill to a journal and are
+        # written back once it reconnects
+        storage = open_resilient_storage(STORAGE_BACKEND, DB_CONFIG, SPILL_JOURNAL_PATH)
+        metrics = MetricsRegistry(enabled=METRICS_ENABLED)
+        if metrics.enabled:
+            metrics.add_collector(storage.collect_metrics)
+        writer = BatchedSampleWriter(storage, metrics=metrics)
+        writer.start()
+        
+        # Local scrape endpoint; ingest keeps running if the port is taken
+        if METRICS_ENABLED:
+            try:
+                metrics_server = MetricsServer(metrics, METRICS_PORT)
+                metrics_server.start()
+            except OSError as e:
+                print(f"Metrics endpoint error: {e}")
+        
+        # Stop cleanly (flushing queued samples) on SIGTERM as well as Ctrl+C
+        signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+        
+        # Generate a sequence ID based on timestamp (one per device)
+        session_id = datetime.now().strftime("%Y%m%d%H%M%S")
+        print(f"Starting motion recognition session: {session_id}")
+        
+        # Pattern rules (pattern_definitions.json if present), shared by every device
+        pattern_recognizer = MotionPatternRules() if LIVE_PATTERNS else None
+        
+        # Trained classifier, shared by every device; the thresholds if it can't be loaded
+        classifier = None
+        if MOTION_MODEL_FILE:
+            try:
+                classifier = load_model(MOTION_MODEL_FILE)
+                print(f"Using the trained classifier from {MOTION_MODEL_FILE}")
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Model error: {e} (using the threshold recognizer)")
+        
+        # Open every device, all sharing the same database writer
+        hub = IngestHub(metrics=metrics)
+        for port in ports:
+            sequence_id = session_id if len(ports) == 1 else f"{session_id}-{os.path.basename(port)}"
+            hub.add_device(DeviceSession(port, writer, sequence_id, metrics=metrics,
+                                         pattern_recognizer=pattern_recognizer, classifier=classifier))
+        
+        # Wait for serial connection to stabilize
+        time.sleep(2)
+        
+        # Print setup instructions
+        print("\n*** SIMPLIFIED MOTION RECOGNITION SYSTEM ***")
+        print("MOTION TYPES:")
+        print("- IDLE: No significant movement")
+        print("- WALKING: Walking pace movement")
+        print("- RUNNING: Running or jogging movement")
+        print("- MOVING: Other unclassified movements")
+        print("\nPress Ctrl+C to stop\n")
+        
+        try:
+            hub.run()
+        except KeyboardInterrupt:
+            print("\nMotion recognition stopped by user.")
+            
+    except STORAGE_ERRORS as e:
+        print(f"Database error: {e}")
+    except serial.SerialException as e:
+        print(f"Serial port error: {e}")
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+    finally:
+        # Flush queued samples before exiting
+        if 'hub' in locals():
+            hub.close()
+        if 'writer' in locals():
+            writer.close()
+            print(writer.summary())
+        if 'metrics_server' in locals():
+            metrics_server.close()
+
+if __name__ == "__main__":
+    # Optional: pass serial ports (or recorded files / ptys) on the command line
+    read_and_recognize(sys.argv[1:])
\ No newline at end of file
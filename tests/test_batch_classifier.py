@@ -0,0 +1,78 @@
+import math
+import types
+import numpy as np
+import pytest
+import test_db_connection
+from test_db_connection import BatchMotionClassifier, DeviceSession, SimpleMotionRecognizer
+from motion_cadence import SlidingSpectrum, sliding_cadence_features
+from test_rolling_features import synthetic_stream, threshold_stream
+
+def live_labels(samples):
+    """What a DeviceSession stores: recognize_pattern() per sample, then its debounce."""
+    recognizer = SimpleMotionRecognizer()
+    session = types.SimpleNamespace(current_motion="idle", motion_count=0, stats={'motion_changes': 0},
+                                    port='test', downlink_enabled=False)
+    result = []
+    for sample in samples:
+        recognizer.add_sample(*sample)
+        DeviceSession.debounce(session, recognizer.recognize_pattern())
+        result.append(session.current_motion)
+    return result
+
+def batch_labels(samples, block_sizes):
+    classifier = BatchMotionClassifier()
+    values = np.array(samples)
+    blocks = []
+    start = 0
+    for size in block_sizes:
+        blocks.append(classifier.classify(values[start:start + size]))
+        start += size
+    blocks.append(classifier.classify(values[start:]))
+    return np.concatenate(blocks).tolist()
+
+@pytest.mark.parametrize('cadence_rules', [True, False])
+@pytest.mark.parametrize('samples', [
+    pytest.param(synthetic_stream(), id='profiles'),
+    pytest.param(synthetic_stream('resting:20,running:40,walking:40,resting:5,running:40', seed=3), id='short-rests'),
+    pytest.param(threshold_stream(), id='thresholds'),
+])
+def test_batch_matches_live_debounced_labels(monkeypatch, capsys, cadence_rules, samples):
+    monkeypatch.setattr(test_db_connection, 'CADENCE_RULES', cadence_rules)
+    expected = live_labels(samples)
+    
+    # One block, and uneven blocks that split windows, resyncs and the warm-up
+    assert batch_labels(samples, []) == expected
+    assert batch_labels(samples, [7, 993, 1, 2500]) == expected
+
+def test_batch_matches_live_on_constant_input(monkeypatch, capsys):
+    monkeypatch.setattr(test_db_connection, 'CADENCE_RULES', True)
+    samples = [[0.0, 0.0, 9.82, 0.0, 0.0, 0.0]] * 1500 + [[0.0, 0.0, 12.0, 0.1, 0.1, 0.1]] * 1500
+    assert batch_labels(samples, [1000]) == live_labels(samples)
+
+@pytest.mark.parametrize('bad', [math.nan, math.inf], ids=['nan', 'inf'])
+def test_batch_matches_live_with_non_finite_input(monkeypatch, capsys, bad):
+    # Bad readings on both sides of a resync, and two close enough to share a cadence window
+    monkeypatch.setattr(test_db_connection, 'CADENCE_RULES', True)
+    samples = synthetic_stream('resting:60,walking:60,running:60,walking:60')
+    for position in (400, 999, 1000, 1030, 1700):
+        samples[position] = list(samples[position])
+        samples[position][2] = bad
+    expected = live_labels(samples)
+    with np.errstate(invalid='ignore'):
+        assert batch_labels(samples, []) == expected
+        assert batch_labels(samples, [7, 993, 1, 1200]) == expected
+    
+    # Only the windows holding a bad reading lose their cadence, and it comes back exactly
+    accel = np.linalg.norm(np.array(samples)[:, :3], axis=1)
+    spectrum = SlidingSpectrum(resync_interval=1000)
+    live = []
+    for value in accel:
+        spectrum.push(value)
+        live.append(spectrum.features() if len(spectrum) == spectrum.window_size else None)
+    batch = sliding_cadence_features(accel, 0, spectrum.window_size)
+    for index, features in enumerate(live[spectrum.window_size - 1:]):
+        if features is None:
+            assert np.isnan(batch[index]).all()
+        else:
+            assert batch[index] == pytest.approx(features, rel=1e-6, abs=1e-9)
+    assert sum(features is None for features in live[spectrum.window_size - 1:]) < 5 * spectrum.window_size
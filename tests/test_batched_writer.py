@@ -0,0 +1,73 @@
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from test_db_connection import BatchedSampleWriter
+
+START = datetime(2026, 1, 1)
+
+class RecordingStorage:
+    """Keeps the size of every batch it is asked to write; refuses any batch holding a 'bad' row."""
+    
+    def __init__(self):
+        self.batches = []
+        self.closed = False
+    
+    def write_samples(self, rows):
+        if any(row[8] == 'bad' for row in rows):
+            raise sqlite3.OperationalError("disk I/O error")
+        self.batches.append(len(rows))
+    
+    def close(self):
+        self.closed = True
+
+def rows(count, sequence_id='seq'):
+    return [(START + timedelta(seconds=0.1 * i), 'walking', 0.1, 0.2, 9.8, 0.0, 0.0, 0.0, sequence_id, 1, None)
+            for i in range(count)]
+
+def test_flushes_full_batches_and_the_rest_on_close(capsys):
+    storage = RecordingStorage()
+    writer = BatchedSampleWriter(storage, batch_size=50, flush_interval=0.2)
+    for row in rows(120):
+        assert writer.put(row)
+    writer.start()
+    writer.close()
+    assert storage.batches == [50, 50, 20]
+    assert storage.closed
+    assert writer.stats['written'] == writer.stats['enqueued'] == 120
+    assert writer.stats['flushes'] == 3
+
+def test_flushes_a_partial_batch_after_the_interval(capsys):
+    storage = RecordingStorage()
+    writer = BatchedSampleWriter(storage, batch_size=1000, flush_interval=0.05)
+    for row in rows(10):
+        writer.put(row)
+    writer.start()
+    deadline = time.monotonic() + 5.0
+    while not storage.batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # Written by the timer, not by close()
+    assert storage.batches == [10]
+    writer.close()
+    assert storage.batches == [10]
+
+def test_full_queue_drops_and_counts(capsys):
+    storage = RecordingStorage()
+    writer = BatchedSampleWriter(storage, batch_size=100, flush_interval=0.2, queue_size=5, put_timeout=0.01)
+    accepted = [writer.put(row) for row in rows(8)]
+    assert accepted == [True] * 5 + [False] * 3
+    assert writer.stats['dropped'] == writer.stats['blocked_puts'] == 3
+    assert writer.stats['max_queue_depth'] == 5
+    writer.start()
+    writer.close()
+    assert storage.batches == [5]
+
+def test_failed_batch_is_counted_and_the_writer_keeps_going(capsys):
+    storage = RecordingStorage()
+    writer = BatchedSampleWriter(storage, batch_size=10, flush_interval=0.2)
+    for row in rows(10) + rows(10, 'bad') + rows(10):
+        writer.put(row)
+    writer.start()
+    writer.close()
+    assert storage.batches == [10, 10]
+    assert writer.stats['failed_rows'] == 10
+    assert "Database error while writing 10 samples" in capsys.readouterr().out
@@ -0,0 +1,31 @@
+import json
+import motion_benchmarks
+from motion_benchmarks import BENCHMARKS, compare_results, run_benchmarks
+
+def test_every_benchmark_runs_at_the_smallest_scale(monkeypatch, capsys):
+    # One timed run each: this checks the setups, not the numbers
+    monkeypatch.setattr(motion_benchmarks, 'MIN_REPEATS', 1)
+    monkeypatch.setattr(motion_benchmarks, 'MAX_REPEATS', 1)
+    document = run_benchmarks(['1k'])
+    
+    results = document['results']
+    assert len(results) == sum(len(params) for name, params, setup in BENCHMARKS)
+    assert all(result['repeats'] == 1 and result['min_s'] > 0 for result in results)
+    assert {result['name'] for result in results} == {name for name, params, setup in BENCHMARKS}
+    assert document['machine']['python']
+    json.dumps(document)
+
+def test_compare_flags_regressions(tmp_path, capsys):
+    def save(file_name, seconds):
+        path = tmp_path / file_name
+        results = [{'name': name, 'scale': '1k', 'param': None, 'min_s': value} for name, value in seconds.items()]
+        path.write_text(json.dumps({'commit': None, 'results': results}))
+        return str(path)
+    
+    baseline = save('baseline.json', {'parse': 1.0, 'analyze': 1.0, 'fetch': 1.0})
+    assert not compare_results(baseline, save('same.json', {'parse': 1.05, 'analyze': 0.5, 'fetch': 1.0}))
+    assert "faster" in capsys.readouterr().out
+    assert compare_results(baseline, save('slower.json', {'parse': 1.2, 'analyze': 1.0, 'new': 9.0}))
+    out = capsys.readouterr().out
+    assert "parse[1k]" in out and "REGRESSION" in out
+    assert "new[1k]" not in out
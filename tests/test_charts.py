@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+from datetime import datetime
+from machine_learned_results import FixedPatternRecognizer, aggregate_breakdown, render_chart, timeline_runs
+
+MOTIONS = ('resting', 'idle', 'walking', 'running')
+
+def segment_frame(count, seed=0, patterns=('Resting', 'Walking', 'Mixed Activity')):
+    """count back-to-back 15 s segments with random motion mixes (summing to 100%) and sample counts."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(datetime(2026, 3, 1, 12, 0)) + pd.to_timedelta(np.arange(count) * 15, unit='s')
+    mix = rng.dirichlet(np.ones(len(MOTIONS)), count) * 100
+    frame = pd.DataFrame({'start_time': start, 'end_time': start + pd.Timedelta(seconds=15)})
+    for index, motion in enumerate(MOTIONS):
+        frame[f'{motion}_pct'] = mix[:, index]
+        frame[f'max_consecutive_{motion}'] = rng.integers(0, 150, count)
+    frame['transitions'] = rng.integers(0, 20, count)
+    frame['samples'] = rng.integers(10, 151, count)
+    frame['pattern'] = rng.choice(patterns, count)
+    return frame
+
+def test_breakdown_keeps_one_bar_per_segment_when_they_fit():
+    frame = segment_frame(20)
+    bars = aggregate_breakdown(frame, max_bars=20)
+    assert len(bars['left']) == 20
+    assert np.allclose(bars['width'], 15 / 86400)
+    for motion in MOTIONS:
+        assert np.allclose(bars[motion], frame[f'{motion}_pct'] / 100)
+
+def test_breakdown_pools_segments_by_sample_weight():
+    frame = segment_frame(4000, seed=1)
+    # A gap with no segments leaves its bins out
+    frame = frame[(frame.index < 1000) | (frame.index >= 1500)]
+    bars = aggregate_breakdown(frame, max_bars=100)
+    assert 80 < len(bars['left']) < 100
+    assert np.allclose(sum(bars[motion] for motion in MOTIONS), 1.0)
+    
+    # The first bin is the sample-weighted mix of the segments that start in it
+    first = frame[mdates.date2num(frame['start_time']) < bars['left'][0] + bars['width'][0]]
+    assert 0 < len(first) < len(frame)
+    for motion in MOTIONS:
+        expected = np.average(first[f'{motion}_pct'], weights=first['samples']) / 100
+        assert bars[motion][0] == pytest.approx(expected)
+
+def test_timeline_merges_touching_segments_of_a_pattern():
+    frame = segment_frame(9)
+    frame['pattern'] = ['Resting'] * 3 + ['Walking'] * 2 + ['Resting'] * 4
+    x0, x1, rows = timeline_runs(frame, ['Resting', 'Walking'], width_px=1000)
+    assert rows.tolist() == [0, 0, 1]
+    day = 86400
+    assert np.round((x1 - x0) * day).tolist() == [45, 60, 30]
+    
+    # Thousands of segments collapse to at most one run per pixel and row
+    frame = segment_frame(5000, seed=2)
+    x0, x1, rows = timeline_runs(frame, sorted(frame['pattern'].unique()), width_px=200)
+    assert len(rows) <= 3 * 200
+    assert (x1 > x0).all()
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_headless_charts_are_saved_without_pyplot(tmp_path, monkeypatch, capsys, parallel):
+    monkeypatch.chdir(tmp_path)
+    plt.close('all')
+    FixedPatternRecognizer().visualize_results(segment_frame(3000), headless=True, parallel=parallel)
+    assert "Chart pooled 3000 segments into" in capsys.readouterr().out
+    for name in ('motion_breakdown.png', 'pattern_timeline.png'):
+        assert (tmp_path / name).read_bytes()[:8] == b'\x89PNG\r\n\x1a\n'
+    assert plt.get_fignums() == []
+
+def test_render_chart_uses_the_requested_size(tmp_path):
+    frame = segment_frame(30)
+    path = render_chart('breakdown', aggregate_breakdown(frame, 600), tmp_path / 'chart.png', (4, 2), dpi=50)
+    header = path.read_bytes()[16:24]
+    assert (int.from_bytes(header[:4], 'big'), int.from_bytes(header[4:], 'big')) == (200, 100)
@@ -0,0 +1,53 @@
+import io
+import os
+from test_db_connection import STATE_FRAME_SIZE, DeviceSession, encode_state_frame
+
+class WindowsPort:
+    """pyserial on Windows: fileno() exists but raises, writes queue without blocking."""
+    
+    def __init__(self):
+        self.written = b''
+        self.out_waiting = 0
+    
+    def fileno(self):
+        raise io.UnsupportedOperation("fileno")
+    
+    def write(self, data):
+        self.written += data
+        return len(data)
+    
+    def close(self):
+        pass
+
+def open_session():
+    session = DeviceSession('COM3', None, 'seq', downlink=True)
+    session.source = WindowsPort()
+    session.downlink_enabled = True
+    session.current_motion = 'walking'
+    return session
+
+def on_os(monkeypatch, os_name, call):
+    # Only around the call: pytest itself builds paths from os.name
+    with monkeypatch.context() as patch:
+        patch.setattr(os, 'name', os_name)
+        call()
+
+def test_downlink_writes_when_fileno_is_unsupported(monkeypatch):
+    for os_name in ('nt', 'posix'):
+        session = open_session()
+        on_os(monkeypatch, os_name, session.send_state)
+        assert session.downlink_enabled
+        assert session.source.written == encode_state_frame('walking', session.current_pattern)
+        assert session.downlink_out == b''
+
+def test_downlink_waits_for_the_port_to_drain(monkeypatch):
+    session = open_session()
+    session.source.out_waiting = STATE_FRAME_SIZE
+    on_os(monkeypatch, 'nt', session.send_state)
+    assert session.source.written == b''
+    assert len(session.downlink_out) == STATE_FRAME_SIZE
+    
+    session.source.out_waiting = 0
+    on_os(monkeypatch, 'nt', session.flush_downlink)
+    assert len(session.source.written) == STATE_FRAME_SIZE
+    assert session.downlink_enabled
@@ -0,0 +1,60 @@
+import math
+import numpy as np
+import pytest
+from collections import Counter
+from test_db_connection import FRAME_TYPE_FEATURES, FRAME_TYPE_SAMPLE, WINDOW_SIZE, DeviceSession, FrameDecoder, RollingFeatures
+from motion_replay import EdgeFeatureEmulator, encode_edge_frames, generate_samples, parse_schedule
+from test_ingest_hub import ListWriter
+
+def sample_stream(schedule='resting:20,walking:20,running:20', seed=0):
+    millis, values = generate_samples(parse_schedule(schedule), seed=seed)
+    # What the host sees of a board's float32 readings
+    return millis, values.astype(np.float32)
+
+def test_board_features_match_the_host_window():
+    millis, values = sample_stream()
+    board = EdgeFeatureEmulator(WINDOW_SIZE)
+    host = RollingFeatures(WINDOW_SIZE)
+    for index, (x, y, z, gx, gy, gz) in enumerate(values[:, :6].tolist()):
+        board.push(x, y, z, gx, gy, gz)
+        host.push(math.sqrt(x * x + y * y + z * z), math.sqrt(gx * gx + gy * gy + gz * gz))
+        features = [float(value) for value in board.features()]
+        assert features[5:] == [min(index + 1, WINDOW_SIZE), WINDOW_SIZE]
+        # Single precision on the board against double on the host
+        assert features[:5] == pytest.approx(host.exact_features(), rel=1e-5, abs=1e-5)
+
+def test_edge_session_labels_from_feature_frames(capsys):
+    millis, values = sample_stream()
+    payloads, feature_millis = encode_edge_frames(millis, values, WINDOW_SIZE, feature_every=5, raw_every=1)
+    assert len(payloads) == len(feature_millis) == len(values) // 5
+    assert feature_millis.tolist() == millis[4::5].tolist()
+    
+    writer = ListWriter()
+    session = DeviceSession('test', writer, 'seq', protocol='binary', adaptive=False)
+    session.handle_frames(session.decoder.decode(b''.join(payloads)))
+    assert session.edge
+    assert session.stats['feature_frames'] == len(payloads)
+    assert session.stats['samples'] == len(values)
+    # Once the first feature frame arrives the board does the windowing; only
+    # the raw frames sent ahead of it reached the host recognizer
+    assert len(session.recognizer.buffer) == 4
+    
+    # Raw frames are stored as sent; only the board's warm-up goes unlabelled
+    stored = writer.rows
+    assert 0 < len(values) - len(stored) <= 2 * WINDOW_SIZE
+    sent = {row: index for index, row in enumerate(map(tuple, values[:, :6].tolist()))}
+    order = [sent[row[2:8]] for row in stored]
+    assert order == sorted(order) and order[-1] == len(values) - 1
+    for motion, part in (('resting', stored[:150]), ('walking', stored[-350:-250]), ('running', stored[-150:])):
+        assert Counter(row[1] for row in part).most_common(1)[0][0] == motion
+
+def test_raw_frames_can_be_thinned_or_left_out():
+    millis, values = sample_stream('walking:10')
+    for raw_every, raw_frames in ((0, 0), (4, 25), (1, 100)):
+        payloads, _ = encode_edge_frames(millis, values, WINDOW_SIZE, feature_every=10, raw_every=raw_every)
+        frames = FrameDecoder().decode(b''.join(payloads))
+        assert (frames['type'] == FRAME_TYPE_FEATURES).sum() == 10
+        assert len(frames) == 10 + raw_frames
+        # Raw frames sent ahead of the first feature frame ride along in front of it
+        ahead = 9 // raw_every if raw_every else 0
+        assert frames['type'][:ahead + 1].tolist() == [FRAME_TYPE_SAMPLE] * ahead + [FRAME_TYPE_FEATURES]
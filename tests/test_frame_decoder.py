@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from test_db_connection import FRAME_SIZE, FRAME_SYNC, FrameDecoder
+from motion_replay import generate_samples, encode_frames
+
+def sample_frames(seconds=10, seed=0):
+    millis, values = generate_samples([('walking', seconds / 2), ('running', seconds / 2)], seed=seed)
+    return millis, encode_frames(millis, values)
+
+def decode_in_reads(decoder, data, read_size):
+    frames = [decoder.decode(data[start:start + read_size]) for start in range(0, len(data), read_size)]
+    return np.concatenate(frames)
+
+@pytest.mark.parametrize('read_size', [1, 5, FRAME_SIZE - 1, FRAME_SIZE + 3, 4096])
+def test_frames_split_across_reads(read_size):
+    millis, payloads = sample_frames()
+    decoder = FrameDecoder()
+    frames = decode_in_reads(decoder, b''.join(payloads), read_size)
+    assert frames['millis'].tolist() == millis.tolist()
+    assert decoder.stats == {'frames': len(payloads), 'crc_errors': 0, 'resyncs': 0, 'bytes_skipped': 0}
+    assert decoder.buffer == b''
+
+def test_crc_mismatch_drops_only_that_frame():
+    millis, payloads = sample_frames()
+    corrupted = bytearray(payloads[40])
+    corrupted[12] ^= 0x10  # One bit of a value
+    payloads[40] = bytes(corrupted)
+    
+    decoder = FrameDecoder()
+    frames = decode_in_reads(decoder, b''.join(payloads), 64)
+    assert frames['millis'].tolist() == millis[:40].tolist() + millis[41:].tolist()
+    assert decoder.stats['crc_errors'] == 1
+    assert decoder.stats['bytes_skipped'] == FRAME_SIZE
+
+def test_resync_after_truncated_frames_and_line_noise():
+    millis, payloads = sample_frames()
+    # A frame cut short, noise holding a stray sync word, and a header with an unknown type
+    stream = (b'\x00\x13noise' + b''.join(payloads[:10]) + payloads[10][:9] + b''.join(payloads[11:20]) +
+              b'\xff' + FRAME_SYNC + b'\x01\x02' + b''.join(payloads[20:30]) + FRAME_SYNC + b'\x7f' +
+              bytes(FRAME_SIZE) + b''.join(payloads[30:]))
+    
+    for read_size in (1, 13, len(stream)):
+        decoder = FrameDecoder()
+        frames = decode_in_reads(decoder, stream, read_size)
+        expected = millis[:10].tolist() + millis[11:].tolist()
+        assert frames['millis'].tolist() == expected
+        assert decoder.stats['frames'] == len(expected)
+        assert decoder.stats['resyncs'] >= 4
+        assert decoder.buffer == b''
+
+def test_partial_frame_waits_for_the_rest():
+    millis, payloads = sample_frames(seconds=2)
+    decoder = FrameDecoder()
+    assert len(decoder.decode(payloads[0] + payloads[1][:FRAME_SIZE // 2])) == 1
+    assert decoder.buffer == payloads[1][:FRAME_SIZE // 2]
+    assert decoder.decode(payloads[1][FRAME_SIZE // 2:])['millis'].tolist() == [millis[1]]
+    assert decoder.stats['resyncs'] == 0
@@ -0,0 +1,42 @@
+import test_db_connection
+from test_db_connection import DeviceSession, IngestHub
+from motion_replay import generate_samples, encode_csv
+
+class ListWriter:
+    """Writer stand-in that keeps the rows it is given."""
+    
+    def __init__(self):
+        self.rows = []
+    
+    def put(self, row):
+        self.rows.append(row)
+        return True
+
+def windows_select(timeout=None):
+    # What SelectSelector.select does on Windows with nothing registered
+    raise OSError(10022, "An invalid argument was supplied")
+
+def test_hub_runs_with_only_polled_sources(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(test_db_connection, 'POLL_INTERVAL', 0.0)
+    millis, values = generate_samples([('walking', 10)])
+    paths = []
+    for index in range(2):
+        path = tmp_path / f"dev{index}.csv"
+        path.write_bytes(b''.join(encode_csv(millis, values)))
+        paths.append(str(path))
+    
+    writer = ListWriter()
+    hub = IngestHub()
+    for index, path in enumerate(paths):
+        hub.add_device(DeviceSession(path, writer, f"seq{index}", protocol='csv', adaptive=False))
+    
+    # Recorded files can't be watched by the selector, so nothing is registered
+    assert len(hub.polled) == 2
+    assert not hub.selector.get_map()
+    monkeypatch.setattr(hub.selector, 'select', windows_select)
+    
+    hub.run()
+    hub.close()
+    assert all(device.closed for device in hub.devices)
+    assert sum(device.stats['samples'] for device in hub.devices) == 2 * len(values)
+    assert {row[8] for row in writer.rows} == {'seq0', 'seq1'}
@@ -0,0 +1,63 @@
+import os
+import sys
+import subprocess
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+import test_db_connection
+from test_db_connection import DeviceSession
+from machine_learned_results import FixedPatternRecognizer
+from motion_patterns import MotionPatternRules
+from test_ingest_hub import ListWriter
+from test_segment_analysis import COLUMNS
+
+def clock_at(moment):
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return moment[0]
+    return Clock
+
+def labelled_stream(seconds=900, seed=0):
+    """(timestamp, label) at 10 Hz with gaps (whole windows, partial and too-short ones) and unlisted labels."""
+    rng = np.random.default_rng(seed)
+    count = seconds * 10
+    start = datetime(2026, 3, 1, 12, 0, 7)
+    labels = np.repeat(rng.choice(['resting', 'idle', 'walking', 'running', 'cycling'], count),
+                       rng.integers(1, 50, count))[:count]
+    keep = rng.random(count) > 0.05
+    for first in rng.integers(0, count, 10):
+        keep[first:first + rng.integers(20, 300)] = False
+    return [(start + timedelta(milliseconds=100 * i), str(labels[i])) for i in np.flatnonzero(keep).tolist()]
+
+def test_live_segments_match_the_batch_analysis(monkeypatch, capsys):
+    moment = [None]
+    monkeypatch.setattr(test_db_connection, 'datetime', clock_at(moment))
+    writer = ListWriter()
+    session = DeviceSession('test', writer, 'seq', pattern_recognizer=MotionPatternRules(), adaptive=False)
+    live = []
+    report = session.handle_segment
+    session.handle_segment = lambda segment: (live.append(segment), report(segment))
+    
+    stream = labelled_stream()
+    for timestamp, label in stream:
+        moment[0] = timestamp
+        session.current_motion = label
+        session.store_sample(0.0, 0.0, 9.8, 0.0, 0.0, 0.0)
+    session.close_window(stream[-1][0] + timedelta(minutes=1))
+    
+    # The batch analysis of exactly the rows the session stored
+    stored = pd.DataFrame([row[:2] for row in writer.rows], columns=['timestamp', 'motion_label'])
+    expected = FixedPatternRecognizer().analyze_motion_segments(stored, verbose=False)
+    assert len(writer.rows) == len(stream)
+    assert len(live) == len(expected) > 40
+    assert set(expected['pattern']) >= {'active', 'stationary'}
+    pd.testing.assert_frame_equal(pd.DataFrame(live)[COLUMNS], expected[COLUMNS], check_dtype=False)
+    assert session.current_pattern == expected['pattern'].iloc[-1]
+
+def test_ingest_does_not_load_the_chart_code():
+    code = ("import sys, test_db_connection, motion_replay; "
+            "print(sorted({'matplotlib', 'machine_learned_results'} & set(sys.modules)))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(test_db_connection.__file__),
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]'
@@ -0,0 +1,80 @@
+import json
+import urllib.error
+import urllib.request
+import pytest
+from motion_metrics import Histogram, MetricsRegistry, MetricsServer
+from test_batched_writer import RecordingStorage, rows
+from test_db_connection import BatchedSampleWriter
+
+def test_render_is_prometheus_text():
+    registry = MetricsRegistry()
+    registry.counter('motion_samples_total', 'Samples parsed', device='COM4').inc(3)
+    registry.counter('motion_samples_total', 'Samples parsed', device='COM5').inc()
+    registry.gauge('motion_buffer_bytes', 'Bytes buffered').set(12.5)
+    latency = registry.histogram('motion_parse_seconds', 'Parse time', buckets=(0.001, 0.01))
+    for value in (0.0005, 0.002, 0.002, 5.0):
+        latency.observe(value)
+    # Asking again returns the same metric, not a fresh one
+    registry.counter('motion_samples_total', 'Samples parsed', device='COM4').inc()
+    
+    lines = registry.render().splitlines()
+    assert lines[:2] == ['# HELP motion_buffer_bytes Bytes buffered', '# TYPE motion_buffer_bytes gauge']
+    assert 'motion_buffer_bytes 12.5' in lines
+    assert '# TYPE motion_parse_seconds histogram' in lines
+    assert lines[lines.index('# TYPE motion_parse_seconds histogram') + 1:][:5] == [
+        'motion_parse_seconds_bucket{le="0.001"} 1',
+        'motion_parse_seconds_bucket{le="0.01"} 3',
+        'motion_parse_seconds_bucket{le="+Inf"} 4',
+        'motion_parse_seconds_sum 5.0045',
+        'motion_parse_seconds_count 4']
+    assert 'motion_samples_total{device="COM4"} 4' in lines
+    assert 'motion_samples_total{device="COM5"} 1' in lines
+    assert lines.count('# TYPE motion_samples_total counter') == 1
+
+def test_histogram_quantiles_interpolate_inside_buckets():
+    histogram = Histogram(buckets=(1.0, 2.0, 4.0))
+    assert histogram.quantile(0.5) is None
+    for value in (0.5, 1.5, 1.5, 3.0):
+        histogram.observe(value)
+    assert histogram.quantile(0.25) == pytest.approx(1.0)
+    assert histogram.quantile(0.5) == pytest.approx(1.5)
+    assert histogram.quantile(1.0) == pytest.approx(4.0)
+    histogram.observe(100.0)
+    # Past the last bound the estimate is capped at it
+    assert histogram.quantile(1.0) == 4.0
+
+def test_collectors_are_read_at_scrape_time(capsys):
+    registry = MetricsRegistry()
+    writer = BatchedSampleWriter(RecordingStorage(), batch_size=50, flush_interval=0.2, metrics=registry)
+    for row in rows(7):
+        writer.put(row)
+    assert 'motion_write_queue_depth 7' in registry.render().splitlines()
+    writer.start()
+    writer.close()
+    
+    lines = registry.render().splitlines()
+    assert 'motion_write_written_total 7' in lines
+    assert 'motion_write_queue_depth 0' in lines
+    assert 'motion_db_write_seconds_count 1' in lines
+    
+    registry.log_line()
+    line = json.loads(capsys.readouterr().out.splitlines()[-1])
+    assert line['event'] == 'metrics'
+    assert line['metrics']['motion_write_written_total'] == 7
+    assert line['metrics']['motion_db_write_seconds']['count'] == 1
+
+def test_server_answers_scrapes():
+    registry = MetricsRegistry()
+    registry.counter('motion_samples_total', 'Samples parsed').inc(2)
+    server = MetricsServer(registry, 0)
+    server.start()
+    try:
+        host, port = server.server.server_address
+        with urllib.request.urlopen(f'http://{host}:{port}/metrics', timeout=5) as response:
+            assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+            assert response.read().decode() == registry.render()
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f'http://{host}:{port}/other', timeout=5)
+        assert error.value.code == 404
+    finally:
+        server.close()
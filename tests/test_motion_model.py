@@ -0,0 +1,78 @@
+import types
+import numpy as np
+import pytest
+from test_db_connection import BatchMotionClassifier, DeviceSession, SimpleMotionRecognizer
+from motion_model import (MODEL_WINDOW, TreeClassifier, load_model, synthetic_training_data, train_tree,
+                          window_features)
+
+SCHEDULE = 'resting:60,walking:60,running:60,walking:30,resting:30'
+
+def training_set(seed):
+    values, labels = synthetic_training_data(SCHEDULE, seed=seed)
+    # Each window is labeled with its newest sample's profile
+    return values, window_features(values), labels[MODEL_WINDOW - 1:]
+
+@pytest.fixture(scope='module')
+def model():
+    values, features, labels = training_set(seed=0)
+    return train_tree(features, labels)
+
+def test_window_features_match_one_window_at_a_time():
+    values = synthetic_training_data('walking:5,running:5', seed=1)[0]
+    features = window_features(values)
+    assert features.shape == (len(values) - MODEL_WINDOW + 1, 16)
+    for row in (0, 17, len(features) - 1):
+        # The live path passes a single window
+        single = window_features(values[row:row + MODEL_WINDOW])
+        assert np.allclose(single[0], features[row], rtol=1e-12, atol=1e-12)
+    assert window_features(values[:MODEL_WINDOW - 1]).shape == (0, 16)
+
+def test_tree_generalizes_to_a_new_stream(model):
+    assert set(model.classes) == {'resting', 'walking', 'running'}
+    assert 0 < model.depth <= 8
+    values, features, labels = training_set(seed=5)
+    predicted = model.predict_labels(features)
+    assert (predicted == labels).mean() > 0.95
+    for motion in model.classes:
+        assert (predicted[labels == motion] == motion).mean() > 0.9
+
+def test_saved_model_round_trips(model, tmp_path):
+    path = tmp_path / 'model.npz'
+    model.save(path)
+    loaded = load_model(path)
+    values, features, labels = training_set(seed=2)
+    assert loaded.classes == model.classes
+    assert np.array_equal(loaded.predict(features), model.predict(features))
+    
+    # The per-window walk used live agrees with the vectorized descent
+    for row in range(0, len(features), 97):
+        assert loaded.classify_window(values[row:row + MODEL_WINDOW]) == loaded.predict_labels(features[row:row + 1])[0]
+    
+    # A model trained on other features is refused
+    with np.load(path) as data:
+        arrays = dict(data)
+    arrays['feature_names'] = arrays['feature_names'][:-1]
+    np.savez(path, **arrays)
+    with pytest.raises(ValueError, match='different feature set'):
+        load_model(path)
+
+def test_batch_matches_live_with_a_model(model, capsys):
+    values = synthetic_training_data(SCHEDULE, seed=3)[0]
+    recognizer = SimpleMotionRecognizer(model)
+    session = types.SimpleNamespace(current_motion="idle", motion_count=0, stats={'motion_changes': 0},
+                                    port='test', downlink_enabled=False)
+    expected = []
+    for sample in values[:, :6].tolist():
+        recognizer.add_sample(*sample)
+        DeviceSession.debounce(session, recognizer.recognize_pattern())
+        expected.append(session.current_motion)
+    
+    classifier = BatchMotionClassifier(SimpleMotionRecognizer(model))
+    labels = np.concatenate([classifier.classify(values[:333]), classifier.classify(values[333:])]).tolist()
+    assert labels == expected
+    assert {'resting', 'walking', 'running'} <= set(labels)
+
+def test_recognizer_refuses_a_model_for_another_window():
+    single_leaf = TreeClassifier([-1], [0.0], [0], [0], [0], ['resting'], window_size=10)
+    with pytest.raises(ValueError, match='Classifier window is 10 samples'):
+        SimpleMotionRecognizer(single_leaf)
@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip('mysql.connector')
+
+from datetime import datetime
+import motion_storage
+from motion_pool import Backoff, ResilientStorage
+from motion_storage import STORAGE_ERRORS, MySQLStorage
+
+class SchemaConnection:
+    """Just enough of a mysql.connector connection to answer the column check."""
+    
+    def __init__(self, columns):
+        self.columns = columns
+    
+    def cursor(self):
+        return self
+    
+    def execute(self, query, params=None):
+        assert 'information_schema.COLUMNS' in query
+    
+    def fetchall(self):
+        return [(name,) for name in self.columns]
+    
+    def ping(self, reconnect=False):
+        pass
+    
+    def close(self):
+        pass
+
+BASE_COLUMNS = ['id', 'timestamp', 'motion_label', 'accel_x', 'accel_y', 'accel_z',
+                'gyro_x', 'gyro_y', 'gyro_z', 'sequence_id']
+
+def mysql_with(monkeypatch, columns):
+    monkeypatch.setattr(motion_storage.mysql.connector, 'connect', lambda **config: SchemaConnection(columns))
+    return MySQLStorage({'database': 'motion_data'})
+
+def connect_with(monkeypatch, columns):
+    storage = mysql_with(monkeypatch, columns)
+    try:
+        storage.connect()
+    finally:
+        storage.close()
+
+def test_unmigrated_database_fails_on_connect(monkeypatch):
+    with pytest.raises(STORAGE_ERRORS, match='SQL Migration - Hold Records.sql'):
+        connect_with(monkeypatch, BASE_COLUMNS)
+
+def test_unmigrated_database_spills_instead_of_dropping(monkeypatch, tmp_path):
+    # The writer reconnecting mid-run keeps its samples in the journal
+    storage = ResilientStorage(mysql_with(monkeypatch, BASE_COLUMNS), str(tmp_path / 'spill.journal'),
+                               backoff=Backoff(initial=0.0))
+    storage.write_samples([(datetime(2026, 1, 1), 'walking', 0.1, 0.2, 9.8, 0.0, 0.0, 0.0, 'seq', 1, None)] * 10)
+    assert not storage.available
+    assert storage.stats['spilled_rows'] == 10
+    assert len(storage.journal) == 10
+    assert 'SQL Migration' in str(storage.last_error)
+
+def test_migrated_database_connects(monkeypatch):
+    connect_with(monkeypatch, [bytearray(name.encode()) for name in BASE_COLUMNS] + ['HOLD_COUNT', 'hold_until'])
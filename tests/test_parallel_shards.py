@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+from machine_learned_results import FixedPatternRecognizer
+from motion_parallel import analyze_parallel
+
+def month_chunks(start, minutes=30, seed=0):
+    """One sample per second, a label run per minute (so every pattern shows up)."""
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range(start, periods=minutes * 60, freq='1s')
+    labels = np.repeat(rng.choice(['resting', 'idle', 'walking', 'running'], minutes), 60)
+    chunk = pd.DataFrame({
+        'timestamp': timestamps.to_numpy('datetime64[us]'),
+        'motion_label': labels.astype(object),
+        'accel_x': rng.normal(0, 1, len(timestamps)).astype(np.float32),
+        'accel_y': rng.normal(0, 1, len(timestamps)).astype(np.float32),
+        'accel_z': rng.normal(9.8, 1, len(timestamps)).astype(np.float32),
+        'sequence_id': 'seq-1'
+    })
+    return [chunk.iloc[:1000], chunk.iloc[1000:]]
+
+def test_reused_shard_dir_analyzes_only_the_new_run(tmp_path):
+    recognizer = FixedPatternRecognizer()
+    january, _ = analyze_parallel(recognizer, month_chunks('2025-01-01'), 'time', workers=1, shard_dir=str(tmp_path))
+    february, _ = analyze_parallel(recognizer, month_chunks('2025-02-01', seed=1), 'time', workers=1,
+                                   shard_dir=str(tmp_path))
+    
+    fresh, _ = analyze_parallel(recognizer, month_chunks('2025-02-01', seed=1), 'time', workers=1)
+    assert len(january) and len(february)
+    assert (pd.to_datetime(february['start_time']) >= pd.Timestamp('2025-02-01')).all()
+    pd.testing.assert_frame_equal(february, fresh)
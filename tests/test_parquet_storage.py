@@ -0,0 +1,104 @@
+import os
+import pytest
+import pandas as pd
+from datetime import datetime, timedelta
+from motion_storage import ParquetStorage
+
+START = datetime(2024, 1, 1, 9, 59, 50)
+
+def make_rows(count, offset=0, sequence_id='seq-1'):
+    return [(START + timedelta(seconds=(offset + i) * 0.1), 'walking' if (offset + i) % 3 else 'resting',
+             0.1 * i, 0.2, 9.8, 1.0, 2.0, 3.0, sequence_id, 1, None) for i in range(count)]
+
+def stored_rows(root):
+    """Open the store read-only (as the analyzer does) and read everything back."""
+    storage = ParquetStorage(str(root))
+    storage.connect()
+    frames = list(storage.iter_range(START - timedelta(hours=1)))
+    frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    ids = [int(i) for chunk in storage.iter_new_rows(0, START - timedelta(hours=1)) for i in chunk[0]]
+    summary = storage.summary()
+    storage.close()
+    return frame, ids, summary
+
+def crash(storage):
+    # A dead process holds no lock and flushed nothing
+    storage.writer_lock.close()
+    storage.writer_lock = None
+
+def recover(root, rows):
+    """Start the next writer, which replays the journal before its own rows."""
+    storage = ParquetStorage(str(root))
+    storage.connect()
+    storage.write_samples(rows)
+    storage.close()
+
+def test_acknowledged_rows_survive_a_crash(tmp_path):
+    storage = ParquetStorage(str(tmp_path), rows_per_file=250)
+    storage.connect()
+    for batch in range(4):
+        storage.write_samples(make_rows(100, batch * 100))
+    # The third batch crossed 250 rows into files, the fourth is only journaled
+    assert len(storage.pending) == 100
+    crash(storage)
+    
+    recover(tmp_path, make_rows(50, 400))
+    frame, ids, (total, latest, distribution) = stored_rows(tmp_path)
+    assert len(frame) == 450
+    assert ids == list(range(1, 451))
+    assert total == 450
+    assert latest == make_rows(450)[-1][0]
+    assert dict(distribution) == {'walking': 300, 'resting': 150}
+    assert not os.path.exists(tmp_path / 'pending.journal')
+
+def test_crash_after_files_before_journal_cleared(tmp_path):
+    storage = ParquetStorage(str(tmp_path))
+    storage.connect()
+    storage.write_samples(make_rows(100))
+    storage.write_samples(make_rows(100, 100))
+    
+    # Data files written, rollup and journal untouched: replay must not duplicate rows or counts
+    storage._write_files()
+    crash(storage)
+    
+    recover(tmp_path, [])
+    frame, ids, (total, _, _) = stored_rows(tmp_path)
+    assert ids == list(range(1, 201))
+    assert len(frame) == 200
+    assert total == 200
+
+def test_torn_journal_line_is_ignored(tmp_path):
+    storage = ParquetStorage(str(tmp_path))
+    storage.connect()
+    storage.write_samples(make_rows(50))
+    crash(storage)
+    with open(tmp_path / 'pending.journal', 'a') as f:
+        f.write('{"first_id": 51, "rows": [["2024-')
+    
+    recover(tmp_path, [])
+    frame, ids, (total, _, _) = stored_rows(tmp_path)
+    assert ids == list(range(1, 51))
+    assert total == 50
+
+def test_readers_leave_the_live_writers_journal_alone(tmp_path):
+    writer = ParquetStorage(str(tmp_path), rows_per_file=250)
+    writer.connect()
+    for batch in range(4):
+        writer.write_samples(make_rows(100, batch * 100))
+        # A reader opening mid-run sees only the flushed files
+        frame, ids, _ = stored_rows(tmp_path)
+        assert ids == list(range(1, len(ids) + 1))
+    assert os.path.exists(tmp_path / 'pending.journal')
+    
+    # A second writer can't take over the root while the first holds it
+    second = ParquetStorage(str(tmp_path))
+    second.connect()
+    with pytest.raises(BlockingIOError):
+        second.write_samples(make_rows(10, 1000))
+    second.close()
+    
+    writer.close()
+    frame, ids, (total, _, _) = stored_rows(tmp_path)
+    assert ids == list(range(1, 401))
+    assert frame['timestamp'].is_unique
+    assert total == 400
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from machine_learned_results import FixedPatternRecognizer
+from motion_patterns import CompiledPatternRules
+
+LABELS = ['resting', 'idle', 'walking', 'running']
+
+def recognizer_with(definitions):
+    recognizer = FixedPatternRecognizer()
+    recognizer.motion_labels = list(LABELS)
+    recognizer.pattern_definitions = definitions
+    recognizer.compile_patterns()
+    return recognizer
+
+def random_segments(count, seed=0):
+    """Breakdowns like analyze_motion_segments produces (percentages sum to 100 or are all zero)."""
+    rng = np.random.default_rng(seed)
+    percentages = rng.dirichlet(np.ones(len(LABELS)) * 0.5, count) * 100
+    percentages[rng.random(count) < 0.1] = 0.0  # Windows with no listed labels
+    max_consecutive = rng.integers(0, 12, (count, len(LABELS)))
+    transitions = rng.integers(0, 8, count)
+    return percentages, max_consecutive, transitions
+
+def assert_matches_scalar(recognizer, percentages, max_consecutive, transitions):
+    compiled = recognizer.pattern_rules.evaluate(percentages, max_consecutive, transitions)
+    expected = [recognizer.determine_pattern(dict(zip(LABELS, pct)), dict(zip(LABELS, cons)), int(trans))
+                for pct, cons, trans in zip(percentages.tolist(), max_consecutive.tolist(), transitions.tolist())]
+    assert compiled.tolist() == expected
+
+def test_default_rules_match_determine_pattern():
+    assert_matches_scalar(recognizer_with(FixedPatternRecognizer().pattern_definitions), *random_segments(5000))
+
+def test_first_match_in_priority_order():
+    # Both patterns (and both rules of 'busy') match; the first listed wins
+    definitions = {
+        'busy': [{'motions': ['running'], 'min_percentage': 0.9},
+                 {'motions': ['walking', 'running'], 'min_percentage': 0.5}],
+        'moving': [{'motions': ['walking'], 'min_percentage': 0.4}],
+        'anything': [{}]
+    }
+    recognizer = recognizer_with(definitions)
+    percentages = np.array([[0.0, 0.0, 60.0, 40.0], [0.0, 0.0, 5.0, 95.0], [0.0, 0.0, 45.0, 0.0], [100.0, 0.0, 0.0, 0.0]])
+    result = recognizer.pattern_rules.evaluate(percentages, np.ones((4, 4), dtype=int), np.zeros(4, dtype=int))
+    assert result.tolist() == ['busy', 'busy', 'moving', 'anything']
+    assert_matches_scalar(recognizer, *random_segments(2000, seed=1))
+
+def test_rules_without_motions_or_thresholds():
+    definitions = {
+        'restless': [{'min_transitions': 4}],                        # No motions key at all
+        'empty_motions': [{'motions': [], 'min_percentage': 0.9,    # Motion checks don't apply
+                           'min_consecutive': 50, 'min_transitions': 2}],
+        'no_thresholds': [{'motions': ['walking']}]                 # Always matches
+    }
+    recognizer = recognizer_with(definitions)
+    assert_matches_scalar(recognizer, *random_segments(2000, seed=2))
+    result = recognizer.pattern_rules.evaluate(np.zeros((3, 4)), np.zeros((3, 4), dtype=int), np.array([5, 2, 0]))
+    assert result.tolist() == ['restless', 'empty_motions', 'no_thresholds']
+
+def test_percentage_rule_without_motions_key_is_skipped():
+    # determine_pattern would raise KeyError on rule['motions']; compiled, the
+    # check doesn't apply, exactly as for an empty motions list
+    rules = CompiledPatternRules({'loose': [{'min_percentage': 0.5}], 'fallback': [{}]}, LABELS)
+    assert rules.evaluate(np.zeros((1, 4)), np.zeros((1, 4)), np.zeros(1)).tolist() == ['loose']
+
+def test_labels_outside_motion_labels():
+    # 'jumping' is never a column: it contributes 0 to sums and maxima
+    definitions = {
+        'jumpy': [{'motions': ['jumping'], 'min_percentage': 0.1}],
+        'jump_or_walk': [{'motions': ['jumping', 'walking'], 'min_percentage': 0.3, 'min_consecutive': 3}],
+        'only_unknown_zero': [{'motions': ['jumping'], 'min_percentage': 0.0, 'min_consecutive': 0}]
+    }
+    recognizer = recognizer_with(definitions)
+    assert_matches_scalar(recognizer, *random_segments(2000, seed=3))
+    result = recognizer.pattern_rules.evaluate(np.array([[0.0, 0.0, 50.0, 50.0]]), np.array([[0, 0, 4, 4]]), np.array([0]))
+    assert result.tolist() == ['jump_or_walk']
+
+def test_empty_segments():
+    recognizer = recognizer_with(FixedPatternRecognizer().pattern_definitions)
+    # No segments at all
+    result = recognizer.pattern_rules.evaluate(np.empty((0, 4)), np.empty((0, 4), dtype=int), np.empty(0, dtype=int))
+    assert len(result) == 0
+    # Segments with no samples of any listed label
+    assert_matches_scalar(recognizer, np.zeros((3, 4)), np.zeros((3, 4), dtype=int), np.array([0, 3, 9]))
+
+@pytest.mark.parametrize('definitions', [{}, {'never': [{'motions': ['running'], 'min_percentage': 2.0}]}],
+                         ids=['no_rules', 'unmatchable'])
+def test_no_match_is_unknown(definitions):
+    recognizer = recognizer_with(definitions)
+    assert set(recognizer.pattern_rules.evaluate(*random_segments(100)).tolist()) == {'unknown'}
+    assert_matches_scalar(recognizer, *random_segments(100))
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from test_db_connection import WINDOW_SIZE
+from motion_replay import encode_csv, generate_samples, load_recording, parse_schedule, run_replay
+
+@pytest.mark.parametrize('protocol', ['csv', 'binary'])
+def test_replay_delivers_every_sample(capsys, protocol):
+    report = run_replay(devices=2, speed=0, schedule='resting:10,walking:10', protocol=protocol,
+                        backend='sqlite', adaptive=False)
+    assert report['samples_fed'] == 2 * 200
+    assert report['samples_handled'] == report['samples_fed']
+    # Only each device's warm-up (still 'collecting_data') isn't stored
+    assert report['samples_written'] == report['rows_written']
+    assert 0 < report['samples_fed'] - report['samples_written'] <= 2 * WINDOW_SIZE
+    assert report['dropped'] == {'unparsed': 0, 'queue_full': 0, 'failed_writes': 0}
+    assert report['crc_errors'] == 0
+    assert report['segments'] > 0
+    assert report['latency']['end_to_end']['count'] == report['samples_written']
+    assert report['latency']['end_to_end']['p50_ms'] <= report['latency']['end_to_end']['max_ms']
+
+def test_generated_streams_are_reproducible_and_recordable(tmp_path):
+    schedule = parse_schedule('resting:5,running:5')
+    millis, values = generate_samples(schedule, seed=3)
+    again = generate_samples(schedule, seed=3)[1]
+    assert np.array_equal(values, again)
+    assert not np.array_equal(values, generate_samples(schedule, seed=4)[1])
+    assert millis.tolist() == list(range(0, 10000, 100))
+    
+    # A captured stream, with a boot message and a partial line, loads back
+    path = tmp_path / 'capture.csv'
+    path.write_bytes(b'MPU6050 ready\n' + b''.join(encode_csv(millis, values)) + b'1234,0.1,0.2\n')
+    loaded_millis, loaded = load_recording(path)
+    assert loaded_millis.tolist() == millis.tolist()
+    assert np.allclose(loaded, values, atol=0.005)
+    
+    with pytest.raises(ValueError, match='Unknown profile'):
+        parse_schedule('resting:5,swimming:5')
@@ -0,0 +1,123 @@
+import sqlite3
+import pytest
+from datetime import datetime, timedelta
+from motion_pool import Backoff, ResilientStorage, SpillJournal
+from motion_storage import SQLiteStorage
+
+START = datetime(2026, 1, 1)
+
+class FlakyStorage(SQLiteStorage):
+    """SQLite that can be taken down, and refuses any write containing a 'bad' row."""
+    
+    down = False
+    
+    def connect(self):
+        if self.down:
+            raise sqlite3.OperationalError("unable to open database file")
+        super().connect()
+    
+    def write_samples(self, rows):
+        if self.down:
+            raise sqlite3.OperationalError("disk I/O error")
+        if any(row[8] == 'bad' for row in rows):
+            raise sqlite3.IntegrityError("CHECK constraint failed: sensor_data")
+        super().write_samples(rows)
+
+def batch(index, sequence_id='good', rows=10):
+    return [(START + timedelta(seconds=index, milliseconds=100 * i), 'walking',
+             0.1, 0.2, 9.8, 0.0, 0.0, 0.0, sequence_id, 1, None) for i in range(rows)]
+
+def test_rejected_batches_are_set_aside_and_replay_continues(tmp_path, capsys):
+    backend = FlakyStorage(str(tmp_path / 'store.sqlite3'))
+    storage = ResilientStorage(backend, str(tmp_path / 'spill.journal'), backoff=Backoff(initial=0.0))
+    storage.connect()
+    
+    # Store up: the refused batch is set aside, the store stays available
+    for index in range(10):
+        storage.write_samples(batch(index, 'bad' if index == 3 else 'good'))
+    assert storage.available
+    assert storage.stats['outages'] == 0
+    assert len(storage.journal) == 0
+    
+    # Outage: everything spills, including another batch the store will refuse
+    backend.down = True
+    for index in range(10, 60):
+        storage.write_samples(batch(index, 'bad' if index == 30 else 'good'))
+    assert not storage.available
+    assert len(storage.journal) == 500
+    
+    # Back up: the journal replays around the refused batch, then new rows follow
+    backend.down = False
+    storage.write_samples(batch(60))
+    assert len(storage.journal) == 0
+    assert storage.stats['replayed_rows'] == 490
+    assert storage.stats['rejected_rows'] == 20
+    
+    total_count, latest, distribution = storage.summary()
+    assert total_count == 59 * 10
+    assert latest == batch(60)[-1][0]
+    storage.close()
+    
+    rejected = [row for rows in SpillJournal(str(tmp_path / 'spill.journal.rejected'))._read() for row in rows]
+    assert [row[0] for row in rejected] == ([row[0].isoformat() for row in batch(3)] +
+                                            [row[0].isoformat() for row in batch(30)])
+    assert "refused are in" in capsys.readouterr().out
+
+def test_journal_keeps_the_unwritten_batches_when_the_store_drops(tmp_path):
+    journal = SpillJournal(str(tmp_path / 'spill.journal'))
+    for index in range(6):
+        journal.append(batch(index))
+    
+    written = []
+    def write(rows):
+        if len(written) == 2:
+            raise sqlite3.OperationalError("database is locked")
+        written.append(rows)
+    
+    try:
+        journal.replay(write, batch_rows=20, reject=lambda rows, error: None)
+    except sqlite3.OperationalError:
+        pass
+    assert sum(len(rows) for rows in written) == 40
+    assert len(journal) == 20
+    assert len(SpillJournal(journal.path)) == 20
+
+class MySQLOutageStorage(SQLiteStorage):
+    """A store that fails like mysql-connector's C extension does when the server is unreachable."""
+    
+    down = False
+    
+    def connect(self):
+        if self.down:
+            raise self.error()
+        super().connect()
+    
+    def write_samples(self, rows):
+        if self.down:
+            raise self.error()
+        super().write_samples(rows)
+    
+    def error(self):
+        import mysql.connector
+        return mysql.connector.DatabaseError(msg="Can't connect to MySQL server on 'localhost:3306' (111)", errno=2003)
+
+def test_mysql_connection_errno_is_an_outage(tmp_path):
+    pytest.importorskip('mysql.connector')
+    backend = MySQLOutageStorage(str(tmp_path / 'store.sqlite3'))
+    storage = ResilientStorage(backend, str(tmp_path / 'spill.journal'), backoff=Backoff(initial=0.0))
+    storage.connect()
+    storage.write_samples(batch(0))
+    
+    backend.down = True
+    storage.write_samples(batch(1))
+    assert not storage.available
+    assert storage.stats['spilled_rows'] == 10
+    assert storage.stats['rejected_rows'] == 0
+    
+    backend.down = False
+    storage.write_samples(batch(2))
+    assert storage.stats['replayed_rows'] == 10
+    assert len(storage.journal) == 0
+    assert storage.summary()[0] == 30
+    storage.close()
+    assert not (tmp_path / 'spill.journal.rejected').exists()
@@ -0,0 +1,80 @@
+import math
+import numpy as np
+import pytest
+import test_db_connection
+from test_db_connection import WINDOW_SIZE, RollingFeatures, SimpleMotionRecognizer
+from motion_replay import generate_samples
+from motion_benchmarks import OriginalMotionRecognizer
+
+def synthetic_stream(schedule='resting:90,walking:90,running:90,resting:30,walking:90', seed=0):
+    """Six-axis samples from the replay profiles (idle, walking and running stretches)."""
+    millis, values = generate_samples([(name, float(seconds)) for name, seconds in
+                                       (part.split(':') for part in schedule.split(','))], seed=seed)
+    return values[:, :6].tolist()
+
+def threshold_stream(count=4000, seed=1):
+    """Samples whose accel mean wanders across every threshold (and the idle band)."""
+    rng = np.random.default_rng(seed)
+    level = np.repeat(rng.choice([9.82, 9.85, 10.3, 12.0, 14.0, 15.5], count // 50 + 1), 50)[:count]
+    noise = np.repeat(rng.choice([0.0, 0.01, 0.5, 3.0], count // 37 + 1), 37)[:count]
+    values = np.zeros((count, 6))
+    values[:, 2] = level + rng.normal(0, 1, count) * noise
+    values[:, 3:6] = rng.normal(0, 1, (count, 3)) * rng.choice([0.005, 0.2], (count, 1))
+    return values.tolist()
+
+def labels(recognizer, samples):
+    result = []
+    for sample in samples:
+        recognizer.add_sample(*sample)
+        result.append(recognizer.recognize_pattern())
+    return result
+
+@pytest.fixture
+def no_cadence(monkeypatch):
+    # Step cadence deliberately changes walking vs running; parity is with the magnitude rules
+    monkeypatch.setattr(test_db_connection, 'CADENCE_RULES', False)
+
+def original_recognizer():
+    recognizer = OriginalMotionRecognizer()
+    recognizer.debug = False
+    return recognizer
+
+@pytest.mark.parametrize('samples', [synthetic_stream(), synthetic_stream(seed=7), threshold_stream()],
+                         ids=['profiles', 'profiles_seed7', 'thresholds'])
+def test_labels_match_original(no_cadence, samples):
+    # Longer than the 1000-sample resync interval several times over
+    assert len(samples) > 3000
+    assert labels(SimpleMotionRecognizer(), samples) == labels(original_recognizer(), samples)
+
+def test_constant_input_matches_original(no_cadence):
+    # Zero variance: the sum-of-squares variance must not go negative or wobble
+    samples = [[0.0, 0.0, 9.82, 0.0, 0.0, 0.0]] * 1500 + [[0.0, 0.0, 12.0, 0.0, 0.0, 0.0]] * 1500
+    assert labels(SimpleMotionRecognizer(), samples) == labels(original_recognizer(), samples)
+
+@pytest.mark.parametrize('bad', [math.nan, math.inf], ids=['nan', 'inf'])
+@pytest.mark.parametrize('axis', [2, 4], ids=['accel', 'gyro'])
+def test_non_finite_input_matches_original(no_cadence, bad, axis):
+    # A bad reading affects the windows that hold it and no others
+    samples = synthetic_stream('resting:70,walking:70,running:70')
+    for position in (5, 400, 999, 1000, 1001, 1500):
+        samples[position] = list(samples[position])
+        samples[position][axis] = bad
+    with np.errstate(invalid='ignore'):
+        expected = labels(original_recognizer(), samples)
+    assert labels(SimpleMotionRecognizer(), samples) == expected
+
+def test_features_match_numpy_across_resync():
+    samples = synthetic_stream('walking:60,running:60,resting:60')
+    rolling = RollingFeatures(WINDOW_SIZE, shift=9.82)
+    accel_window, gyro_window = [], []
+    for index, sample in enumerate(samples):
+        accel_mag = math.sqrt(sum(value * value for value in sample[:3]))
+        gyro_mag = math.sqrt(sum(value * value for value in sample[3:]))
+        rolling.push(accel_mag, gyro_mag)
+        accel_window = (accel_window + [accel_mag])[-WINDOW_SIZE:]
+        gyro_window = (gyro_window + [gyro_mag])[-WINDOW_SIZE:]
+        if index % 7 and index not in (999, 1000, 1001):
+            continue
+        expected = (np.mean(accel_window), np.std(accel_window), np.max(accel_window), np.mean(gyro_window),
+                    np.mean(np.abs(np.diff(accel_window))) if len(accel_window) > 1 else 0.0)
+        assert rolling.features() == pytest.approx(expected, rel=1e-9, abs=1e-9)
@@ -0,0 +1,71 @@
+import sqlite3
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime, timedelta
+from motion_storage import ParquetStorage, SQLiteStorage
+
+START = datetime(2026, 2, 1, 8, 0, 41)
+
+def sample_rows(seed=0):
+    """Two sequences at 10 Hz over four minutes with random accel, plus hold records."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for index, sequence_id in enumerate(('seq-a', 'seq-b')):
+        for i in range(2400):
+            timestamp = START + timedelta(milliseconds=100 * i + 50 * index)
+            label = ('resting', 'walking', 'running')[(i // 170 + index) % 3]
+            accel = rng.normal([0.0, 0.0, 9.8], 2.0)
+            rows.append((timestamp, label, *accel.tolist(), 0.0, 0.0, 0.0, sequence_id, 1, None))
+        rows.append((START + timedelta(seconds=250), 'resting', 0.0, 0.0, 9.8, 0.0, 0.0, 0.0, sequence_id,
+                     40, START + timedelta(seconds=253.9)))
+    return rows
+
+def expected_rollups(rows):
+    frame = pd.DataFrame(rows, columns=['timestamp', 'motion_label', 'accel_x', 'accel_y', 'accel_z', 'gyro_x',
+                                        'gyro_y', 'gyro_z', 'sequence_id', 'hold_count', 'hold_until'])
+    frame['accel_mag'] = np.sqrt(frame['accel_x'] ** 2 + frame['accel_y'] ** 2 + frame['accel_z'] ** 2)
+    frame['weighted'] = frame['accel_mag'] * frame['hold_count']
+    frame['last'] = frame['hold_until'].fillna(frame['timestamp'])
+    frame['minute_start'] = frame['timestamp'].dt.floor('min')
+    return frame.groupby(['minute_start', 'sequence_id', 'motion_label']).agg(
+        sample_count=('hold_count', 'sum'), accel_mag_min=('accel_mag', 'min'), accel_mag_max=('accel_mag', 'max'),
+        accel_mag_sum=('weighted', 'sum'), last_timestamp=('last', 'max'))
+
+def write_in_batches(storage, rows, size=333):
+    # Batches split minutes and label groups, so rollups are merged across writes
+    for start in range(0, len(rows), size):
+        storage.write_samples(rows[start:start + size])
+
+def test_minute_rollups_match_the_raw_rows(tmp_path):
+    rows = sample_rows()
+    storage = SQLiteStorage(str(tmp_path / 'store.sqlite3'))
+    storage.connect()
+    write_in_batches(storage, rows)
+    storage.close()
+    
+    with sqlite3.connect(tmp_path / 'store.sqlite3') as conn:
+        stored = pd.read_sql_query("SELECT * FROM sensor_data_minute", conn,
+                                   parse_dates=['minute_start', 'last_timestamp'])
+    stored = stored.set_index(['minute_start', 'sequence_id', 'motion_label']).sort_index()
+    expected = expected_rollups(rows)
+    assert len(stored) == len(expected)
+    pd.testing.assert_frame_equal(stored, expected, check_dtype=False, rtol=1e-9)
+
+@pytest.mark.parametrize('backend', [SQLiteStorage, ParquetStorage])
+def test_summary_counts_what_was_stored(tmp_path, backend):
+    rows = sample_rows(seed=1)
+    storage = backend(str(tmp_path / 'store'))
+    storage.connect()
+    write_in_batches(storage, rows)
+    storage.close()
+    
+    # A fresh reader answers from the rollups alone
+    storage = backend(str(tmp_path / 'store'))
+    storage.connect()
+    total_count, latest, distribution = storage.summary()
+    storage.close()
+    counts = pd.Series([row[9] for row in rows], index=[row[1] for row in rows]).groupby(level=0).sum()
+    assert total_count == 2 * 2400 + 2 * 40
+    assert latest == max(row[10] or row[0] for row in rows)
+    assert dict(distribution) == counts.to_dict()
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime, timedelta
+from machine_learned_results import FixedPatternRecognizer
+from motion_patterns import MIN_SEGMENT_SAMPLES
+
+COLUMNS = ['start_time', 'end_time', 'resting_pct', 'idle_pct', 'walking_pct', 'running_pct',
+           'max_consecutive_resting', 'max_consecutive_idle', 'max_consecutive_walking', 'max_consecutive_running',
+           'transitions', 'samples', 'pattern']
+
+def reference_segments(recognizer, df):
+    """The original per-window loop: groupby, value_counts and a walk over each window's labels."""
+    time_window = pd.to_datetime(df['timestamp']).dt.floor(f"{recognizer.window_size}s")
+    segments = []
+    for window_name, window_data in df.groupby(time_window):
+        if len(window_data) < MIN_SEGMENT_SAMPLES:
+            continue
+        motion_counts = window_data['motion_label'].value_counts()
+        total_samples = len(window_data)
+        motion_percentages = {motion: motion_counts[motion] / total_samples * 100 if motion in motion_counts else 0
+                              for motion in recognizer.motion_labels}
+        
+        motions = window_data['motion_label'].tolist()
+        max_consecutive = {motion: 0 for motion in recognizer.motion_labels}
+        transitions = 0
+        current_motion, current_count = None, 0
+        for motion in motions + [None]:
+            if motion == current_motion:
+                current_count += 1
+                continue
+            if current_motion in max_consecutive:
+                max_consecutive[current_motion] = max(max_consecutive[current_motion], current_count)
+            if current_motion is not None and motion is not None:
+                transitions += 1
+            current_motion, current_count = motion, 1
+        
+        segments.append({
+            'start_time': window_name,
+            'end_time': window_name + timedelta(seconds=recognizer.window_size),
+            **{f'{motion}_pct': motion_percentages[motion] for motion in ('resting', 'idle', 'walking', 'running')},
+            **{f'max_consecutive_{motion}': max_consecutive[motion] for motion in ('resting', 'idle', 'walking', 'running')},
+            'transitions': transitions,
+            'samples': total_samples,
+            'pattern': recognizer.determine_pattern(motion_percentages, max_consecutive, transitions)
+        })
+    return pd.DataFrame(segments, columns=COLUMNS)
+
+def labelled_samples(seconds=600, seed=0):
+    """10 Hz rows with gaps (partial and too-short windows), unlisted labels and late rows at the end."""
+    rng = np.random.default_rng(seed)
+    count = seconds * 10
+    timestamps = pd.Timestamp(datetime(2026, 3, 1, 12, 0, 7)) + pd.to_timedelta(np.arange(count) * 100, unit='ms')
+    choices = ['resting', 'idle', 'walking', 'running', 'collecting_data', 'cycling']
+    labels = np.repeat(rng.choice(choices, count, p=[0.25, 0.2, 0.25, 0.2, 0.05, 0.05]),
+                       rng.integers(1, 40, count))[:count]
+    df = pd.DataFrame({'timestamp': timestamps, 'motion_label': labels})
+    
+    # Drop scattered rows, whole stretches, and all but a few rows of some windows
+    keep = rng.random(count) > 0.1
+    for start in rng.integers(0, count, 12):
+        keep[start:start + rng.integers(100, 160)] = False
+    for window in rng.choice(seconds // 15 - 1, 4, replace=False):
+        first = 80 + window * 150  # The first whole window starts 8 s in
+        keep[first + 3:first + 150] = False
+    df = df[keep]
+    
+    # Rows that arrive late, after later windows
+    late = df.sample(200, random_state=seed).sort_values('timestamp')
+    return pd.concat([df.drop(late.index), late], ignore_index=True)
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_vectorized_segments_match_the_per_window_loop(seed):
+    recognizer = FixedPatternRecognizer()
+    df = labelled_samples(seed=seed)
+    expected = reference_segments(recognizer, df)
+    segments = recognizer.analyze_motion_segments(df, verbose=False)
+    
+    # Some windows are dropped for having too few samples, and some listed motions are absent entirely
+    windows = pd.to_datetime(df['timestamp']).dt.floor('15s').value_counts()
+    assert (windows < MIN_SEGMENT_SAMPLES).any()
+    assert len(segments) == (windows >= MIN_SEGMENT_SAMPLES).sum()
+    pd.testing.assert_frame_equal(segments[COLUMNS], expected, check_dtype=False, check_exact=False, rtol=1e-12)
+
+def test_windows_of_only_unlisted_labels():
+    recognizer = FixedPatternRecognizer()
+    df = pd.DataFrame({'timestamp': pd.date_range('2026-03-01 12:00:00', periods=300, freq='100ms'),
+                       'motion_label': ['collecting_data'] * 150 + ['cycling', 'collecting_data'] * 75})
+    segments = recognizer.analyze_motion_segments(df, verbose=False)
+    pd.testing.assert_frame_equal(segments[COLUMNS], reference_segments(recognizer, df), check_dtype=False)
+    assert (segments[['resting_pct', 'idle_pct', 'walking_pct', 'running_pct']] == 0).all().all()
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from machine_learned_results import FixedPatternRecognizer, SegmentCache
+from motion_storage import SQLiteStorage
+
+LABELS = ['resting', 'idle', 'walking', 'running']
+
+def sample_rows(start, seconds, seed=0):
+    """10 Hz rows whose labels change in runs of 1-60 samples."""
+    rng = np.random.default_rng(seed)
+    labels = np.repeat(rng.choice(LABELS, seconds * 10), rng.integers(1, 60, seconds * 10))[:seconds * 10]
+    return [(start + timedelta(milliseconds=100 * i), str(label), 0.1, 0.2, 9.8, 0.0, 0.0, 0.0, 'seq', 1, None)
+            for i, label in enumerate(labels)]
+
+def open_store(path, *batches):
+    storage = SQLiteStorage(str(path))
+    storage.connect()
+    for rows in batches:
+        storage.write_samples(rows)
+    return storage
+
+def analyze(storage, cache_path, definitions=None):
+    recognizer = FixedPatternRecognizer(storage=storage)
+    if definitions is not None:
+        recognizer.pattern_definitions = definitions
+        recognizer.compile_patterns()
+    return recognizer.analyze_incremental(minutes=60, cache=SegmentCache(str(cache_path)))
+
+def test_incremental_run_matches_a_full_rebuild(tmp_path, capsys):
+    start = pd.Timestamp(datetime.now() - timedelta(minutes=20)).floor('15s').to_pydatetime()
+    storage = open_store(tmp_path / 'store.sqlite3', sample_rows(start, 300))
+    analyze(storage, tmp_path / 'cache.pkl')
+    
+    # New rows after the cached ones, and late rows inside two already cached windows
+    storage.write_samples(sample_rows(start + timedelta(seconds=300), 60, seed=1))
+    storage.write_samples(sample_rows(start + timedelta(seconds=31), 20, seed=2))
+    capsys.readouterr()
+    incremental = analyze(storage, tmp_path / 'cache.pkl')
+    assert "6 time windows changed" in capsys.readouterr().out
+    
+    full = analyze(storage, tmp_path / 'fresh.pkl')
+    pd.testing.assert_frame_equal(incremental, full)
+    assert incremental['samples'].sum() == 3800
+    storage.close()
+
+def test_cache_is_discarded_for_other_rules_or_store(tmp_path, capsys):
+    start = pd.Timestamp(datetime.now() - timedelta(minutes=20)).floor('15s').to_pydatetime()
+    storage = open_store(tmp_path / 'store.sqlite3', sample_rows(start, 120))
+    analyze(storage, tmp_path / 'cache.pkl')
+    
+    # Other rules: every cached pattern is recomputed, not only new windows
+    definitions = {'anything': [{}]}
+    segments = analyze(storage, tmp_path / 'cache.pkl', definitions)
+    assert "different pattern rules" in capsys.readouterr().out
+    assert set(segments['pattern']) == {'anything'}
+    
+    # Another store (ids restart at 1): nothing of the first one's survives
+    other = open_store(tmp_path / 'other.sqlite3', sample_rows(start + timedelta(seconds=600), 60, seed=3))
+    segments = analyze(other, tmp_path / 'cache.pkl', definitions)
+    assert "other.sqlite3" in capsys.readouterr().out
+    pd.testing.assert_frame_equal(segments, analyze(other, tmp_path / 'fresh.pkl', definitions))
+    assert segments['start_time'].min() >= start + timedelta(seconds=600)
+    storage.close()
+    other.close()
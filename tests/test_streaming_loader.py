@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+from datetime import datetime, timedelta
+from machine_learned_results import FixedPatternRecognizer
+from motion_storage import SENSOR_COLUMNS, ParquetStorage, SQLiteStorage
+from test_segment_cache import sample_rows
+
+START = datetime(2026, 2, 1, 8, 0, 3)
+
+def open_backend(kind, tmp_path):
+    if kind == 'sqlite':
+        storage = SQLiteStorage(str(tmp_path / 'store.sqlite3'))
+    else:
+        storage = ParquetStorage(str(tmp_path / 'parquet'))
+    storage.connect()
+    return storage
+
+@pytest.fixture(params=['sqlite', 'parquet'])
+def storage(request, tmp_path):
+    writer = open_backend(request.param, tmp_path)
+    writer.write_samples(sample_rows(START, 600))
+    # One hold record standing in for 150 samples over 15 s
+    writer.write_samples([(START + timedelta(seconds=600), 'resting', 0.0, 0.0, 9.8, 0.0, 0.0, 0.0, 'seq',
+                           150, START + timedelta(seconds=614.9))])
+    writer.close()
+    
+    # The analyzer opens the store on its own
+    storage = open_backend(request.param, tmp_path)
+    yield storage
+    storage.close()
+
+def test_range_streams_bounded_typed_chunks(storage):
+    end = START + timedelta(seconds=300)
+    chunks = list(storage.iter_range(START + timedelta(seconds=60), end, chunk_rows=97))
+    assert max(len(chunk) for chunk in chunks) <= 97
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert list(chunk.columns) == list(SENSOR_COLUMNS)
+        assert [str(dtype) for dtype in chunk.dtypes[['timestamp', 'accel_x', 'hold_count']]] == [
+            'datetime64[us]', 'float32', 'int32']
+    
+    frame = pd.concat(chunks, ignore_index=True)
+    assert frame['timestamp'].is_monotonic_increasing
+    assert frame['timestamp'].iloc[0] == START + timedelta(seconds=60)
+    assert frame['timestamp'].iloc[-1] < end
+    assert len(frame) == 2400
+
+def test_chunked_analysis_matches_one_frame(storage):
+    recognizer = FixedPatternRecognizer(storage=storage)
+    since = START - timedelta(minutes=1)
+    
+    # Windows split across chunk boundaries are carried into the next chunk
+    chunked = recognizer.analyze_motion_chunks(recognizer.iter_range_chunks(since, chunk_rows=97), verbose=False)
+    whole = recognizer.analyze_motion_segments(pd.concat(recognizer.iter_range_chunks(since), ignore_index=True),
+                                               verbose=False)
+    pd.testing.assert_frame_equal(chunked, whole)
+    
+    # The hold record comes back as the 150 samples it stands for
+    assert whole['samples'].sum() == 6000 + 150